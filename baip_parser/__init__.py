@@ -2,6 +2,27 @@
 """
 from baip_parser.parser import Parser
 from baip_parser.writer import Writer
+from baip_parser.sorter import Sorter
+from baip_parser.delta import Delta
+from baip_parser.sqlitewriter import SqliteWriter
+from baip_parser.jsonlineswriter import JsonLinesWriter
+from baip_parser.parquetwriter import ParquetWriter
+from baip_parser.fanout import Fanout
+from baip_parser.columns import Columns
+from baip_parser.interner import Interner
+from baip_parser.templates import Templates
+from baip_parser.xlsengine import XlsEngine
+from baip_parser.xlsbengine import XlsbEngine
+from baip_parser.docxengine import DocxEngine
+from baip_parser.sniffer import Sniffer
+from baip_parser.ledger import Ledger
+from baip_parser.claimer import Claimer
+from baip_parser.sheetcache import SheetCache
+from baip_parser.scheduler import Scheduler
+from baip_parser.supervisor import Supervisor
+from baip_parser.prefetcher import Prefetcher
+from baip_parser.scanner import Scanner
+from baip_parser.checkpoint import Checkpoint
 from baip_parser.daemon.parserdaemon import ParserDaemon
 from baip_parser.config.parserconfig import ParserConfig
 from baip_parser.daemon.parserdaemon import ParserDaemon
@@ -0,0 +1,208 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.Checkpoint` journals the workbooks completed
+by a batch run so that an interrupted batch can resume where it left off.
+
+"""
+__all__ = ["Checkpoint"]
+
+import os
+import json
+import cPickle
+import collections
+
+from baip_parser.ledger import Ledger
+from logga.log import log
+
+
+class Checkpoint(object):
+    """:class:`baip_parser.Checkpoint`
+
+    The rows extracted from each completed workbook are appended to a
+    spool file (:attr:`rows_file`) and the workbook is then journalled
+    to :attr:`checkpoint_file` along with its range of rows in the spool.
+    Both files are synced before the next workbook is journalled, so a
+    crash at any point loses at most the workbook in flight.
+
+    On load, a torn journal entry and any rows spooled after the last
+    good entry are discarded.  Workbooks that have changed since they
+    were journalled (as per :meth:`baip_parser.Ledger.signature`) are
+    not considered complete.
+
+    .. attribute:: checkpoint_file
+
+        journal of completed workbooks.  One JSON document per line of
+        the form::
+
+            {"file": <filepath>,
+             "signature": [<size>, <mtime>],
+             "rows": [<first_row>, <end_row>],
+             "offsets": [<first_byte>, <end_byte>]}
+
+    .. attribute:: rows_file
+
+        spool of the extracted ``(<key>, <cells>)`` rows
+        (:attr:`checkpoint_file` plus ``.rows``)
+
+    """
+    _checkpoint_file = None
+    _entries = {}
+
+    def __init__(self, checkpoint_file):
+        """Checkpoint initialiser.
+
+        """
+        self._checkpoint_file = checkpoint_file
+        self._entries = {}
+        self._rows = 0
+        self._journal_fh = None
+        self._rows_fh = None
+
+        self.load()
+
+    @property
+    def checkpoint_file(self):
+        return self._checkpoint_file
+
+    @property
+    def rows_file(self):
+        return '%s.rows' % self.checkpoint_file
+
+    @property
+    def entries(self):
+        return self._entries
+
+    def load(self):
+        """Read the journal and open the journal and spool for append.
+
+        """
+        self._entries = {}
+        self._rows = 0
+        journal_end = 0
+        rows_end = 0
+
+        if os.path.exists(self.checkpoint_file):
+            fh = open(self.checkpoint_file, 'rb')
+            for line in iter(fh.readline, ''):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    log.warn('Discarding torn checkpoint entry in "%s"' %
+                             self.checkpoint_file)
+                    break
+                self._entries[entry['file']] = entry
+                self._rows = entry['rows'][1]
+                rows_end = entry['offsets'][1]
+                journal_end = fh.tell()
+            fh.close()
+
+        if self._entries:
+            log.info('Resuming from checkpoint "%s": %d files complete' %
+                     (self.checkpoint_file, len(self._entries)))
+
+        self._journal_fh = self.reopen(self.checkpoint_file, journal_end)
+        self._rows_fh = self.reopen(self.rows_file, rows_end)
+
+    @staticmethod
+    def reopen(filepath, end):
+        """Open *filepath* for append once it has been truncated back to
+        *end* bytes.
+
+        """
+        fh = open(filepath, 'ab')
+        fh.truncate(end)
+        fh.seek(end)
+
+        return fh
+
+    def completed(self, filepath):
+        """Check whether *filepath* was completed by an earlier run and
+        has not changed since.
+
+        """
+        entry = self.entries.get(filepath)
+
+        return (entry is not None and
+                entry['signature'] == Ledger.signature(filepath))
+
+    def record(self, filepath, result):
+        """Spool the rows of *result* and journal *filepath* as complete.
+
+        **Args:**
+            *filepath*: the workbook that was parsed
+
+            *result*: the :meth:`baip_parser.Parser.parse_sheets`
+            structure of *filepath*, or ``None`` if it failed to parse
+
+        """
+        first_row = self._rows
+        first_byte = self._rows_fh.tell()
+        if result is not None:
+            for row in result.iteritems():
+                cPickle.dump(row, self._rows_fh, cPickle.HIGHEST_PROTOCOL)
+                self._rows += 1
+        self.sync(self._rows_fh)
+
+        entry = {'file': filepath,
+                 'signature': Ledger.signature(filepath),
+                 'rows': [first_row, self._rows],
+                 'offsets': [first_byte, self._rows_fh.tell()]}
+        self._journal_fh.write('%s\n' % json.dumps(entry))
+        self.sync(self._journal_fh)
+
+        self._entries[filepath] = entry
+
+    def result(self, filepath):
+        """Read back the rows spooled against *filepath*.
+
+        **Returns:**
+            the :meth:`baip_parser.Parser.parse_sheets` structure of
+            *filepath* in its original key order, or ``None`` if no rows
+            were extracted
+
+        """
+        result = None
+
+        entry = self.entries[filepath]
+        first_row, end_row = entry['rows']
+        if end_row > first_row:
+            fh = open(self.rows_file, 'rb')
+            fh.seek(entry['offsets'][0])
+            result = collections.OrderedDict(cPickle.load(fh)
+                                             for _ in range(end_row -
+                                                            first_row))
+            fh.close()
+
+        return result
+
+    @staticmethod
+    def sync(fh):
+        """Flush *fh* through to disk.
+
+        """
+        fh.flush()
+        os.fsync(fh.fileno())
+
+    def close(self):
+        """Close the journal and spool.
+
+        """
+        for fh in [self._journal_fh, self._rows_fh]:
+            if fh is not None:
+                fh.close()
+        self._journal_fh = None
+        self._rows_fh = None
+
+    def clear(self):
+        """Remove the journal and spool once the batch output is
+        complete.
+
+        """
+        self.close()
+        for filepath in [self.checkpoint_file, self.rows_file]:
+            try:
+                os.remove(filepath)
+            except OSError as error:
+                log.error('Unable to remove checkpoint "%s": %s' %
+                          (filepath, error))
+        self._entries = {}
+        self._rows = 0
@@ -0,0 +1,419 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.Claimer` coordinates several
+:class:`baip_parser.ParserDaemon` hosts that share the same inbound
+directory so that each file is parsed by only one of them.
+
+"""
+__all__ = ["Claimer"]
+
+import os
+import json
+import time
+import socket
+import hashlib
+import threading
+
+from logga.log import log
+
+
+class Claimer(object):
+    """:class:`baip_parser.Claimer`
+
+    A file is claimed by atomically creating a lock file for it under
+    :attr:`claim_dir`.  The lock is created with the ``link(2)`` idiom
+    so that it is safe on NFS.  While a claim is ``active`` it holds a
+    lease of :attr:`lease_time` seconds measured from the lock file's
+    modification time.  Claims from a host that has crashed are
+    reclaimed once their lease expires.
+
+    Once the file's rows have been output the claim is marked ``done``
+    along with the file's size and modification time.  Other hosts skip
+    the file until it changes.
+
+    The claims this host holds are renewed by a heartbeat thread
+    (:meth:`start`) every quarter of :attr:`lease_time`.  A slow parse
+    therefore never loses its lease to another host.
+
+    .. attribute:: claim_dir
+
+        shared directory that holds the claim lock files
+
+    .. attribute:: root
+
+        inbound directory that claimed file names are relative to.  This
+        allows hosts to mount the share at different locations
+
+    .. attribute:: lease_time
+
+        seconds an active claim is held before it can be reclaimed
+
+    .. attribute:: host_id
+
+        identifier of this host (default is the host name)
+
+    .. attribute:: held
+
+        files that this host holds an active claim on
+
+    """
+    _claim_dir = None
+    _root = None
+    _lease_time = 600.0
+    _host_id = None
+
+    def __init__(self, claim_dir=None, root=None, host_id=None):
+        """Claimer initialiser.
+
+        """
+        self._claim_dir = claim_dir
+        self._root = root
+
+        if host_id is None:
+            host_id = socket.gethostname()
+        self._host_id = host_id
+
+        self._lock = threading.Lock()
+        self._held = set()
+        self._heartbeat = None
+        self._stopped = threading.Event()
+
+    @property
+    def claim_dir(self):
+        return self._claim_dir
+
+    @claim_dir.setter
+    def claim_dir(self, value):
+        self._claim_dir = value
+
+    @property
+    def root(self):
+        return self._root
+
+    @root.setter
+    def root(self, value):
+        self._root = value
+
+    @property
+    def lease_time(self):
+        return self._lease_time
+
+    @lease_time.setter
+    def lease_time(self, value):
+        self._lease_time = value
+
+    @property
+    def host_id(self):
+        return self._host_id
+
+    @host_id.setter
+    def host_id(self, value):
+        self._host_id = value
+
+    @property
+    def held(self):
+        with self._lock:
+            return sorted(self._held)
+
+    @property
+    def owner(self):
+        return '%s:%d' % (self.host_id, os.getpid())
+
+    def relative_name(self, filepath):
+        """Name of *filepath* relative to :attr:`root`.
+
+        """
+        name = filepath
+        if self.root is not None:
+            name = os.path.relpath(filepath, self.root)
+
+        return name
+
+    def lock_file(self, filepath):
+        """Name of the lock file that represents the claim on
+        *filepath*.
+
+        """
+        name = self.relative_name(filepath)
+        if isinstance(name, unicode):
+            name = name.encode('utf-8')
+        digest = hashlib.sha1(name).hexdigest()
+
+        return os.path.join(self.claim_dir, '%s.claim' % digest)
+
+    @staticmethod
+    def signature(filepath):
+        signature = None
+
+        try:
+            stat = os.stat(filepath)
+            signature = [stat.st_size, stat.st_mtime]
+        except OSError as error:
+            log.debug('Unable to stat "%s": %s' % (filepath, error))
+
+        return signature
+
+    def read(self, lock_file):
+        """Read the claim held in *lock_file*.
+
+        **Returns:**
+            tuple of the form ``(<claim>, <stat>)`` where *claim* is the
+            claim dictionary.  ``(None, None)`` if there is no claim
+
+        """
+        claim = None
+        stat = None
+
+        try:
+            stat = os.stat(lock_file)
+            fh = open(lock_file)
+            claim = json.load(fh)
+            fh.close()
+        except (IOError, OSError):
+            stat = None
+        except ValueError:
+            # A claim is written before it is linked into place so a
+            # half written claim can only be left by an interrupted
+            # write.  Treat it as active until its lease expires.
+            claim = {}
+
+        return (claim, stat)
+
+    def write(self, filepath, state):
+        """Write this host's claim on *filepath* to a temporary file.
+
+        **Returns:**
+            the name of the temporary file
+
+        """
+        tmp_file = '%s.%s.%d.tmp' % (self.lock_file(filepath),
+                                     self.host_id,
+                                     os.getpid())
+        claim = {'file': self.relative_name(filepath),
+                 'owner': self.owner,
+                 'state': state,
+                 'signature': self.signature(filepath)}
+        fh = open(tmp_file, 'w')
+        json.dump(claim, fh)
+        fh.close()
+
+        return tmp_file
+
+    def claim(self, filepath, now=None):
+        """Attempt to claim *filepath* for this host.
+
+        **Args:**
+            *filepath*: fully qualified name of the file to claim
+
+            *now*: override the current time (epoch seconds)
+
+        **Returns:**
+            Boolean ``True`` if this host now holds the claim.  Boolean
+            ``False`` otherwise
+
+        """
+        if now is None:
+            now = time.time()
+
+        if not os.path.isdir(self.claim_dir):
+            try:
+                os.makedirs(self.claim_dir)
+            except OSError:
+                # Another host may have beaten us to it.
+                pass
+
+        lock_file = self.lock_file(filepath)
+        claimed = self.link(filepath, lock_file)
+
+        if not claimed:
+            claim, stat = self.read(lock_file)
+            if stat is None:
+                # Claim released in the meantime.
+                claimed = self.link(filepath, lock_file)
+            elif claim.get('state') == 'done':
+                if claim.get('signature') != self.signature(filepath):
+                    log.info('Claimed file "%s" has changed' % filepath)
+                    claimed = self.steal(filepath, lock_file, stat)
+            elif stat.st_mtime + self.lease_time < now:
+                log.warn('Lease on "%s" held by %s expired: reclaiming' %
+                         (filepath, claim.get('owner')))
+                claimed = self.steal(filepath, lock_file, stat)
+
+        log.debug('Claim on "%s" by %s: %s' % (filepath, self.owner, claimed))
+
+        if claimed:
+            with self._lock:
+                self._held.add(filepath)
+
+        return claimed
+
+    def link(self, filepath, lock_file):
+        """Atomically create *lock_file* via a hard link to a temporary
+        claim file.
+
+        **Returns:**
+            Boolean ``True`` if *lock_file* was created by this host
+
+        """
+        claimed = False
+
+        tmp_file = self.write(filepath, 'active')
+        try:
+            os.link(tmp_file, lock_file)
+            claimed = True
+        except OSError:
+            # The link reply can be lost over NFS even though the link
+            # was made.  The link count tells the truth.
+            try:
+                claimed = os.stat(tmp_file).st_nlink == 2
+            except OSError:
+                pass
+        finally:
+            try:
+                os.unlink(tmp_file)
+            except OSError:
+                pass
+
+        return claimed
+
+    def steal(self, filepath, lock_file, stat):
+        """Take over the stale claim *lock_file*.
+
+        The stale lock is renamed aside.  If another host has replaced
+        it since it was judged stale (its inode differs from *stat*) the
+        lock is put back.
+
+        **Returns:**
+            Boolean ``True`` if this host now holds the claim
+
+        """
+        claimed = False
+
+        aside = '%s.%s.%d.stale' % (lock_file, self.host_id, os.getpid())
+        try:
+            os.rename(lock_file, aside)
+        except OSError:
+            aside = None
+
+        if aside is not None:
+            if os.stat(aside).st_ino == stat.st_ino:
+                os.unlink(aside)
+                claimed = self.link(filepath, lock_file)
+            else:
+                try:
+                    os.link(aside, lock_file)
+                except OSError:
+                    pass
+                os.unlink(aside)
+
+        return claimed
+
+    def renew(self, filepath):
+        """Extend this host's lease on *filepath*.
+
+        """
+        try:
+            os.utime(self.lock_file(filepath), None)
+        except OSError as error:
+            log.warn('Unable to renew claim on "%s": %s' % (filepath, error))
+
+    def renew_held(self):
+        """Extend this host's lease on each of the :attr:`held` files.
+
+        """
+        with self._lock:
+            for filepath in self._held:
+                self.renew(filepath)
+
+    def complete(self, filepath):
+        """Mark this host's claim on *filepath* as ``done``.
+
+        """
+        with self._lock:
+            self._held.discard(filepath)
+            tmp_file = self.write(filepath, 'done')
+            try:
+                os.rename(tmp_file, self.lock_file(filepath))
+            except OSError as error:
+                log.error('Unable to complete claim on "%s": %s' %
+                          (filepath, error))
+
+    def release(self, filepath):
+        """Drop this host's claim on *filepath*.
+
+        """
+        with self._lock:
+            self._held.discard(filepath)
+            lock_file = self.lock_file(filepath)
+            claim, _ = self.read(lock_file)
+            if claim is not None and claim.get('owner') == self.owner:
+                try:
+                    os.unlink(lock_file)
+                except OSError as error:
+                    log.warn('Unable to release claim on "%s": %s' %
+                             (filepath, error))
+
+    def start(self):
+        """Start the heartbeat thread that renews the :attr:`held`
+        claims.
+
+        """
+        if self._heartbeat is None:
+            self._stopped.clear()
+            self._heartbeat = threading.Thread(target=self._run)
+            self._heartbeat.daemon = True
+            self._heartbeat.start()
+
+    def stop(self):
+        """Stop the heartbeat thread.
+
+        """
+        if self._heartbeat is not None:
+            self._stopped.set()
+            self._heartbeat.join()
+            self._heartbeat = None
+
+    def _run(self):
+        """Heartbeat thread main loop.
+
+        """
+        while not self._stopped.wait(self.lease_time / 4.0):
+            self.renew_held()
+
+    def purge(self, filepaths):
+        """Remove ``done`` claims that do not belong to any of the
+        current *filepaths*.
+
+        Only the claims outside of *filepaths* are read so the cost is
+        proportional to the number of files that have left the inbound
+        directory.
+
+        **Args:**
+            *filepaths*: list of files currently in the inbound directory
+
+        **Returns:**
+            number of claims purged
+
+        """
+        purged = 0
+
+        current = set([os.path.basename(self.lock_file(x))
+                       for x in filepaths])
+
+        if os.path.isdir(self.claim_dir):
+            for filename in os.listdir(self.claim_dir):
+                if not filename.endswith('.claim') or filename in current:
+                    continue
+
+                lock_file = os.path.join(self.claim_dir, filename)
+                claim, _ = self.read(lock_file)
+                if claim is not None and claim.get('state') == 'done':
+                    try:
+                        os.unlink(lock_file)
+                        purged += 1
+                    except OSError:
+                        pass
+
+        if purged:
+            log.info('Purged %d completed claims' % purged)
+
+        return purged
@@ -0,0 +1,266 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.Columns` applies the output rules to a whole
+batch of parsed worksheets one column at a time.
+
+"""
+__all__ = ["Columns"]
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Columns(object):
+    """:class:`baip_parser.Columns`
+
+    The parsed results are gathered into one column per cell.  Each
+    output rule then runs once over the whole column rather than once
+    per row:
+
+    * :meth:`length_check`: the ``cell_field_thresholds`` minimum
+      lengths
+    * :meth:`skip_empty`: the ``ignore_if_empty`` row mask
+    * :meth:`substitute`: the character substitutions
+    * :meth:`truncate`: the ``header_field_lengths`` truncation
+
+    The results match the row at a time rules of
+    :class:`baip_parser.ParserDaemon` and :class:`baip_parser.Writer`.
+
+    Where :mod:`numpy` is installed, a column whose values are all
+    ``unicode`` (or all ``str``) is held as a NumPy string array and the
+    rules run as :mod:`numpy.char` operations.  Other columns, or all
+    columns without NumPy, are processed as Python lists.
+
+    .. attribute:: keys
+
+        ``<workbook>|<worksheet>`` key of each row
+
+    .. attribute:: kept
+
+        list of booleans that flag the rows to output
+
+    """
+    SUBSTITUTIONS = [(u'\u2011', u'-'),
+                     (u'\u00B1', u'-'),
+                     (u'\u2019', u'-')]
+
+    _keys = []
+    _kept = []
+
+    def __init__(self, results, cells):
+        """Columns initialiser.
+
+        **Args:**
+            *results*: list of :meth:`baip_parser.Parser.parse_sheets`
+            structures
+
+            *cells*: the cells to gather into columns.  Every cell
+            passed to the rule methods must be included
+
+        """
+        self._keys = []
+        self._values = dict((x, []) for x in set(cells))
+        self._arrays = {}
+
+        for result in results:
+            for key, value in result.iteritems():
+                self._keys.append(key)
+                for cell, column in self._values.iteritems():
+                    column.append(value.get(cell))
+
+        self._kept = [True] * len(self._keys)
+
+    @property
+    def keys(self):
+        return self._keys
+
+    @property
+    def kept(self):
+        return self._kept
+
+    def column(self, cell):
+        """The values of *cell* as a list.
+
+        """
+        if cell in self._arrays:
+            array, null = self._arrays.pop(cell)
+            values = array.tolist()
+            for index in numpy.flatnonzero(null):
+                values[index] = None
+            self._values[cell] = values
+
+        return self._values[cell]
+
+    def array(self, cell):
+        """The values of *cell* as a tuple of the form ``(<strings>,
+        <null_mask>)`` of NumPy arrays.
+
+        **Returns:**
+            the arrays, or ``None`` if NumPy is not installed or the
+            column is not all ``unicode`` or all ``str``
+
+        """
+        arrays = self._arrays.get(cell)
+
+        if arrays is None and numpy is not None and self._values[cell]:
+            values = self._values[cell]
+            types = set([type(x) for x in values if x is not None])
+            if len(types) == 1 and types.issubset(set([unicode, str])):
+                text_type = types.pop()
+                null = numpy.array([x is None for x in values], dtype=bool)
+                array = numpy.array([text_type() if x is None else x
+                                     for x in values])
+                arrays = (array, null)
+                self._arrays[cell] = arrays
+                del self._values[cell]
+
+        return arrays
+
+    def length_check(self, thresholds):
+        """Replace the values that are not longer than their cell's
+        threshold with ``None``.
+
+        **Args:**
+            *thresholds*: dictionary of ``<cell>: <minimum_length>``
+
+        """
+        for cell, length in thresholds.iteritems():
+            arrays = self.array(cell)
+            if arrays is not None:
+                array, null = arrays
+                null |= numpy.char.str_len(array) <= length
+            else:
+                self._values[cell] = [None if x is not None and
+                                      len(x) <= length else x
+                                      for x in self.column(cell)]
+
+    def skip_empty(self, ignore_if_empty):
+        """Flag the rows whose *ignore_if_empty* cells are all ``None``
+        so that they are not output.
+
+        If *ignore_if_empty* is empty, no rows are skipped.
+
+        """
+        if ignore_if_empty:
+            if numpy is not None:
+                kept = numpy.zeros(len(self.keys), dtype=bool)
+                for cell in ignore_if_empty:
+                    arrays = self.array(cell)
+                    if arrays is not None:
+                        kept |= ~arrays[1]
+                    else:
+                        kept |= numpy.array([x is not None
+                                             for x in self.column(cell)],
+                                            dtype=bool)
+                kept &= numpy.array(self._kept, dtype=bool)
+                self._kept = kept.tolist()
+            else:
+                columns = [self.column(x) for x in ignore_if_empty]
+                self._kept = [kept and any(x[i] is not None for x in columns)
+                              for i, kept in enumerate(self._kept)]
+
+    def substitute(self, cells, substitutions=None):
+        """Apply the character *substitutions* to the ``unicode`` values
+        of *cells*.
+
+        **Args:**
+            *cells*: the cells to substitute
+
+            *substitutions*: list of ``(<old>, <new>)`` tuples (default
+            :attr:`SUBSTITUTIONS`)
+
+        """
+        if substitutions is None:
+            substitutions = self.SUBSTITUTIONS
+
+        for cell in set(cells):
+            arrays = self.array(cell)
+            if arrays is not None:
+                array, null = arrays
+                if array.dtype.kind == 'U':
+                    for old, new in substitutions:
+                        array = numpy.char.replace(array, old, new)
+                    self._arrays[cell] = (array, null)
+            else:
+                values = self.column(cell)
+                for old, new in substitutions:
+                    values = [x.replace(old, new)
+                              if isinstance(x, unicode) else x
+                              for x in values]
+                self._values[cell] = values
+
+    def truncate(self, cells, lengths, word_boundary=False):
+        """Truncate the values of each of *cells* to its length in
+        *lengths*, as per :meth:`baip_parser.Writer.truncate_row`.
+
+        **Args:**
+            *cells*: the output cells in order
+
+            *lengths*: list of the maximum length (or ``None``) of each
+            of *cells*
+
+            *word_boundary*: if ``True``, drop the last word of a
+            truncated value
+
+        **Returns:**
+            list of the output columns in *cells* order
+
+        """
+        columns = []
+
+        for cell, length in zip(cells, lengths):
+            arrays = None
+            if length is not None:
+                arrays = self.array(cell)
+
+            if arrays is not None:
+                array, null = arrays
+                over = numpy.char.str_len(array) > length
+                if over.any():
+                    array = array.copy()
+                    cut = array[over].astype('%s%d' % (array.dtype.kind,
+                                                       length))
+                    if word_boundary:
+                        head, sep, tail = numpy.rollaxis(
+                            numpy.char.rpartition(cut, ' '), -1)
+                        cut = numpy.where(sep == '', tail, head)
+                    array[over] = cut
+                column = array.tolist()
+                for index in numpy.flatnonzero(null):
+                    column[index] = None
+            else:
+                column = self.column(cell)
+                if length is not None:
+                    column = [self.cut(x, length, word_boundary)
+                              for x in column]
+
+            columns.append(column)
+
+        return columns
+
+    @staticmethod
+    def cut(value, length, word_boundary=False):
+        """Truncate a single *value* as per
+        :meth:`baip_parser.Writer.truncate_row`.
+
+        """
+        if value is not None and len(value) > length:
+            value = value[:length]
+            if word_boundary:
+                value = value.rsplit(' ', 1)[0]
+
+        return value
+
+    def rows(self, columns):
+        """Generator of the output rows from *columns* as returned by
+        :meth:`truncate`.
+
+        **Returns:**
+            generator of ``(<row>, <key>)`` tuples for the :attr:`kept`
+            rows
+
+        """
+        for index, key in enumerate(self.keys):
+            if self.kept[index]:
+                yield (tuple(x[index] for x in columns), key)
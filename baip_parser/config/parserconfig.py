@@ -5,11 +5,14 @@ the GeoUtils ingest facility.
 """
 __all__ = ["ParserConfig"]
 
+import os
+import collections
 
 from configa.config import Config
 from configa.setter import (set_scalar,
                             set_list,
                             set_dict)
+from logga.log import log
 
 
 class ParserConfig(Config):
@@ -19,14 +22,64 @@ class ParserConfig(Config):
     _thread_sleep = 2.0
     _inbound_dir = None
     _file_filter = None
+    _settle_time = 0.0
+    _done_marker = None
+    _exclude_dirs = []
+    _scan_threads = 0
+    _scan_parallel_min = 64
+    _intern_max_strings = 100000
     _archive_dir = None
+    _quarantine_dir = None
+    _ledger_file = None
+    _checkpoint_file = None
+    _max_failures = 3
+    _retry_delay = 60.0
+    _max_retry_delay = 3600.0
+    _claim_dir = None
+    _lease_time = 600.0
+    _host_id = None
+    _sheet_cache_dir = None
+    _template_dir = None
+    _extract_mode = None
+    _sheet_workers = 0
+    _sheet_parallel_min = 50
+    _parse_workers = 0
+    _schedule_history_file = None
+    _template_pattern = None
+    _standby_workers = 1
+    _worker_max_files = 100
+    _worker_max_rss = 0
+    _parse_deadline = 0.0
+    _max_sheet_mb = 0
+    _prefetch_threads = 0
+    _prefetch_files = 4
+    _prefetch_mb = 256
     _skip_sheets = []
     _cells_to_extract = []
+    _docx_tables = []
+    _docx_controls = []
     _cell_order = []
     _ignore_if_empty = []
     _cell_field_thresholds = {}
     _cell_map = {}
     _header_field_lengths = {}
+    _profiles = {}
+    _sort_by = []
+    _dedupe_on = []
+    _version_pattern = None
+    _sort_buffer_rows = 100000
+    _outfile = None
+    _delta_file = None
+    _sqlite_db = None
+    _sqlite_table = 'cells'
+    _parquet_file = None
+    _jsonl_file = None
+    _sinks = []
+    _sink_buffer_rows = 1000
+    _partition_by = None
+    _partition_pattern = None
+    _partition_workers = 4
+    _columnar_min_rows = 0
 
     def __init__(self, config_file=None):
         """:class:`baip_parser.ParserConfig` initialisation.
@@ -58,6 +111,54 @@ class ParserConfig(Config):
     def set_file_filter(self, value):
         pass
 
+    @property
+    def settle_time(self):
+        return self._settle_time
+
+    @set_scalar
+    def set_settle_time(self, value):
+        pass
+
+    @property
+    def done_marker(self):
+        return self._done_marker
+
+    @set_scalar
+    def set_done_marker(self, value):
+        pass
+
+    @property
+    def exclude_dirs(self):
+        return self._exclude_dirs
+
+    @set_list
+    def set_exclude_dirs(self, value):
+        pass
+
+    @property
+    def scan_threads(self):
+        return self._scan_threads
+
+    @set_scalar
+    def set_scan_threads(self, value):
+        pass
+
+    @property
+    def scan_parallel_min(self):
+        return self._scan_parallel_min
+
+    @set_scalar
+    def set_scan_parallel_min(self, value):
+        pass
+
+    @property
+    def intern_max_strings(self):
+        return self._intern_max_strings
+
+    @set_scalar
+    def set_intern_max_strings(self, value):
+        pass
+
     @property
     def archive_dir(self):
         return self._archive_dir
@@ -66,6 +167,206 @@ class ParserConfig(Config):
     def set_archive_dir(self, value):
         pass
 
+    @property
+    def quarantine_dir(self):
+        return self._quarantine_dir
+
+    @set_scalar
+    def set_quarantine_dir(self, value):
+        pass
+
+    @property
+    def ledger_file(self):
+        return self._ledger_file
+
+    @set_scalar
+    def set_ledger_file(self, value):
+        pass
+
+    @property
+    def checkpoint_file(self):
+        return self._checkpoint_file
+
+    @set_scalar
+    def set_checkpoint_file(self, value):
+        pass
+
+    @property
+    def max_failures(self):
+        return self._max_failures
+
+    @set_scalar
+    def set_max_failures(self, value):
+        pass
+
+    @property
+    def retry_delay(self):
+        return self._retry_delay
+
+    @set_scalar
+    def set_retry_delay(self, value):
+        pass
+
+    @property
+    def max_retry_delay(self):
+        return self._max_retry_delay
+
+    @set_scalar
+    def set_max_retry_delay(self, value):
+        pass
+
+    @property
+    def claim_dir(self):
+        return self._claim_dir
+
+    @set_scalar
+    def set_claim_dir(self, value):
+        pass
+
+    @property
+    def lease_time(self):
+        return self._lease_time
+
+    @set_scalar
+    def set_lease_time(self, value):
+        pass
+
+    @property
+    def host_id(self):
+        return self._host_id
+
+    @set_scalar
+    def set_host_id(self, value):
+        pass
+
+    @property
+    def sheet_cache_dir(self):
+        return self._sheet_cache_dir
+
+    @set_scalar
+    def set_sheet_cache_dir(self, value):
+        pass
+
+    @property
+    def template_dir(self):
+        return self._template_dir
+
+    @set_scalar
+    def set_template_dir(self, value):
+        pass
+
+    @property
+    def extract_mode(self):
+        return self._extract_mode
+
+    @set_scalar
+    def set_extract_mode(self, value):
+        pass
+
+    @property
+    def sheet_workers(self):
+        return self._sheet_workers
+
+    @set_scalar
+    def set_sheet_workers(self, value):
+        pass
+
+    @property
+    def sheet_parallel_min(self):
+        return self._sheet_parallel_min
+
+    @set_scalar
+    def set_sheet_parallel_min(self, value):
+        pass
+
+    @property
+    def parse_workers(self):
+        return self._parse_workers
+
+    @set_scalar
+    def set_parse_workers(self, value):
+        pass
+
+    @property
+    def schedule_history_file(self):
+        return self._schedule_history_file
+
+    @set_scalar
+    def set_schedule_history_file(self, value):
+        pass
+
+    @property
+    def template_pattern(self):
+        return self._template_pattern
+
+    @set_scalar
+    def set_template_pattern(self, value):
+        pass
+
+    @property
+    def standby_workers(self):
+        return self._standby_workers
+
+    @set_scalar
+    def set_standby_workers(self, value):
+        pass
+
+    @property
+    def worker_max_files(self):
+        return self._worker_max_files
+
+    @set_scalar
+    def set_worker_max_files(self, value):
+        pass
+
+    @property
+    def worker_max_rss(self):
+        return self._worker_max_rss
+
+    @set_scalar
+    def set_worker_max_rss(self, value):
+        pass
+
+    @property
+    def parse_deadline(self):
+        return self._parse_deadline
+
+    @set_scalar
+    def set_parse_deadline(self, value):
+        pass
+
+    @property
+    def max_sheet_mb(self):
+        return self._max_sheet_mb
+
+    @set_scalar
+    def set_max_sheet_mb(self, value):
+        pass
+
+    @property
+    def prefetch_threads(self):
+        return self._prefetch_threads
+
+    @set_scalar
+    def set_prefetch_threads(self, value):
+        pass
+
+    @property
+    def prefetch_files(self):
+        return self._prefetch_files
+
+    @set_scalar
+    def set_prefetch_files(self, value):
+        pass
+
+    @property
+    def prefetch_mb(self):
+        return self._prefetch_mb
+
+    @set_scalar
+    def set_prefetch_mb(self, value):
+        pass
+
     @property
     def skip_sheets(self):
         return self._skip_sheets
@@ -82,6 +383,22 @@ class ParserConfig(Config):
     def set_cells_to_extract(self, value):
         pass
 
+    @property
+    def docx_tables(self):
+        return self._docx_tables
+
+    @set_list
+    def set_docx_tables(self, value):
+        pass
+
+    @property
+    def docx_controls(self):
+        return self._docx_controls
+
+    @set_list
+    def set_docx_controls(self, value):
+        pass
+
     @property
     def cell_order(self):
         return self._cell_order
@@ -122,6 +439,142 @@ class ParserConfig(Config):
     def set_cell_field_thresholds(self, values):
         pass
 
+    @property
+    def sort_by(self):
+        return self._sort_by
+
+    @set_list
+    def set_sort_by(self, values):
+        pass
+
+    @property
+    def dedupe_on(self):
+        return self._dedupe_on
+
+    @set_list
+    def set_dedupe_on(self, values):
+        pass
+
+    @property
+    def version_pattern(self):
+        return self._version_pattern
+
+    @set_scalar
+    def set_version_pattern(self, value):
+        pass
+
+    @property
+    def sort_buffer_rows(self):
+        return self._sort_buffer_rows
+
+    @set_scalar
+    def set_sort_buffer_rows(self, value):
+        pass
+
+    @property
+    def outfile(self):
+        return self._outfile
+
+    @set_scalar
+    def set_outfile(self, value):
+        pass
+
+    @property
+    def delta_file(self):
+        return self._delta_file
+
+    @set_scalar
+    def set_delta_file(self, value):
+        pass
+
+    @property
+    def sqlite_db(self):
+        return self._sqlite_db
+
+    @set_scalar
+    def set_sqlite_db(self, value):
+        pass
+
+    @property
+    def sqlite_table(self):
+        return self._sqlite_table
+
+    @set_scalar
+    def set_sqlite_table(self, value):
+        pass
+
+    @property
+    def parquet_file(self):
+        return self._parquet_file
+
+    @set_scalar
+    def set_parquet_file(self, value):
+        pass
+
+    @property
+    def jsonl_file(self):
+        return self._jsonl_file
+
+    @set_scalar
+    def set_jsonl_file(self, value):
+        pass
+
+    @property
+    def sinks(self):
+        return self._sinks
+
+    @set_list
+    def set_sinks(self, value):
+        pass
+
+    @property
+    def sink_buffer_rows(self):
+        return self._sink_buffer_rows
+
+    @set_scalar
+    def set_sink_buffer_rows(self, value):
+        pass
+
+    @property
+    def partition_by(self):
+        return self._partition_by
+
+    @set_scalar
+    def set_partition_by(self, value):
+        pass
+
+    @property
+    def partition_pattern(self):
+        return self._partition_pattern
+
+    @set_scalar
+    def set_partition_pattern(self, value):
+        pass
+
+    @property
+    def partition_workers(self):
+        return self._partition_workers
+
+    @set_scalar
+    def set_partition_workers(self, value):
+        pass
+
+    @property
+    def columnar_min_rows(self):
+        return self._columnar_min_rows
+
+    @set_scalar
+    def set_columnar_min_rows(self, value):
+        pass
+
+    @property
+    def profiles(self):
+        return self._profiles
+
+    @set_dict
+    def set_profiles(self, value):
+        pass
+
     def parse_config(self):
         """Read config items from the configuration file.
 
@@ -135,20 +588,147 @@ class ParserConfig(Config):
                    'option': 'inbound_dir'},
                   {'section': 'parse',
                    'option': 'file_filter'},
+                  {'section': 'parse',
+                   'option': 'settle_time',
+                   'cast_type': 'float'},
+                  {'section': 'parse',
+                   'option': 'done_marker'},
+                  {'section': 'parse',
+                   'option': 'exclude_dirs',
+                   'is_list': True},
+                  {'section': 'parse',
+                   'option': 'scan_threads',
+                   'cast_type': 'int'},
+                  {'section': 'parse',
+                   'option': 'scan_parallel_min',
+                   'cast_type': 'int'},
+                  {'section': 'parse',
+                   'option': 'intern_max_strings',
+                   'cast_type': 'int'},
                   {'section': 'parse',
                    'option': 'archive_dir'},
+                  {'section': 'parse',
+                   'option': 'quarantine_dir'},
+                  {'section': 'parse',
+                   'option': 'ledger_file'},
+                  {'section': 'parse',
+                   'option': 'checkpoint_file'},
+                  {'section': 'parse',
+                   'option': 'max_failures',
+                   'cast_type': 'int'},
+                  {'section': 'parse',
+                   'option': 'retry_delay',
+                   'cast_type': 'float'},
+                  {'section': 'parse',
+                   'option': 'max_retry_delay',
+                   'cast_type': 'float'},
+                  {'section': 'parse',
+                   'option': 'claim_dir'},
+                  {'section': 'parse',
+                   'option': 'lease_time',
+                   'cast_type': 'float'},
+                  {'section': 'parse',
+                   'option': 'host_id'},
+                  {'section': 'parse',
+                   'option': 'sheet_cache_dir'},
+                  {'section': 'parse',
+                   'option': 'template_dir'},
+                  {'section': 'parse',
+                   'option': 'extract_mode'},
+                  {'section': 'parse',
+                   'option': 'sheet_workers',
+                   'cast_type': 'int'},
+                  {'section': 'parse',
+                   'option': 'sheet_parallel_min',
+                   'cast_type': 'int'},
+                  {'section': 'parse',
+                   'option': 'parse_workers',
+                   'cast_type': 'int'},
+                  {'section': 'parse',
+                   'option': 'schedule_history_file'},
+                  {'section': 'parse',
+                   'option': 'template_pattern'},
+                  {'section': 'parse',
+                   'option': 'standby_workers',
+                   'cast_type': 'int'},
+                  {'section': 'parse',
+                   'option': 'worker_max_files',
+                   'cast_type': 'int'},
+                  {'section': 'parse',
+                   'option': 'worker_max_rss',
+                   'cast_type': 'int'},
+                  {'section': 'parse',
+                   'option': 'parse_deadline',
+                   'cast_type': 'float'},
+                  {'section': 'parse',
+                   'option': 'max_sheet_mb',
+                   'cast_type': 'int'},
+                  {'section': 'parse',
+                   'option': 'prefetch_threads',
+                   'cast_type': 'int'},
+                  {'section': 'parse',
+                   'option': 'prefetch_files',
+                   'cast_type': 'int'},
+                  {'section': 'parse',
+                   'option': 'prefetch_mb',
+                   'cast_type': 'int'},
                   {'section': 'parse',
                    'option': 'skip_sheets',
                    'is_list': True},
                   {'section': 'parse',
                    'option': 'cells_to_extract',
                    'is_list': True},
+                  {'section': 'parse',
+                   'option': 'docx_tables',
+                   'is_list': True},
+                  {'section': 'parse',
+                   'option': 'docx_controls',
+                   'is_list': True},
                   {'section': 'parse',
                    'option': 'cell_order',
                    'is_list': True},
                   {'section': 'parse',
                    'option': 'ignore_if_empty',
-                   'is_list': True}]
+                   'is_list': True},
+                  {'section': 'output',
+                   'option': 'sort_by',
+                   'is_list': True},
+                  {'section': 'output',
+                   'option': 'dedupe_on',
+                   'is_list': True},
+                  {'section': 'output',
+                   'option': 'version_pattern'},
+                  {'section': 'output',
+                   'option': 'sort_buffer_rows',
+                   'cast_type': 'int'},
+                  {'section': 'output',
+                   'option': 'outfile'},
+                  {'section': 'output',
+                   'option': 'delta_file'},
+                  {'section': 'output',
+                   'option': 'sqlite_db'},
+                  {'section': 'output',
+                   'option': 'sqlite_table'},
+                  {'section': 'output',
+                   'option': 'parquet_file'},
+                  {'section': 'output',
+                   'option': 'jsonl_file'},
+                  {'section': 'output',
+                   'option': 'sinks',
+                   'is_list': True},
+                  {'section': 'output',
+                   'option': 'sink_buffer_rows',
+                   'cast_type': 'int'},
+                  {'section': 'output',
+                   'option': 'partition_by'},
+                  {'section': 'output',
+                   'option': 'partition_pattern'},
+                  {'section': 'output',
+                   'option': 'partition_workers',
+                   'cast_type': 'int'},
+                  {'section': 'output',
+                   'option': 'columnar_min_rows',
+                   'cast_type': 'int'}]
 
         for kwarg in kwargs:
             self.parse_scalar_config(**kwarg)
@@ -161,6 +741,42 @@ class ParserConfig(Config):
                    'key_case': 'upper',
                    'cast_type': 'int'},
                   {'section': 'header_field_lengths',
-                   'cast_type': 'int'}]
+                   'cast_type': 'int'},
+                  {'section': 'profiles'}]
         for kwarg in kwargs:
             self.parse_dict_config(**kwarg)
+
+    def load_profiles(self):
+        """Load the extraction profiles defined under the ``[profiles]``
+        section.
+
+        Each profile is a name and the path to a configuration file of
+        its own.  Only the extraction and output items of a profile's
+        configuration file are used.  Relative paths are relative to the
+        directory of this configuration file.
+
+        **Returns:**
+            :class:`collections.OrderedDict` of the form::
+
+                {<name>: <baip_parser.ParserConfig>, ...}
+
+            ordered by profile name
+
+        """
+        profiles = collections.OrderedDict()
+
+        for name, config_file in sorted(self.profiles.iteritems()):
+            if (not os.path.isabs(config_file) and
+                    self.config_filepath is not None):
+                config_file = os.path.join(
+                    os.path.dirname(self.config_filepath), config_file)
+
+            if not os.path.exists(config_file):
+                log.error('Profile "%s" config "%s" does not exist: skipping' %
+                          (name, config_file))
+                continue
+
+            profiles[name] = ParserConfig(config_file)
+
+        return profiles
+
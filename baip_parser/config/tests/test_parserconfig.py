@@ -49,11 +49,166 @@ class TestParserConfig(unittest2.TestCase):
         msg = 'ParserConfig.file_filter not as expected'
         self.assertEqual(received, expected, msg)
 
+        received = self._conf.settle_time
+        expected = 5.0
+        msg = 'ParserConfig.settle_time not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.done_marker
+        expected = '.done'
+        msg = 'ParserConfig.done_marker not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.exclude_dirs
+        expected = ['archive', '*.tmp']
+        msg = 'ParserConfig.exclude_dirs not as expected'
+        self.assertListEqual(received, expected, msg)
+
+        received = self._conf.scan_threads
+        expected = 4
+        msg = 'ParserConfig.scan_threads not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.scan_parallel_min
+        expected = 256
+        msg = 'ParserConfig.scan_parallel_min not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.intern_max_strings
+        expected = 50000
+        msg = 'ParserConfig.intern_max_strings not as expected'
+        self.assertEqual(received, expected, msg)
+
         received = self._conf.archive_dir
         expected = '/var/tmp/baip-parser/archive'
         msg = 'ParserConfig.archive_dir not as expected'
         self.assertEqual(received, expected, msg)
 
+        received = self._conf.quarantine_dir
+        expected = '/var/tmp/baip-parser/quarantine'
+        msg = 'ParserConfig.quarantine_dir not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.ledger_file
+        expected = '/var/tmp/baip-parser/ledger.json'
+        msg = 'ParserConfig.ledger_file not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.checkpoint_file
+        expected = '/var/tmp/baip-parser/checkpoint.json'
+        msg = 'ParserConfig.checkpoint_file not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.max_failures
+        expected = 5
+        msg = 'ParserConfig.max_failures not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.retry_delay
+        expected = 30.0
+        msg = 'ParserConfig.retry_delay not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.max_retry_delay
+        expected = 600.0
+        msg = 'ParserConfig.max_retry_delay not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.claim_dir
+        expected = '/var/tmp/baip-parser/claims'
+        msg = 'ParserConfig.claim_dir not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.lease_time
+        expected = 120.0
+        msg = 'ParserConfig.lease_time not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.host_id
+        expected = 'banana'
+        msg = 'ParserConfig.host_id not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.sheet_cache_dir
+        expected = '/var/tmp/baip-parser/cache'
+        msg = 'ParserConfig.sheet_cache_dir not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.template_dir
+        expected = '/var/tmp/baip-parser/templates'
+        msg = 'ParserConfig.template_dir not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.extract_mode
+        expected = 'metadata'
+        msg = 'ParserConfig.extract_mode not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.sheet_workers
+        expected = 4
+        msg = 'ParserConfig.sheet_workers not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.sheet_parallel_min
+        expected = 100
+        msg = 'ParserConfig.sheet_parallel_min not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.parse_workers
+        expected = 8
+        msg = 'ParserConfig.parse_workers not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.schedule_history_file
+        expected = '/var/tmp/baip-parser/schedule.json'
+        msg = 'ParserConfig.schedule_history_file not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.template_pattern
+        expected = r'^BA-(\w+)-'
+        msg = 'ParserConfig.template_pattern not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.standby_workers
+        expected = 2
+        msg = 'ParserConfig.standby_workers not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.worker_max_files
+        expected = 500
+        msg = 'ParserConfig.worker_max_files not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.worker_max_rss
+        expected = 1024
+        msg = 'ParserConfig.worker_max_rss not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.parse_deadline
+        expected = 300.0
+        msg = 'ParserConfig.parse_deadline not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.max_sheet_mb
+        expected = 256
+        msg = 'ParserConfig.max_sheet_mb not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.prefetch_threads
+        expected = 2
+        msg = 'ParserConfig.prefetch_threads not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.prefetch_files
+        expected = 8
+        msg = 'ParserConfig.prefetch_files not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.prefetch_mb
+        expected = 64
+        msg = 'ParserConfig.prefetch_mb not as expected'
+        self.assertEqual(received, expected, msg)
+
         received = self._conf.skip_sheets
         expected = ['ControlSheet', 'Instructions', 'WorkbookLog']
         msg = 'ParserConfig.skip_lists not as expected'
@@ -64,6 +219,16 @@ class TestParserConfig(unittest2.TestCase):
         msg = 'ParserConfig.cells_to_extract not as expected'
         self.assertListEqual(received, expected, msg)
 
+        received = self._conf.docx_tables
+        expected = ['Summary']
+        msg = 'ParserConfig.docx_tables not as expected'
+        self.assertListEqual(received, expected, msg)
+
+        received = self._conf.docx_controls
+        expected = ['WellName', 'Author']
+        msg = 'ParserConfig.docx_controls not as expected'
+        self.assertListEqual(received, expected, msg)
+
         received = self._conf.cell_order
         expected = ['B2', 'B1']
         msg = 'ParserConfig.cell_order not as expected'
@@ -91,6 +256,91 @@ class TestParserConfig(unittest2.TestCase):
         msg = 'ParserConfig.cell_field_thresholds not as expected'
         self.assertDictEqual(received, expected, msg)
 
+        received = self._conf.sort_by
+        expected = ['sheet_name']
+        msg = 'ParserConfig.sort_by not as expected'
+        self.assertListEqual(received, expected, msg)
+
+        received = self._conf.dedupe_on
+        expected = ['sheet_name', 'name']
+        msg = 'ParserConfig.dedupe_on not as expected'
+        self.assertListEqual(received, expected, msg)
+
+        received = self._conf.version_pattern
+        expected = '-v(\d+)\.xlsx$'
+        msg = 'ParserConfig.version_pattern not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.sort_buffer_rows
+        expected = 5000
+        msg = 'ParserConfig.sort_buffer_rows not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.outfile
+        expected = '/var/tmp/baip-parser/out.csv'
+        msg = 'ParserConfig.outfile not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.delta_file
+        expected = '/var/tmp/baip-parser/delta.json'
+        msg = 'ParserConfig.delta_file not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.sqlite_db
+        expected = '/var/tmp/baip-parser/cells.db'
+        msg = 'ParserConfig.sqlite_db not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.sqlite_table
+        expected = 'extracted'
+        msg = 'ParserConfig.sqlite_table not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.parquet_file
+        expected = '/var/tmp/baip-parser/out.parquet'
+        msg = 'ParserConfig.parquet_file not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.jsonl_file
+        expected = '/var/tmp/baip-parser/sheets.jsonl'
+        msg = 'ParserConfig.jsonl_file not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.sinks
+        expected = ['csv', 'parquet', 'sqlite']
+        msg = 'ParserConfig.sinks not as expected'
+        self.assertListEqual(received, expected, msg)
+
+        received = self._conf.sink_buffer_rows
+        expected = 5000
+        msg = 'ParserConfig.sink_buffer_rows not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.partition_by
+        expected = 'region'
+        msg = 'ParserConfig.partition_by not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.partition_pattern
+        expected = r'^BA-(\w+)-'
+        msg = 'ParserConfig.partition_pattern not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.partition_workers
+        expected = 8
+        msg = 'ParserConfig.partition_workers not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.columnar_min_rows
+        expected = 5000
+        msg = 'ParserConfig.columnar_min_rows not as expected'
+        self.assertEqual(received, expected, msg)
+
+        received = self._conf.profiles
+        expected = {'finance': 'baip-parser-finance.conf'}
+        msg = 'ParserConfig.profiles not as expected'
+        self.assertDictEqual(received, expected, msg)
+
     def tearDown(self):
         self._conf = None
         del self._conf
@@ -99,3 +349,27 @@ class TestParserConfig(unittest2.TestCase):
     def tearDownClass(cls):
         cls._file = None
         del cls._file
+
+    def test_load_profiles(self):
+        """Load the extraction profiles.
+        """
+        self._conf.set_config_file(self._file)
+        self._conf.parse_config()
+
+        profiles = self._conf.load_profiles()
+
+        received = profiles.keys()
+        expected = ['finance']
+        msg = 'Loaded profile names not as expected'
+        self.assertListEqual(received, expected, msg)
+
+        received = profiles['finance'].cells_to_extract
+        expected = ['B1', 'B5']
+        msg = 'Profile cells_to_extract not as expected'
+        self.assertListEqual(received, expected, msg)
+
+        received = profiles['finance'].outfile
+        expected = '/var/tmp/baip-parser/finance.csv'
+        msg = 'Profile outfile not as expected'
+        self.assertEqual(received, expected, msg)
+
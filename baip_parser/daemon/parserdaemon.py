@@ -6,10 +6,11 @@ facility for the BAIP parser.
 __all__ = ["ParserDaemon"]
 
 import os
+import re
 import signal
 import time
-import re
 import tempfile
+import collections
 
 import baip_parser
 import daemoniser
@@ -20,10 +21,30 @@ class ParserDaemon(daemoniser.Daemon):
     """:class:`ParserDaemon`
 
     """
+    # Parse failures that will recur on every attempt.
+    FATAL_FAILURES = ('oversized', 'deadline_exceeded')
+
     dry = False
     batch = False
     conf = None
     inbound_dir = None
+    stats = None
+    ledger = None
+    claimer = None
+    sheet_cache = None
+    templates = None
+    scheduler = None
+    profiles = None
+    supervisor = None
+    prefetcher = None
+    scanner = None
+    sniffer = None
+    checkpoint = None
+    jsonl_writer = None
+    interner = None
+    parsed_workbooks = None
+    inbound_workbooks = None
+    _observed = {}
 
     def __init__(self,
                  pidfile,
@@ -42,6 +63,8 @@ class ParserDaemon(daemoniser.Daemon):
         self.dry = dry
         self.batch = batch
         self.conf = conf
+        self.stats = collections.Counter()
+        self._observed = {}
 
         # If a file is provided on the command line, we want to
         # force a single iteration.
@@ -78,27 +101,103 @@ class ParserDaemon(daemoniser.Daemon):
             a file system search)
 
         """
-        # Check if we process the argument or the attribute filename
-        # value.
-        if files_to_process is None:
-            if self.filename is not None:
-                files_to_process = [self.filename]
-            else:
-                filter = self.conf.file_filter
-                files_to_process = self.source_files(file_filter=filter)
+        files_override = files_to_process
+
+        if self.ledger is None:
+            self.ledger = self.init_ledger()
+
+        if self.claimer is None and self.conf.claim_dir is not None:
+            self.claimer = self.init_claimer()
+            self.claimer.start()
+
+        if self.sheet_cache is None and self.conf.sheet_cache_dir is not None:
+            self.sheet_cache = baip_parser.SheetCache(self.conf.sheet_cache_dir)
+
+        if self.templates is None and self.conf.template_dir is not None:
+            self.templates = baip_parser.Templates(self.conf.template_dir)
+
+        if self.scheduler is None:
+            self.scheduler = self.init_scheduler()
+
+        if self.sniffer is None:
+            self.sniffer = self.init_sniffer()
+
+        if self.interner is None and self.conf.intern_max_strings:
+            self.interner = baip_parser.Interner(self.conf.intern_max_strings)
+
+        if self.profiles is None:
+            self.profiles = self.init_profiles()
+
+        if self.prefetcher is None and self.conf.prefetch_threads:
+            self.prefetcher = self.init_prefetcher()
+
+        if (self.checkpoint is None and
+                self.batch and
+                not self.dry and
+                self.conf.checkpoint_file is not None):
+            self.checkpoint = self.init_checkpoint()
+
+        if (self.jsonl_writer is None and
+                not self.dry and
+                self.conf.jsonl_file is not None):
+            jsonl_file = self.conf.jsonl_file
+            self.jsonl_writer = baip_parser.JsonLinesWriter(jsonl_file)
+
+        if self.conf.parse_deadline and not self.conf.parse_workers:
+            log.warn('parse_deadline is only enforced by parse_workers')
+
+        if self.conf.extract_mode not in (None, 'cells', 'metadata'):
+            log.warn('Unknown extract_mode "%s": extracting cells' %
+                     self.conf.extract_mode)
 
         while not event.isSet():
-            results = []
+            self.stats.clear()
+            self.parsed_workbooks = set()
+            self.inbound_workbooks = None
+
+            # Check if we process the argument or the attribute filename
+            # value.
+            files_to_process = files_override
+            if files_to_process is None:
+                if self.filename is not None:
+                    files_to_process = [self.filename]
+                else:
+                    filter = self.conf.file_filter
+                    files_to_process = self.source_files(file_filter=filter,
+                                                         sniff=True,
+                                                         settle=True)
+                    if self.claimer is not None:
+                        self.claimer.purge(files_to_process)
+
+            ready = []
             for file_to_process in files_to_process:
-                log.info('Processing file: %s' % file_to_process)
-                parser = baip_parser.Parser()
-                parser.open(file_to_process)
-                parser.cells_to_extract = self.conf.cells_to_extract
-                parser.skip_sheets = self.conf.skip_sheets
+                if not self.ledger.ready(file_to_process):
+                    self.stats['deferred'] += 1
+                    continue
 
-                results.append(parser.parse_sheets())
+                ready.append(file_to_process)
 
-            self.dump(results, self.dry)
+            if self.jsonl_writer is not None:
+                self.jsonl_writer.open()
+            results = self.parse_files(ready)
+            if self.jsonl_writer is not None:
+                self.jsonl_writer.close()
+
+            try:
+                for name, conf in self.profiles.iteritems():
+                    if name is not None:
+                        log.info('Writing output for profile "%s"' % name)
+                    self.dump(results, self.dry, conf=conf)
+            except Exception:
+                self.settle_claims(output=False)
+                raise
+            self.settle_claims(output=True)
+            self.log_stats()
+
+            # The batch output is complete so the checkpoint is spent.
+            if self.checkpoint is not None:
+                self.checkpoint.clear()
+                self.checkpoint = None
 
             if self.dry:
                 print('Dry run iteration complete')
@@ -109,11 +208,558 @@ class ParserDaemon(daemoniser.Daemon):
             else:
                 time.sleep(self.conf.thread_sleep)
 
-    def source_files(self, directory=None, file_filter=None):
+        if self.supervisor is not None:
+            self.supervisor.stop()
+
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+
+        if self.claimer is not None:
+            self.claimer.stop()
+
+    def settle_claims(self, output):
+        """Settle the claims held on the files parsed this cycle.
+
+        A claim is only marked ``done`` once the file's rows have been
+        output by every profile.  If the daemon stops before then, the
+        claim's lease expires and another host picks the file up.  Only
+        the files that :meth:`dispatch` handed to this host's workers
+        are held, so the rest of the batch stays open to other hosts.
+
+        **Args:**
+            *output*: ``True`` if the output was written.  If ``False``,
+            the claims are released so that the files are parsed again
+
+        """
+        if self.claimer is not None:
+            for filepath in self.claimer.held:
+                if output:
+                    self.claimer.complete(filepath)
+                else:
+                    self.claimer.release(filepath)
+
+    def init_ledger(self):
+        """Create the :class:`baip_parser.Ledger` that tracks failing
+        files as per the configuration settings.  Quarantined files are
+        kept relative to the :attr:`inbound_dir` override if set.
+
+        **Returns:**
+            :class:`baip_parser.Ledger` object
+
+        """
+        inbound_dir = self.inbound_dir
+        if inbound_dir is None:
+            inbound_dir = self.conf.inbound_dir
+
+        ledger = baip_parser.Ledger(self.conf.ledger_file)
+        ledger.max_failures = self.conf.max_failures
+        ledger.retry_delay = self.conf.retry_delay
+        ledger.max_retry_delay = self.conf.max_retry_delay
+        ledger.quarantine_dir = self.conf.quarantine_dir
+        ledger.inbound_dir = inbound_dir
+
+        return ledger
+
+    def init_checkpoint(self):
+        """Create the :class:`baip_parser.Checkpoint` that journals the
+        files completed by a batch run as per the configuration settings.
+
+        **Returns:**
+            :class:`baip_parser.Checkpoint` object
+
+        """
+        return baip_parser.Checkpoint(self.conf.checkpoint_file)
+
+    def init_claimer(self):
+        """Create the :class:`baip_parser.Claimer` that coordinates file
+        claims with other hosts sharing the inbound directory.
+
+        **Returns:**
+            :class:`baip_parser.Claimer` object
+
+        """
+        root = self.inbound_dir
+        if root is None:
+            root = self.conf.inbound_dir
+
+        claimer = baip_parser.Claimer(self.conf.claim_dir,
+                                      root=root,
+                                      host_id=self.conf.host_id)
+        claimer.lease_time = self.conf.lease_time
+
+        return claimer
+
+    def init_scheduler(self):
+        """Create the :class:`baip_parser.Scheduler` that orders files
+        across the parse workers as per the configuration settings.
+
+        **Returns:**
+            :class:`baip_parser.Scheduler` object
+
+        """
+        return baip_parser.Scheduler(self.conf.schedule_history_file,
+                                     self.conf.template_pattern)
+
+    def init_supervisor(self):
+        """Create the :class:`baip_parser.Supervisor` that runs the parse
+        workers as per the configuration settings.
+
+        **Returns:**
+            :class:`baip_parser.Supervisor` object
+
+        """
+        return baip_parser.Supervisor(self.conf.parse_workers,
+                                      standby=self.conf.standby_workers,
+                                      max_files=self.conf.worker_max_files,
+                                      max_rss=self.conf.worker_max_rss)
+
+    def init_scanner(self):
+        """Create the :class:`baip_parser.Scanner` that sources files
+        from the inbound directory as per the configuration settings.
+
+        **Returns:**
+            :class:`baip_parser.Scanner` object
+
+        """
+        return baip_parser.Scanner(self.conf.exclude_dirs,
+                                   threads=self.conf.scan_threads,
+                                   parallel_min=self.conf.scan_parallel_min)
+
+    def init_sniffer(self):
+        """Create the :class:`baip_parser.Sniffer` that classifies the
+        sourced files.
+
+        If ``file_filter`` admits legacy ``.xls`` workbooks but
+        :mod:`xlrd` is not installed, a warning is logged once and
+        ``xls`` files are rejected by the sniffer rather than failing
+        (and eventually being quarantined) one by one.
+
+        **Returns:**
+            :class:`baip_parser.Sniffer` object
+
+        """
+        sniffer = baip_parser.Sniffer()
+
+        file_filter = self.conf.file_filter
+        if (not baip_parser.XlsEngine.available() and
+                (file_filter is None or
+                 re.match(file_filter, 'workbook.xls'))):
+            log.warn('file_filter admits .xls but xlrd is not installed: '
+                     'xls files will be rejected')
+            sniffer.accepted_kinds = [x for x in sniffer.accepted_kinds
+                                      if x != 'xls']
+
+        return sniffer
+
+    def init_prefetcher(self):
+        """Create the :class:`baip_parser.Prefetcher` that reads upcoming
+        workbooks ahead of the parser as per the configuration settings.
+
+        **Returns:**
+            :class:`baip_parser.Prefetcher` object
+
+        """
+        budget = self.conf.prefetch_mb * 1024 * 1024
+
+        return baip_parser.Prefetcher(self.conf.prefetch_threads,
+                                      depth=self.conf.prefetch_files,
+                                      budget=budget)
+
+    def init_profiles(self):
+        """Load the extraction profiles as per
+        :meth:`baip_parser.ParserConfig.load_profiles`.
+
+        **Returns:**
+            :class:`collections.OrderedDict` of profile name to
+            :class:`baip_parser.ParserConfig`.  If no profiles are
+            defined, :attr:`conf` is the only profile (named ``None``)
+
+        """
+        profiles = self.conf.load_profiles()
+        if not profiles:
+            profiles[None] = self.conf
+        else:
+            log.info('Extraction profiles: %s' % ', '.join(profiles.keys()))
+
+        return profiles
+
+    def cells_to_extract(self):
+        """The union of the ``cells_to_extract`` of all profiles so that
+        each workbook is parsed once for all profiles.
+
+        **Returns:**
+            list of cells in the order first seen
+
+        """
+        profiles = self.profiles
+        if profiles is None:
+            profiles = {None: self.conf}
+
+        cells = []
+        for conf in profiles.itervalues():
+            cells.extend([x for x in conf.cells_to_extract if x not in cells])
+
+        return cells
+
+    def docx_tables(self):
+        """The union of the ``docx_tables`` of all profiles.
+
+        **Returns:**
+            list of table names in the order first seen.  Empty if any
+            profile extracts all tables
+
+        """
+        profiles = self.profiles
+        if profiles is None:
+            profiles = {None: self.conf}
+
+        tables = []
+        for conf in profiles.itervalues():
+            if not conf.docx_tables:
+                tables = []
+                break
+            tables.extend([x for x in conf.docx_tables if x not in tables])
+
+        return tables
+
+    def docx_controls(self):
+        """The union of the ``docx_controls`` of all profiles.
+
+        **Returns:**
+            list of content control tags in the order first seen
+
+        """
+        profiles = self.profiles
+        if profiles is None:
+            profiles = {None: self.conf}
+
+        controls = []
+        for conf in profiles.itervalues():
+            controls.extend([x for x in conf.docx_controls
+                             if x not in controls])
+
+        return controls
+
+    def skip_sheets(self):
+        """The worksheets that every profile skips.  A worksheet that
+        is wanted by any profile is parsed and is then dropped from the
+        output of the profiles that skip it by :meth:`profile_results`.
+
+        **Returns:**
+            list of worksheet names in the order first seen
+
+        """
+        profiles = self.profiles
+        if profiles is None:
+            profiles = {None: self.conf}
+
+        skipped = None
+        for conf in profiles.itervalues():
+            names = set([x.lower() for x in conf.skip_sheets])
+            if skipped is None:
+                skipped = [x for x in conf.skip_sheets]
+            else:
+                skipped = [x for x in skipped if x.lower() in names]
+
+        return skipped or []
+
+    @staticmethod
+    def profile_results(results, conf):
+        """Drop the worksheets that the profile *conf* skips from
+        *results*, along with the ``docx`` report sections that are not
+        in its ``docx_tables`` (or its content controls section if it has
+        no ``docx_controls``).
+
+        **Args:**
+            *results*: list of :meth:`baip_parser.Parser.parse_sheets`
+            structures
+
+            *conf*: the profile's :class:`baip_parser.ParserConfig`
+
+        **Returns:**
+            list of the *results* structures without the skipped
+            worksheets
+
+        """
+        skip = set([x.lower() for x in conf.skip_sheets])
+        tables = set([x.lower() for x in conf.docx_tables])
+
+        filtered = []
+        for result in results:
+            docx = any([x.split('|', 1)[0].lower().endswith('.docx')
+                        for x in result.keys()[:1]])
+            if not skip and not docx:
+                filtered.append(result)
+                continue
+
+            kept = collections.OrderedDict()
+            for key, values in result.iteritems():
+                sheet = key.split('|', 1)[-1]
+                if sheet.lower() in skip:
+                    continue
+                if docx:
+                    if sheet == baip_parser.DocxEngine.CONTROLS:
+                        if not conf.docx_controls:
+                            continue
+                    elif tables and sheet.lower() not in tables:
+                        continue
+                kept[key] = values
+            filtered.append(kept)
+
+        return filtered
+
+    def init_parser(self):
+        """Create a :class:`baip_parser.Parser` as per the configuration
+        settings.
+
+        **Returns:**
+            :class:`baip_parser.Parser` object
+
+        """
+        parser = baip_parser.Parser()
+        parser.cells_to_extract = self.cells_to_extract()
+        parser.skip_sheets = self.skip_sheets()
+        parser.docx_tables = self.docx_tables()
+        parser.docx_controls = self.docx_controls()
+        parser.cache = self.sheet_cache
+        parser.templates = self.templates
+        parser.sheet_workers = self.conf.sheet_workers
+        parser.sheet_parallel_min = self.conf.sheet_parallel_min
+        parser.max_sheet_bytes = self.conf.max_sheet_mb * 1024 * 1024
+        parser.interner = self.interner
+        parser.metadata_only = self.conf.extract_mode == 'metadata'
+
+        return parser
+
+    def parse_files(self, files):
+        """Parse *files* across ``parse_workers`` supervised worker
+        processes.
+
+        Files are dispatched largest first as per
+        :meth:`baip_parser.Scheduler.schedule` so that a large workbook
+        does not start last and hold up the whole batch.  Worker
+        processes only parse.  The ledger, claims and statistics are
+        maintained here as each file completes.  If ``parse_workers`` is
+        0, files are parsed within the daemon process.
+
+        Files completed by an earlier run of the batch (as per the
+        :attr:`checkpoint`) are not parsed again.  Their rows are read
+        back from the checkpoint instead.
+
+        Repeated strings across the batch share a single copy through
+        the :attr:`interner`.  Its table is released once the batch has
+        been parsed.
+
+        If a :attr:`claimer` is set, each file is claimed as per
+        :meth:`dispatch` only as it is handed to a worker, so that the
+        other hosts can claim the rest of the batch in the meantime.
+        Files claimed elsewhere are skipped.
+
+        **Args:**
+            *files*: list of files to parse
+
+        **Returns:**
+            list of the :meth:`baip_parser.Parser.parse_sheets`
+            structures in the order of *files*
+
+        """
+        results = {}
+
+        resumed = []
+        if self.checkpoint is not None:
+            resumed = [x for x in files
+                       if self.checkpoint.completed(x) and self.dispatch(x)]
+            for filepath in resumed:
+                results[filepath] = self.checkpoint.result(filepath)
+                if (self.interner is not None and
+                        results[filepath] is not None):
+                    results[filepath] = self.interner.intern_result(
+                        results[filepath])
+                self.stats['resumed'] += 1
+                if (self.parsed_workbooks is not None and
+                        results[filepath] is not None):
+                    self.parsed_workbooks.add(os.path.basename(filepath))
+                if (self.jsonl_writer is not None and
+                        results[filepath] is not None):
+                    self.jsonl_writer.write(results[filepath])
+
+        workers = self.conf.parse_workers
+        scheduled = self.scheduler.schedule([x for x in files
+                                             if x not in results], workers)
+
+        if self.prefetcher is not None:
+            self.prefetcher.schedule([x[0] for x in scheduled])
+
+        start = time.time()
+        if workers > 0 and scheduled:
+            if self.supervisor is None:
+                self.supervisor = self.init_supervisor()
+
+            parser = self.init_parser()
+            # Supervised workers cannot start sheet workers of their own.
+            parser.sheet_workers = 0
+            # Worker results are pickled back, so they are interned
+            # against the batch table here rather than by the workers.
+            parser.interner = None
+            tasks = ((parser, x, y) for x, y in scheduled
+                     if self.dispatch(x))
+
+            deadline = self.conf.parse_deadline or None
+            for task, outcome, failure in self.supervisor.map(
+                    _parse_workbook, tasks, deadline=deadline):
+                if outcome is None:
+                    kind, error = failure
+                    outcome = (task[1], task[2], None, error, {kind: 1}, 0.0)
+                elif self.interner is not None and outcome[2] is not None:
+                    outcome = (outcome[:2] +
+                               (self.interner.intern_result(outcome[2]),) +
+                               outcome[3:])
+                results[outcome[0]] = self.parsed(*outcome)
+
+            self.stats.update(self.supervisor.stats)
+            self.supervisor.stats.clear()
+        else:
+            for file_to_process, cost in scheduled:
+                if self.dispatch(file_to_process):
+                    results[file_to_process] = self.parse_file(
+                        file_to_process, cost)
+
+        if self.prefetcher is not None:
+            self.prefetcher.clear()
+            self.stats.update(self.prefetcher.stats)
+            self.prefetcher.stats.clear()
+
+        if scheduled:
+            log.info('Parsed %d files in %.1fs' %
+                     (len([x for x, _ in scheduled if x in results]),
+                      time.time() - start))
+            self.scheduler.save()
+
+        if self.interner is not None:
+            self.stats.update(self.interner.stats)
+            if self.interner.stats['strings_seen']:
+                self.stats['strings_dedup_pct'] = int(round(
+                    self.interner.ratio * 100))
+            self.interner.stats.clear()
+            self.interner.clear()
+
+        return [results[x] for x in files if results.get(x) is not None]
+
+    def dispatch(self, file_to_process):
+        """Claim *file_to_process* against the :attr:`claimer` (if set)
+        just before it is parsed.
+
+        A file claimed elsewhere is tallied as ``claimed_elsewhere`` and
+        dropped from the :attr:`prefetcher`.
+
+        **Returns:**
+            Boolean ``True`` if the file should be parsed by this host.
+            Boolean ``False`` otherwise
+
+        """
+        status = True
+
+        if (self.claimer is not None and
+                not self.claimer.claim(file_to_process)):
+            self.stats['claimed_elsewhere'] += 1
+            if self.prefetcher is not None:
+                self.prefetcher.done(file_to_process)
+            status = False
+
+        return status
+
+    def parse_file(self, file_to_process, cost=None):
+        """Open and parse a single workbook.
+
+        Any failure is recorded against the :attr:`ledger` so that a
+        single bad file never aborts the batch.
+
+        **Args:**
+            *file_to_process*: fully qualified name of the workbook
+
+        **Kwargs:**
+            *cost*: the workbook's :meth:`baip_parser.Scheduler.cost`
+            used to learn the parse rate
+
+        **Returns:**
+            the :meth:`baip_parser.Parser.parse_sheets` structure or
+            ``None`` if the workbook could not be parsed
+
+        """
+        task = (self.init_parser(), file_to_process, cost)
+
+        return self.parsed(*_parse_workbook(task))
+
+    def parsed(self, file_to_process, cost, result, error, stats, elapsed):
+        """Record the outcome of parsing *file_to_process* against the
+        :attr:`ledger`, the file's claim, the :attr:`scheduler` and
+        :attr:`stats`.
+
+        Files that fail with one of :attr:`FATAL_FAILURES` (as tallied in
+        *stats*) are quarantined straight away.  Either way, the file is
+        journalled as complete against the :attr:`checkpoint`.
+
+        The worksheets of a successful parse are streamed to the
+        :attr:`jsonl_writer` straight away and the workbook is added to
+        the cycle's :attr:`parsed_workbooks`.
+
+        **Returns:**
+            *result*
+
+        """
+        self.stats.update(stats)
+
+        if error is None:
+            self.stats['parsed'] += 1
+            self.ledger.succeeded(file_to_process)
+            if self.parsed_workbooks is not None:
+                self.parsed_workbooks.add(os.path.basename(file_to_process))
+            if self.jsonl_writer is not None and result is not None:
+                self.jsonl_writer.write(result)
+            if self.scheduler is not None and cost is not None:
+                self.scheduler.record(file_to_process, cost, elapsed)
+        else:
+            self.stats['failed'] += 1
+            fatal = any([stats.get(x) for x in self.FATAL_FAILURES])
+            if self.ledger.failed(file_to_process,
+                                  error,
+                                  dry=self.dry,
+                                  fatal=fatal):
+                self.stats['quarantined'] += 1
+
+        if self.claimer is not None and error is not None:
+            self.claimer.release(file_to_process)
+
+        if self.prefetcher is not None:
+            self.prefetcher.done(file_to_process)
+
+        if self.checkpoint is not None:
+            self.checkpoint.record(file_to_process, result)
+
+        return result
+
+    def source_files(self,
+                     directory=None,
+                     file_filter=None,
+                     sniff=False,
+                     settle=False):
         """Checks inbound directory (defined by the
         :attr:`geoutils.IngestConfig.inbound_dir` config option) for valid
         NITF files to be processed.
 
+        **Kwargs:**
+            *sniff*: if ``True``, classify each matching file via
+            :class:`baip_parser.Sniffer` and reject files that are not
+            workbooks before they reach :meth:`baip_parser.Parser.open`.
+            Rejections are tallied against :attr:`stats`
+
+            *settle*: if ``True``, only return files that have a
+            ``done_marker`` sidecar (if configured) and have stopped
+            changing as per :meth:`settled_files`
+
+        The names of the scanned files are kept as the cycle's
+        :attr:`inbound_workbooks`.
+
         **Returns:**
             list of matching files
 
@@ -127,42 +773,199 @@ class ParserDaemon(daemoniser.Daemon):
             directory_to_check = self.inbound_dir
             self.batch = True
 
-        reg_c = None
-        if file_filter is not None:
-            reg_c = re.compile(file_filter)
+        done_marker = None
+        if settle:
+            done_marker = self.conf.done_marker
+
+        if self.scanner is None:
+            self.scanner = self.init_scanner()
 
         log.debug('Sourcing files at "%s" with filter "%s"' %
                   (directory_to_check, file_filter))
-        for dirpath, dirnames, filenames in os.walk(directory_to_check):
-            for filename in filenames:
-                if reg_c is not None:
-                    reg_match = reg_c.match(os.path.basename(filename))
-                    if not reg_match:
-                        continue
+        files_to_process = self.scanner.scan(directory_to_check,
+                                             file_filter=file_filter,
+                                             done_marker=done_marker)
+        self.stats.update(self.scanner.stats)
+        self.scanner.stats.clear()
+        self.inbound_workbooks = set([os.path.basename(x)
+                                      for x in files_to_process])
+
+        if settle:
+            files_to_process = self.settled_files(files_to_process,
+                                                  wait=self.batch)
+
+        if sniff:
+            if self.sniffer is None:
+                self.sniffer = self.init_sniffer()
 
-                files_to_process.append(os.path.join(dirpath, filename))
+            sniffed_files = []
+            for filepath in files_to_process:
+                accepted, kind = self.sniffer.accept(filepath)
+                if accepted:
+                    sniffed_files.append(filepath)
+                else:
+                    self.stats['rejected_%s' % kind] += 1
+            files_to_process = sniffed_files
 
         return files_to_process
 
-    def dump(self, results, dry=False):
+    def settled_files(self, files, wait=False, now=None):
+        """Filter out *files* that may still be in the process of being
+        written.
+
+        A file is settled once its modification time is at least
+        ``settle_time`` seconds old and its size and modification time
+        are unchanged since the previous poll.  Each file is stat'ed
+        once per call.
+
+        **Args:**
+            *files*: list of candidate files
+
+        **Kwargs:**
+            *wait*: if ``True``, block until the unsettled files could
+            have settled and check them once more (used by batch runs
+            that do not get a next poll)
+
+            *now*: override the current time (epoch seconds)
+
+        **Returns:**
+            list of settled files
+
+        """
+        settle_time = self.conf.settle_time
+        if not settle_time:
+            return files
+
+        if now is None:
+            now = time.time()
+
+        settled = []
+        pending = []
+        observed = {}
+        for filepath in files:
+            try:
+                stat = os.stat(filepath)
+            except OSError as error:
+                log.debug('Unable to stat "%s": %s' % (filepath, error))
+                self.stats['vanished'] += 1
+                continue
+
+            signature = (stat.st_size, stat.st_mtime)
+            previous = self._observed.get(filepath)
+            observed[filepath] = signature
+
+            if (now - stat.st_mtime >= settle_time and
+                    (previous is None or previous == signature)):
+                settled.append(filepath)
+            else:
+                pending.append((filepath, stat.st_mtime))
+
+        # Only remember the files seen in this poll.
+        self._observed = observed
+
+        if pending and wait:
+            youngest = max([x[1] for x in pending])
+            delay = min(max(settle_time - (now - youngest), 0), settle_time)
+            log.info('Waiting %.1fs for %d unsettled files' %
+                     (delay, len(pending)))
+            time.sleep(delay)
+            settled.extend(self.settled_files([x[0] for x in pending]))
+        elif pending:
+            log.debug('%d files not yet settled' % len(pending))
+            self.stats['unsettled'] += len(pending)
+
+        return settled
+
+    def log_stats(self):
+        """Summarise the current cycle's :attr:`stats` counters.
+
+        """
+        summary = ', '.join(['%s=%d' % (k, v)
+                             for k, v in sorted(self.stats.iteritems())])
+        log.info('Cycle statistics: %s' % (summary or 'none'))
+
+    def dump(self, results, dry=False, conf=None):
         """Present the results data structure into a format that can be
         readily output by the :class:`baip_parser.Writer`.
 
+        The rows are streamed once to each of the output sinks from
+        :meth:`init_sinks` via a :class:`baip_parser.Fanout`.  Batches
+        of at least ``columnar_min_rows`` worksheets are built by
+        :meth:`columnar_rows` rather than :meth:`rows`.  The worksheets
+        in the profile's ``skip_sheets`` are dropped first.
+
         **Args:**
             *results*: the data to write
 
             *dry*: only report, do not execute
 
+            *conf*: the profile's :class:`baip_parser.ParserConfig` that
+            drives the output (default :attr:`conf`)
+
+        **Returns:**
+            the CSV output file name or ``None`` if there is no CSV sink
+
         """
-        data = []
+        if conf is None:
+            conf = self.conf
+
+        results = self.profile_results(results, conf)
+
+        sinks = self.init_sinks(conf)
+
+        outfile = None
+        writers = dict(sinks)
+        if writers.get('csv') is not None:
+            outfile = writers['csv'].outfile
+
+        if not dry:
+            sheets = sum([len(x) for x in results])
+            if sinks and conf.columnar_min_rows and \
+                    sheets >= conf.columnar_min_rows:
+                log.info('Building %d rows by column' % sheets)
+                rows = self.columnar_rows(results, sinks[0][1], conf)
+                for _, writer in sinks:
+                    writer.truncate = False
+                self.stats['columnar_rows'] += sheets
+            else:
+                rows = self.rows(results, conf)
+
+            fanout = baip_parser.Fanout(sinks, conf.sink_buffer_rows)
+            fanout.write(rows, word_boundary=True)
+            self.stats.update(fanout.stats)
+            if outfile is not None and writers['csv'].delta is not None:
+                self.stats.update(writers['csv'].delta.stats)
+        else:
+            log.info('Skipping dump in dry mode')
+
+        return outfile
+
+    def rows(self, results, conf=None):
+        """Generator that flattens the results data structure into the
+        output rows as per the *conf* cell rules.
+
+        **Args:**
+            *results*: list of :meth:`baip_parser.Parser.parse_sheets`
+            structures
+
+            *conf*: the profile's :class:`baip_parser.ParserConfig`
+            (default :attr:`conf`)
+
+        **Returns:**
+            generator of ``(<row>, <key>)`` tuples
+
+        """
+        if conf is None:
+            conf = self.conf
+
         for result in results:
             for key, value in result.iteritems():
-                reduced_values = self.length_check(value)
+                reduced_values = self.length_check(value, conf)
 
-                if not self.skip_set(reduced_values):
+                if not self.skip_set(reduced_values, conf):
                     line_item = []
-                    for cell in self.conf.cell_order:
-                        tmp_value = reduced_values[cell]
+                    for cell in conf.cell_order:
+                        tmp_value = reduced_values.get(cell)
 
                         if isinstance(tmp_value, unicode):
                             # Remove the non-breaking hyphen.
@@ -174,25 +977,125 @@ class ParserDaemon(daemoniser.Daemon):
 
                         line_item.append(tmp_value)
 
-                    data.append(tuple(line_item))
-
-        writer = baip_parser.Writer()
-        outfile_obj = tempfile.NamedTemporaryFile(suffix='.csv')
-        outfile = outfile_obj.name
-        outfile_obj.close()
-        writer.outfile = outfile
-        writer.header_field_lengths = self.conf.header_field_lengths
-        writer.cell_field_thresholds = self.conf.cell_field_thresholds
-        writer.headers = writer.header_aliases(self.conf.cell_order,
-                                               self.conf.cell_map)
-        if not dry:
-            writer.write(data, word_boundary=True)
-        else:
-            log.info('Skipping dump in dry mode')
+                    yield (tuple(line_item), key)
 
-        return outfile
+    @staticmethod
+    def columnar_rows(results, writer, conf):
+        """Columnar alternative to :meth:`rows` that applies the *conf*
+        cell rules and the *writer* truncation to the whole batch one
+        column at a time via a :class:`baip_parser.Columns`.
+
+        **Args:**
+            *results*: list of :meth:`baip_parser.Parser.parse_sheets`
+            structures
+
+            *writer*: the :class:`baip_parser.Writer` whose
+            :attr:`header_field_lengths` apply
+
+            *conf*: the profile's :class:`baip_parser.ParserConfig`
+
+        **Returns:**
+            generator of truncated ``(<row>, <key>)`` tuples
+
+        """
+        cells = (conf.cell_order +
+                 conf.ignore_if_empty +
+                 conf.cell_field_thresholds.keys())
+        columns = baip_parser.Columns(results, cells)
+
+        columns.length_check(conf.cell_field_thresholds)
+        columns.skip_empty(conf.ignore_if_empty)
+        columns.substitute(conf.cell_order)
+
+        lengths = [writer.header_field_lengths.get(x) for x in writer.headers]
+        truncated = columns.truncate(conf.cell_order,
+                                     lengths,
+                                     word_boundary=True)
+
+        return columns.rows(truncated)
 
-    def skip_set(self, data):
+    def init_sinks(self, conf):
+        """Create the output sinks named by the *conf* ``sinks`` option.
+
+        If no ``sinks`` are named, the output is written to CSV and also
+        to SQLite if ``sqlite_db`` is set.
+
+        **Args:**
+            *conf*: the profile's :class:`baip_parser.ParserConfig`
+
+        **Returns:**
+            list of ``(<name>, <writer>)`` tuples
+
+        """
+        names = conf.sinks
+        if not names:
+            names = ['csv']
+            if conf.sqlite_db is not None:
+                names.append('sqlite')
+
+        sinks = []
+        for name in names:
+            writer = None
+            if name == 'csv':
+                outfile = conf.outfile
+                if outfile is None:
+                    outfile_obj = tempfile.NamedTemporaryFile(suffix='.csv')
+                    outfile = outfile_obj.name
+                    outfile_obj.close()
+                writer = baip_parser.Writer(outfile)
+                if conf.delta_file is not None:
+                    writer.delta = baip_parser.Delta(conf.delta_file)
+                    writer.delta.parsed = self.parsed_workbooks
+                    writer.delta.present = self.inbound_workbooks
+            elif name == 'sqlite':
+                if conf.sqlite_db is not None:
+                    writer = baip_parser.SqliteWriter(conf.sqlite_db,
+                                                      conf.sqlite_table)
+                else:
+                    log.error('Sink "sqlite" requires sqlite_db: skipping')
+            elif name == 'parquet':
+                if conf.parquet_file is not None:
+                    writer = baip_parser.ParquetWriter(conf.parquet_file)
+                else:
+                    log.error('Sink "parquet" requires parquet_file: '
+                              'skipping')
+            else:
+                log.error('Unknown output sink "%s": skipping' % name)
+
+            if writer is not None:
+                sinks.append((name, self.init_writer(writer, conf)))
+
+        return sinks
+
+    @staticmethod
+    def init_writer(writer, conf):
+        """Apply the output settings of *conf* to *writer*.
+
+        **Args:**
+            *writer*: :class:`baip_parser.Writer` (or backend) object
+
+            *conf*: the profile's :class:`baip_parser.ParserConfig`
+
+        **Returns:**
+            *writer*
+
+        """
+        writer.header_field_lengths = conf.header_field_lengths
+        writer.cell_field_thresholds = conf.cell_field_thresholds
+        writer.headers = writer.header_aliases(conf.cell_order,
+                                               conf.cell_map)
+        writer.sort_by = conf.sort_by
+        writer.dedupe_on = conf.dedupe_on
+        writer.version_pattern = conf.version_pattern
+        writer.sort_buffer_rows = conf.sort_buffer_rows
+        writer.partition_by = conf.partition_by
+        writer.partition_pattern = conf.partition_pattern
+        writer.partition_workers = conf.partition_workers
+        writer.partition_buffer_rows = conf.sink_buffer_rows
+
+        return writer
+
+    def skip_set(self, data, conf=None):
         """Check the dictionary based *data* structure and see if we
         can fiter out keys with empty values.
 
@@ -202,21 +1105,27 @@ class ParserDaemon(daemoniser.Daemon):
         **Args:**
             *data:* the input dictionary data structure to check
 
+            *conf*: the profile's :class:`baip_parser.ParserConfig`
+            (default :attr:`conf`)
+
         **Returns:**
             Boolean ``True`` if data structure should be skipped.
             Boolean ``False`` otherwise
 
         """
+        if conf is None:
+            conf = self.conf
+
         log.debug('Checking if row can be skipped ...')
         skip = True
 
-        for empty_field in self.conf.ignore_if_empty:
+        for empty_field in conf.ignore_if_empty:
             if data.get(empty_field) is not None:
                 skip = False
                 log.debug('setting skip to: %s' % skip)
                 break
 
-        if skip and not(len(self.conf.ignore_if_empty)):
+        if skip and not(len(conf.ignore_if_empty)):
             log.debug('No fields to check have been defined')
             skip = False
 
@@ -224,7 +1133,7 @@ class ParserDaemon(daemoniser.Daemon):
 
         return skip
 
-    def length_check(self, data):
+    def length_check(self, data, conf=None):
         """Determines the field value length and checks against the
         column threshold to see whether the column value is acceptable.
 
@@ -240,17 +1149,63 @@ class ParserDaemon(daemoniser.Daemon):
 
                 {<cell>: <value>}
 
+            *conf*: the profile's :class:`baip_parser.ParserConfig`
+            (default :attr:`conf`)
+
         **Returns:**
             the updated (if length threshold is breached) dictionary
             values
 
         """
+        if conf is None:
+            conf = self.conf
+
         new_data = dict(data)
 
-        for cell, length in self.conf.cell_field_thresholds.iteritems():
+        for cell, length in conf.cell_field_thresholds.iteritems():
             if new_data.get(cell) is not None:
                 # We have a value.  Check the length.
                 if len(new_data.get(cell)) <= length:
                     new_data[cell] = None
 
         return new_data
+
+
+def _parse_workbook(task):
+    """Parse worker task that opens and parses a single workbook.
+
+    **Args:**
+        *task*: tuple of the form ``(<parser>, <filepath>, <cost>)``
+        where *parser* is a configured :class:`baip_parser.Parser`
+
+    **Returns:**
+        tuple of the form ``(<filepath>, <cost>, <result>, <error>,
+        <stats>, <elapsed>)`` where *error* is ``None`` on success
+
+    """
+    parser, file_to_process, cost = task
+
+    log.info('Processing file: %s' % file_to_process)
+    start = time.time()
+
+    result = None
+    error = None
+    try:
+        if parser.open(file_to_process):
+            result = parser.parse_sheets()
+        elif parser.stats['oversized']:
+            error = 'worksheets over the uncompressed size limit'
+        else:
+            error = 'unable to open workbook'
+    except Exception as err:  # pylint: disable=W0703
+        error = '%s: %s' % (type(err).__name__, err)
+    finally:
+        parser.close()
+
+    return (file_to_process,
+            cost,
+            result,
+            error,
+            parser.stats,
+            time.time() - start)
+
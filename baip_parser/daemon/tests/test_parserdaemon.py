@@ -4,8 +4,15 @@
 """
 import unittest2
 import os
+import time
+import tempfile
+import threading
+import sqlite3
+import collections
+import openpyxl
 
 import baip_parser
+import baip_parser.xlsengine
 from filer.files import remove_files
 
 
@@ -103,6 +110,760 @@ class TestParserDaemon(unittest2.TestCase):
         msg = 'Sourcing files with xlsx filter error'
         self.assertListEqual(sorted(received), sorted(expected), msg)
 
+    def test_source_files_sniff_rejects_non_workbooks(self):
+        """Walk directory for files: sniff rejects non-workbooks.
+        """
+        # Given a source directory that contains placeholder files
+        # that are not valid zip archives.
+        source_dir = os.path.join('baip_parser',
+                                  'daemon',
+                                  'tests',
+                                  'files',
+                                  'BA_reports')
+
+        # When sourcing files with sniffing enabled.
+        self._parserd.stats.clear()
+        received = self._parserd.source_files(directory=source_dir,
+                                              sniff=True)
+
+        # Then no files should be returned.
+        msg = 'Sniffed files should all be rejected'
+        self.assertListEqual(received, [], msg)
+
+        # And the rejections should be tallied in the cycle statistics.
+        received = dict((k, v) for k, v in self._parserd.stats.iteritems()
+                        if k.startswith('rejected_'))
+        expected = {'rejected_lock_file': 1, 'rejected_not_zip': 8}
+        msg = 'Sniff rejection statistics error'
+        self.assertDictEqual(received, expected, msg)
+
+    def test_source_files_sniff_rejects_xls_without_xlrd(self):
+        """Walk directory for files: xls rejected up front without xlrd.
+        """
+        # Given a source directory that contains a legacy xls workbook
+        source_dir = tempfile.mkdtemp()
+        xls_file = os.path.join(source_dir, 'BA-CLM-v01.xls')
+        xls_fh = open(xls_file, 'wb')
+        xls_fh.write(baip_parser.Sniffer.OLE_MAGIC)
+        xls_fh.close()
+
+        # And a file filter that admits xls workbooks
+        old_file_filter = self._parserd.conf.file_filter
+        self._parserd.conf.file_filter = r'[^~].*\.xls[xb]?$'
+
+        # And no xlrd
+        old_xlrd = baip_parser.xlsengine.xlrd
+        baip_parser.xlsengine.xlrd = None
+
+        # When sourcing files with sniffing enabled
+        self._parserd.stats.clear()
+        try:
+            received = self._parserd.source_files(directory=source_dir,
+                                                  file_filter=r'.*\.xls$',
+                                                  sniff=True)
+        finally:
+            baip_parser.xlsengine.xlrd = old_xlrd
+            self._parserd.conf.file_filter = old_file_filter
+
+        # Then the xls workbook should not be handed to the parser
+        msg = 'xls workbook should be rejected without xlrd'
+        self.assertListEqual(received, [], msg)
+        msg = 'xls rejection not counted'
+        self.assertEqual(self._parserd.stats['rejected_xls'], 1, msg)
+
+        # Clean up.
+        remove_files(xls_file)
+        os.removedirs(source_dir)
+
+    def test_settled_files(self):
+        """Settled files: only unchanged files are returned.
+        """
+        # Given a settle time
+        old_settle_time = self._parserd.conf.settle_time
+        self._parserd.conf.settle_time = 10.0
+
+        # And a file that was last modified a minute ago
+        test_file_obj = tempfile.NamedTemporaryFile(suffix='.xlsx')
+        test_file = test_file_obj.name
+        test_file_obj.close()
+        fh = open(test_file, 'wb')
+        fh.write('partial')
+        fh.close()
+        now = time.time()
+        os.utime(test_file, (now - 60, now - 60))
+
+        # When I check for settled files
+        received = self._parserd.settled_files([test_file], now=now)
+
+        # Then the file should be settled
+        msg = 'Unchanged file should be settled'
+        self.assertListEqual(received, [test_file], msg)
+
+        # And when the file grows before the next poll
+        fh = open(test_file, 'ab')
+        fh.write(' and more')
+        fh.close()
+        os.utime(test_file, (now - 60, now - 60))
+        received = self._parserd.settled_files([test_file], now=now)
+
+        # Then the file should not be settled
+        msg = 'Changed file should not be settled'
+        self.assertListEqual(received, [], msg)
+
+        # And when the file has just been written to
+        fh = open(test_file, 'ab')
+        fh.write(' and more')
+        fh.close()
+        received = self._parserd.settled_files([test_file])
+
+        # Then the file should not be settled
+        msg = 'Recently modified file should not be settled'
+        self.assertListEqual(received, [], msg)
+
+        # Clean up.
+        self._parserd.conf.settle_time = old_settle_time
+        remove_files(test_file)
+
+    def test_source_files_done_marker(self):
+        """Walk directory for files: done marker sidecar.
+        """
+        # Given a source directory with a single sidecar marker
+        source_dir = tempfile.mkdtemp()
+        files = [os.path.join(source_dir, 'a.xlsx'),
+                 os.path.join(source_dir, 'a.xlsx.done'),
+                 os.path.join(source_dir, 'b.xlsx')]
+        for filepath in files:
+            open(filepath, 'wb').close()
+
+        # And a done marker suffix
+        old_done_marker = self._parserd.conf.done_marker
+        self._parserd.conf.done_marker = '.done'
+
+        # When sourcing files that must be settled
+        received = self._parserd.source_files(directory=source_dir,
+                                              file_filter='.*\.xlsx$',
+                                              settle=True)
+
+        # Then only the file with the sidecar should be returned
+        expected = [os.path.join(source_dir, 'a.xlsx')]
+        msg = 'Sourcing files with done marker error'
+        self.assertListEqual(received, expected, msg)
+
+        # Clean up.
+        self._parserd.conf.done_marker = old_done_marker
+        remove_files(files)
+        os.removedirs(source_dir)
+
+    def test_parse_file_failure_recorded(self):
+        """Parse a single file: failure recorded in the ledger.
+        """
+        # Given a file that is not a valid workbook
+        test_file = os.path.join('baip_parser',
+                                 'daemon',
+                                 'tests',
+                                 'files',
+                                 'BA_reports',
+                                 'M02',
+                                 'BA-M02-AS-v07.xlsx')
+
+        # And a failure ledger
+        self._parserd.ledger = self._parserd.init_ledger()
+        self._parserd.stats.clear()
+
+        # When I parse the file
+        received = self._parserd.parse_file(test_file)
+
+        # Then no result should be returned
+        msg = 'Failed parse should not return a result'
+        self.assertIsNone(received, msg)
+
+        # And the failure should be recorded
+        msg = 'Failed parse not recorded in the ledger'
+        self.assertEqual(self._parserd.stats['failed'], 1, msg)
+        received = self._parserd.ledger.entries[test_file]['failures']
+        self.assertEqual(received, 1, msg)
+
+        # And the file should be deferred
+        msg = 'Failed file should not be ready'
+        self.assertFalse(self._parserd.ledger.ready(test_file), msg)
+
+    def test_init_ledger_inbound_dir_override(self):
+        """Initialise the ledger: inbound directory override.
+        """
+        # Given an inbound directory override
+        old_inbound_dir = self._parserd.inbound_dir
+        inbound_dir = os.path.join('baip_parser', 'tests', 'files')
+        self._parserd.inbound_dir = inbound_dir
+
+        # When the ledger is initialised
+        ledger = self._parserd.init_ledger()
+
+        # Then the ledger should use the override
+        msg = 'Ledger inbound_dir should honour the override'
+        self.assertEqual(ledger.inbound_dir, inbound_dir, msg)
+
+        # Clean up.
+        self._parserd.inbound_dir = old_inbound_dir
+
+    def test_parse_files_across_workers(self):
+        """Parse files across parse workers.
+        """
+        # Given workbooks of different sizes
+        source_dir = tempfile.mkdtemp()
+        files = []
+        for name, rows in [('BA-CLM-v01.xlsx', 1),
+                           ('BA-M02-v01.xlsx', 500),
+                           ('BA-FIN-v01.xlsx', 50)]:
+            workbook = openpyxl.Workbook()
+            ws = workbook.active
+            ws.title = name[:6]
+            for row in range(1, rows + 1):
+                ws.cell(row=row, column=2).value = '%s-%d' % (name, row)
+            files.append(os.path.join(source_dir, name))
+            workbook.save(files[-1])
+
+        # And parse workers
+        old_cells_to_extract = self._parserd.conf.cells_to_extract
+        self._parserd.conf.cells_to_extract = ['B1']
+        old_parse_workers = self._parserd.conf.parse_workers
+        self._parserd.conf.parse_workers = 2
+        self._parserd.ledger = self._parserd.init_ledger()
+        self._parserd.scheduler = self._parserd.init_scheduler()
+        self._parserd.stats.clear()
+
+        # And read-ahead prefetch
+        self._parserd.prefetcher = baip_parser.Prefetcher(threads=1,
+                                                          depth=2)
+
+        # When I parse the files
+        received = self._parserd.parse_files(files)
+
+        # Then the results should be returned in file order
+        expected = [{'%s|%s' % (x, x[:6]): {'B1': '%s-1' % x}}
+                    for x in ['BA-CLM-v01.xlsx',
+                              'BA-M02-v01.xlsx',
+                              'BA-FIN-v01.xlsx']]
+        msg = 'Parse files across workers error'
+        self.assertListEqual([dict(x) for x in received], expected, msg)
+
+        # And the parse rate should have been learned
+        msg = 'Parse rate not learned'
+        self.assertEqual(self._parserd.stats['parsed'], 3, msg)
+        self.assertIn('*', self._parserd.scheduler.rates, msg)
+
+        # And the prefetcher should have been released
+        msg = 'Prefetcher should not hold files after the cycle'
+        self.assertListEqual(self._parserd.prefetcher.held, [], msg)
+
+        # Clean up.
+        self._parserd.supervisor.stop()
+        self._parserd.prefetcher.stop()
+        self._parserd.conf.cells_to_extract = old_cells_to_extract
+        self._parserd.conf.parse_workers = old_parse_workers
+        remove_files(files)
+        os.removedirs(source_dir)
+
+    def test_parse_files_interned(self):
+        """Parse files: repeated strings shared across the batch.
+        """
+        # Given workbooks that repeat a string value
+        source_dir = tempfile.mkdtemp()
+        files = []
+        for name in ['BA-CLM-v01.xlsx', 'BA-NIC-v01.xlsx']:
+            workbook = openpyxl.Workbook()
+            ws = workbook.active
+            ws.title = name[:6]
+            ws['B1'] = 'Walloon Coal Measures'
+            files.append(os.path.join(source_dir, name))
+            workbook.save(files[-1])
+
+        # And parse workers with a batch interner
+        old_cells_to_extract = self._parserd.conf.cells_to_extract
+        self._parserd.conf.cells_to_extract = ['B1']
+        old_parse_workers = self._parserd.conf.parse_workers
+        self._parserd.conf.parse_workers = 2
+        self._parserd.ledger = self._parserd.init_ledger()
+        self._parserd.scheduler = self._parserd.init_scheduler()
+        self._parserd.interner = baip_parser.Interner()
+        self._parserd.stats.clear()
+
+        # When I parse the files
+        received = self._parserd.parse_files(files)
+
+        # Then the repeated value should be shared across workbooks
+        values = [x.values()[0]['B1'] for x in received]
+        msg = 'Repeated value not shared across the batch'
+        self.assertIs(values[0], values[1], msg)
+
+        # And the dedup ratio should be reported
+        received = self._parserd.stats['strings_dedup_pct']
+        expected = 33
+        msg = 'Dedup ratio statistic error'
+        self.assertEqual(received, expected, msg)
+
+        # And the batch table should have been released
+        msg = 'Interner table not released after the batch'
+        self.assertEqual(self._parserd.interner.size, 0, msg)
+
+        # Clean up.
+        self._parserd.supervisor.stop()
+        self._parserd.conf.cells_to_extract = old_cells_to_extract
+        self._parserd.conf.parse_workers = old_parse_workers
+        remove_files(files)
+        os.removedirs(source_dir)
+
+    def test_claims_settled_after_output(self):
+        """Claims are only completed once the output is written.
+        """
+        # Given a good and a bad workbook and a claimer for this host
+        source_dir = tempfile.mkdtemp()
+        claim_dir = os.path.join(source_dir, 'claims')
+        files = [os.path.join(source_dir, x) for x in ['BA-CLM-v01.xlsx',
+                                                       'BA-NIC-v01.xlsx']]
+        openpyxl.Workbook().save(files[0])
+        open(files[1], 'w').close()
+        self._parserd.claimer = baip_parser.Claimer(claim_dir,
+                                                    root=source_dir)
+        self._parserd.ledger = self._parserd.init_ledger()
+        self._parserd.scheduler = self._parserd.init_scheduler()
+
+        # When the files are parsed
+        self._parserd.parse_files(files)
+
+        # Then only the good workbook's claim should still be held
+        msg = 'Parsed claim should be held until the output is written'
+        self.assertListEqual(self._parserd.claimer.held, files[:1], msg)
+        other_host = baip_parser.Claimer(claim_dir,
+                                         root=source_dir,
+                                         host_id='other_host')
+        received = [other_host.claim(x) for x in files]
+        msg = 'Other host claim error before the output'
+        self.assertListEqual(received, [False, True], msg)
+        other_host.release(files[1])
+
+        # And a failed output should release the claim
+        self._parserd.settle_claims(output=False)
+        msg = 'Claim not released after a failed output'
+        self.assertTrue(other_host.claim(files[0]), msg)
+        other_host.release(files[0])
+
+        # And a written output should complete the claim
+        self._parserd.claimer.claim(files[0])
+        self._parserd.settle_claims(output=True)
+        now = time.time() + other_host.lease_time + 1
+        msg = 'Completed claim should not be claimed again'
+        self.assertFalse(other_host.claim(files[0], now=now), msg)
+
+        # Clean up.
+        self._parserd.claimer = None
+        remove_files(files)
+        for filename in os.listdir(claim_dir):
+            os.remove(os.path.join(claim_dir, filename))
+        os.rmdir(claim_dir)
+        os.rmdir(source_dir)
+
+    def test_claims_shared_across_hosts(self):
+        """Hosts that share an inbound directory share the batch.
+        """
+        # Given a batch of workbooks
+        source_dir = tempfile.mkdtemp()
+        claim_dir = os.path.join(source_dir, 'claims')
+        files = []
+        for index in range(6):
+            files.append(os.path.join(source_dir, 'BA-CLM-v%02d.xlsx' % index))
+            openpyxl.Workbook().save(files[-1])
+
+        # And two hosts that claim from the same claim directory
+        hosts = []
+        for host_id in ['host_a', 'host_b']:
+            conf = baip_parser.ParserConfig()
+            conf.cells_to_extract = ['B1']
+            parserd = baip_parser.ParserDaemon(pidfile=None, conf=conf)
+            parserd.claimer = baip_parser.Claimer(claim_dir,
+                                                  root=source_dir,
+                                                  host_id=host_id)
+            parserd.ledger = parserd.init_ledger()
+            parserd.scheduler = parserd.init_scheduler()
+
+            def slow_parse_file(file_to_process, cost=None, parserd=parserd):
+                result = baip_parser.ParserDaemon.parse_file(parserd,
+                                                             file_to_process,
+                                                             cost)
+                time.sleep(0.2)
+                return result
+            parserd.parse_file = slow_parse_file
+            hosts.append(parserd)
+
+        # When both hosts parse the batch at the same time
+        threads = [threading.Thread(target=x.parse_files, args=(files,))
+                   for x in hosts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Then each host should have parsed a share of the files
+        received = [x.stats['parsed'] for x in hosts]
+        msg = 'Both hosts should parse a share of the batch: %s' % received
+        self.assertTrue(all(received), msg)
+
+        # And each file should have been parsed once
+        held = [x.claimer.held for x in hosts]
+        msg = 'Files parsed by more than one host'
+        self.assertEqual(sum(received), len(files), msg)
+        self.assertListEqual(sorted(held[0] + held[1]), files, msg)
+
+        # Clean up.
+        for parserd in hosts:
+            parserd.settle_claims(output=False)
+        remove_files(files)
+        os.rmdir(claim_dir)
+        os.rmdir(source_dir)
+
+    def test_parse_files_metadata(self):
+        """Parse files: workbook metadata only.
+        """
+        # Given workbooks of several worksheets
+        source_dir = tempfile.mkdtemp()
+        files = []
+        for name in ['BA-CLM-v01.xlsx', 'BA-NIC-v01.xlsx']:
+            workbook = openpyxl.Workbook()
+            workbook.properties.creator = 'Lou'
+            workbook.active.title = name[:6]
+            workbook.create_sheet(title='Instructions')
+            files.append(os.path.join(source_dir, name))
+            workbook.save(files[-1])
+
+        # And a metadata only extract
+        old_cells_to_extract = self._parserd.conf.cells_to_extract
+        self._parserd.conf.cells_to_extract = ['creator', 'sheet_names']
+        self._parserd.conf.extract_mode = 'metadata'
+        self._parserd.ledger = self._parserd.init_ledger()
+        self._parserd.scheduler = self._parserd.init_scheduler()
+        self._parserd.stats.clear()
+
+        # When I parse the files
+        received = self._parserd.parse_files(files)
+
+        # Then there should be one row per workbook
+        expected = [{'BA-CLM-v01.xlsx|Metadata':
+                     {'creator': 'Lou',
+                      'sheet_names': u'BA-CLM|Instructions'}},
+                    {'BA-NIC-v01.xlsx|Metadata':
+                     {'creator': 'Lou',
+                      'sheet_names': u'BA-NIC|Instructions'}}]
+        msg = 'Metadata parse error'
+        self.assertListEqual([dict(x) for x in received], expected, msg)
+        msg = 'Metadata parse not counted'
+        self.assertEqual(self._parserd.stats['metadata_parsed'], 2, msg)
+
+        # Clean up.
+        self._parserd.conf.cells_to_extract = old_cells_to_extract
+        self._parserd.conf.extract_mode = None
+        remove_files(files)
+        os.removedirs(source_dir)
+
+    def test_parse_files_resume_from_checkpoint(self):
+        """Resume an interrupted batch from its checkpoint.
+        """
+        # Given workbooks
+        source_dir = tempfile.mkdtemp()
+        files = []
+        for name in ['BA-CLM-v01.xlsx', 'BA-M02-v01.xlsx', 'BA-FIN-v01.xlsx']:
+            workbook = openpyxl.Workbook()
+            ws = workbook.active
+            ws.title = name[:6]
+            ws['B1'] = name
+            files.append(os.path.join(source_dir, name))
+            workbook.save(files[-1])
+
+        old_cells_to_extract = self._parserd.conf.cells_to_extract
+        self._parserd.conf.cells_to_extract = ['B1']
+        self._parserd.ledger = self._parserd.init_ledger()
+        self._parserd.scheduler = self._parserd.init_scheduler()
+        checkpoint_file = os.path.join(source_dir, 'checkpoint.json')
+
+        # And a batch that was interrupted after the first workbook
+        self._parserd.checkpoint = baip_parser.Checkpoint(checkpoint_file)
+        self._parserd.parse_files(files[:1])
+        self._parserd.checkpoint.close()
+
+        # When the batch is run again with JSON Lines output
+        self._parserd.checkpoint = baip_parser.Checkpoint(checkpoint_file)
+        jsonl_file = os.path.join(source_dir, 'sheets.jsonl')
+        self._parserd.jsonl_writer = baip_parser.JsonLinesWriter(jsonl_file)
+        self._parserd.jsonl_writer.open()
+        self._parserd.stats.clear()
+        received = self._parserd.parse_files(files)
+        self._parserd.jsonl_writer.close()
+
+        # Then the results should match an uninterrupted run
+        expected = [{'%s|%s' % (x, x[:6]): {'B1': x}}
+                    for x in ['BA-CLM-v01.xlsx',
+                              'BA-M02-v01.xlsx',
+                              'BA-FIN-v01.xlsx']]
+        msg = 'Resumed batch results error'
+        self.assertListEqual([dict(x) for x in received], expected, msg)
+
+        # And only the outstanding workbooks should have been parsed
+        received = (self._parserd.stats['resumed'],
+                    self._parserd.stats['parsed'])
+        expected = (1, 2)
+        msg = 'Completed workbooks should not be parsed again'
+        self.assertTupleEqual(received, expected, msg)
+
+        # And every worksheet should have been streamed
+        fh = open(jsonl_file)
+        received = len(fh.readlines())
+        fh.close()
+        expected = 3
+        msg = 'Streamed worksheet count error'
+        self.assertEqual(received, expected, msg)
+
+        # Clean up.
+        self._parserd.checkpoint.clear()
+        self._parserd.checkpoint = None
+        self._parserd.jsonl_writer = None
+        self._parserd.conf.cells_to_extract = old_cells_to_extract
+        remove_files(files + [jsonl_file])
+        os.removedirs(source_dir)
+
+    def test_profiles_single_pass(self):
+        """Parse once and route the results to each profile.
+        """
+        # Given a workbook
+        source_dir = tempfile.mkdtemp()
+        workbook_file = os.path.join(source_dir, 'BA-CLM-v01.xlsx')
+        workbook = openpyxl.Workbook()
+        ws = workbook.active
+        ws.title = 'CLM-121-001'
+        ws['B1'] = 'CLM-121-001'
+        ws['B2'] = 'Walloon'
+        ws['B5'] = 1000
+        workbook.save(workbook_file)
+
+        # And two extraction profiles with their own outputs
+        geology = baip_parser.ParserConfig()
+        geology.cells_to_extract = ['B1', 'B2']
+        geology.cell_order = ['B1', 'B2']
+        geology.cell_map = {'B1': ['sheet_name'], 'B2': ['formation']}
+        geology.outfile = os.path.join(source_dir, 'geology.csv')
+
+        finance = baip_parser.ParserConfig()
+        finance.cells_to_extract = ['B1', 'B5']
+        finance.cell_order = ['B5', 'B1']
+        finance.cell_map = {'B1': ['sheet_name'], 'B5': ['budget']}
+        finance.outfile = os.path.join(source_dir, 'finance.csv')
+
+        self._parserd.profiles = collections.OrderedDict([('finance', finance),
+                                                          ('geology', geology)])
+        self._parserd.ledger = self._parserd.init_ledger()
+        self._parserd.scheduler = self._parserd.init_scheduler()
+
+        # When I parse the workbook
+        results = self._parserd.parse_files([workbook_file])
+
+        # Then the union of the profiles' cells should be extracted once
+        received = results
+        expected = [{'BA-CLM-v01.xlsx|CLM-121-001': {'B1': 'CLM-121-001',
+                                                     'B5': 1000,
+                                                     'B2': 'Walloon'}}]
+        msg = 'Union of profile cells not extracted'
+        self.assertListEqual([dict(x) for x in received], expected, msg)
+
+        # And each profile should get its own output
+        for conf in self._parserd.profiles.itervalues():
+            self._parserd.dump(results, conf=conf)
+
+        received = [open(x.outfile).read().splitlines()
+                    for x in [finance, geology]]
+        expected = [['budget,sheet_name', '1000,CLM-121-001'],
+                    ['sheet_name,formation', 'CLM-121-001,Walloon']]
+        msg = 'Profile output error'
+        self.assertListEqual(received, expected, msg)
+
+        # Clean up.
+        remove_files([workbook_file, finance.outfile, geology.outfile])
+        os.removedirs(source_dir)
+
+    def test_profiles_own_skip_sheets(self):
+        """Each profile skips its own worksheets.
+        """
+        # Given a workbook with a worksheet per discipline
+        source_dir = tempfile.mkdtemp()
+        workbook_file = os.path.join(source_dir, 'BA-CLM-v01.xlsx')
+        workbook = openpyxl.Workbook()
+        for index, name in enumerate(['Geology', 'Finance', 'Instructions']):
+            if index:
+                ws = workbook.create_sheet(title=name)
+            else:
+                ws = workbook.active
+                ws.title = name
+            ws['B1'] = name
+        workbook.save(workbook_file)
+
+        # And two profiles that skip different worksheets
+        geology = baip_parser.ParserConfig()
+        geology.cells_to_extract = ['B1']
+        geology.cell_order = ['B1']
+        geology.cell_map = {'B1': ['sheet']}
+        geology.skip_sheets = ['finance', 'Instructions']
+        geology.outfile = os.path.join(source_dir, 'geology.csv')
+
+        finance = baip_parser.ParserConfig()
+        finance.cells_to_extract = ['B1']
+        finance.cell_order = ['B1']
+        finance.cell_map = {'B1': ['sheet']}
+        finance.skip_sheets = ['Geology', 'instructions']
+        finance.outfile = os.path.join(source_dir, 'finance.csv')
+
+        self._parserd.profiles = collections.OrderedDict([('geology', geology),
+                                                          ('finance', finance)])
+        self._parserd.ledger = self._parserd.init_ledger()
+        self._parserd.scheduler = self._parserd.init_scheduler()
+
+        # When I parse the workbook
+        results = self._parserd.parse_files([workbook_file])
+
+        # Then only the worksheet skipped by every profile is skipped
+        received = sorted(results[0].keys())
+        expected = ['BA-CLM-v01.xlsx|Finance', 'BA-CLM-v01.xlsx|Geology']
+        msg = 'Worksheets wanted by a profile not parsed'
+        self.assertListEqual(received, expected, msg)
+
+        # And each profile should only output its own worksheets
+        for conf in self._parserd.profiles.itervalues():
+            self._parserd.dump(results, conf=conf)
+
+        received = [open(x.outfile).read().splitlines()
+                    for x in [geology, finance]]
+        expected = [['sheet', 'Geology'], ['sheet', 'Finance']]
+        msg = 'Profile skip_sheets not applied'
+        self.assertListEqual(received, expected, msg)
+
+        # Clean up.
+        self._parserd.profiles = None
+        remove_files([workbook_file, finance.outfile, geology.outfile])
+        os.removedirs(source_dir)
+
+    def test_profiles_docx_sections(self):
+        """Each profile outputs its own docx tables and content controls.
+        """
+        # Given a profile of docx tables and a profile of content controls
+        tables = baip_parser.ParserConfig()
+        tables.cells_to_extract = ['A2']
+        tables.cell_order = ['A2']
+        tables.docx_tables = ['Summary']
+
+        controls = baip_parser.ParserConfig()
+        controls.cell_order = ['A2', 'WellName']
+        controls.docx_controls = ['WellName']
+
+        self._parserd.profiles = collections.OrderedDict([('tables', tables),
+                                                          ('controls',
+                                                           controls)])
+
+        # Then the parser should extract the sections of both profiles
+        parser = self._parserd.init_parser()
+        received = (parser.cells_to_extract,
+                    parser.docx_tables,
+                    parser.docx_controls)
+        expected = (['A2'], [], ['WellName'])
+        msg = 'Parser docx sections error'
+        self.assertTupleEqual(received, expected, msg)
+
+        # And each profile should only keep its own sections
+        results = [{'BA-CLM-v01.docx|Summary': {'A2': u'CLM-121'},
+                    'BA-CLM-v01.docx|Table2': {'A2': u'North'},
+                    'BA-CLM-v01.docx|Controls': {'WellName': u'Walloon'}},
+                   {'BA-CLM-v01.xlsx|Controls': {'A2': u'CLM-122'}}]
+        received = [sorted(x.keys())
+                    for x in self._parserd.profile_results(results, tables)]
+        expected = [['BA-CLM-v01.docx|Summary'], ['BA-CLM-v01.xlsx|Controls']]
+        msg = 'docx tables profile results error'
+        self.assertListEqual(received, expected, msg)
+
+        received = [sorted(x.keys())
+                    for x in self._parserd.profile_results(results,
+                                                           controls)]
+        expected = [['BA-CLM-v01.docx|Controls',
+                     'BA-CLM-v01.docx|Summary',
+                     'BA-CLM-v01.docx|Table2'],
+                    ['BA-CLM-v01.xlsx|Controls']]
+        msg = 'docx controls profile results error'
+        self.assertListEqual(received, expected, msg)
+
+        # And the cells that a section lacks should be output empty
+        received = list(self._parserd.rows(results[:1], controls))
+        msg = 'Cells missing from a section not output empty'
+        self.assertIn(((None, u'Walloon'), 'BA-CLM-v01.docx|Controls'),
+                      received, msg)
+
+        # Clean up.
+        self._parserd.profiles = None
+
+    def test_delta_keeps_deferred_workbook(self):
+        """Delta output only deletes the rows of parsed or gone workbooks.
+        """
+        # Given two workbooks in the inbound directory
+        source_dir = tempfile.mkdtemp()
+        files = []
+        for name in ['BA-CLM-v01.xlsx', 'BA-NIC-v01.xlsx']:
+            workbook = openpyxl.Workbook()
+            workbook.active.title = 'Geology'
+            workbook.active['B1'] = name[:6]
+            files.append(os.path.join(source_dir, name))
+            workbook.save(files[-1])
+
+        # And a delta output profile
+        conf = baip_parser.ParserConfig()
+        conf.cells_to_extract = ['B1']
+        conf.cell_order = ['B1']
+        conf.cell_map = {'B1': ['bioregion']}
+        conf.outfile = os.path.join(source_dir, 'out.csv')
+        conf.delta_file = os.path.join(source_dir, 'delta.json')
+        self._parserd.profiles = collections.OrderedDict([(None, conf)])
+        self._parserd.ledger = self._parserd.init_ledger()
+        self._parserd.scheduler = self._parserd.init_scheduler()
+
+        def cycle():
+            self._parserd.parsed_workbooks = set()
+            files_to_process = self._parserd.source_files(
+                directory=source_dir, file_filter=r'.*\.xlsx$')
+            ready = [x for x in files_to_process
+                     if self._parserd.ledger.ready(x)]
+            self._parserd.dump(self._parserd.parse_files(ready), conf=conf)
+
+            return open(conf.outfile).read().splitlines()[1:]
+
+        cycle()
+
+        # When the first workbook changes and the second is deferred
+        workbook = openpyxl.load_workbook(files[0])
+        workbook.active['B1'] = 'BA-CLM-v02'
+        workbook.save(files[0])
+        self._parserd.ledger.failed(files[1], 'Unable to open')
+
+        # Then only the changed row should be output
+        received = cycle()
+        expected = ['update,BA-CLM-v01.xlsx|Geology,BA-CLM-v02']
+        msg = 'Deferred workbook rows should not be deleted'
+        self.assertListEqual(received, expected, msg)
+
+        # And the rows of a workbook that has gone should be deleted
+        os.remove(files[1])
+        received = cycle()
+        expected = ['delete,BA-NIC-v01.xlsx|Geology,']
+        msg = 'Removed workbook rows should be deleted'
+        self.assertListEqual(received, expected, msg)
+
+        # Clean up.
+        self._parserd.profiles = None
+        self._parserd.parsed_workbooks = None
+        self._parserd.inbound_workbooks = None
+        remove_files([files[0], conf.outfile, conf.delta_file])
+        os.removedirs(source_dir)
+
     def test_start_dry_run(self):
         """ParserDaemon dry run.
         """
@@ -463,6 +1224,100 @@ class TestParserDaemon(unittest2.TestCase):
         self._parserd.conf.cell_map = old_cell_map
         remove_files(outfile)
 
+    def test_dump_sinks(self):
+        """Write out the results to several output sinks.
+        """
+        # Given parsed data
+        results = [{'BA-CLM-v01.xlsx|CLM-121-001': {'B1': 'CLM-121-001',
+                                                    'B2': 'Walloon'}}]
+
+        # And CSV and SQLite output sinks
+        out_dir = tempfile.mkdtemp()
+        conf = baip_parser.ParserConfig()
+        conf.cells_to_extract = ['B1', 'B2']
+        conf.cell_order = ['B1', 'B2']
+        conf.cell_map = {'B1': ['sheet_name'], 'B2': ['formation']}
+        conf.outfile = os.path.join(out_dir, 'out.csv')
+        conf.sqlite_db = os.path.join(out_dir, 'cells.db')
+        conf.sinks = ['csv', 'sqlite']
+
+        # When I dump the results
+        outfile = self._parserd.dump(results, conf=conf)
+
+        # Then the CSV sink should be written
+        outfile_fh = open(outfile)
+        received = outfile_fh.read().splitlines()
+        outfile_fh.close()
+        expected = ['sheet_name,formation', 'CLM-121-001,Walloon']
+        msg = 'CSV sink content error'
+        self.assertListEqual(received, expected, msg)
+
+        # And so should the SQLite sink
+        connection = sqlite3.connect(conf.sqlite_db)
+        received = connection.execute('SELECT * FROM cells').fetchall()
+        connection.close()
+        expected = [(u'BA-CLM-v01.xlsx|CLM-121-001', u'CLM-121-001',
+                     u'Walloon')]
+        msg = 'SQLite sink content error'
+        self.assertListEqual(received, expected, msg)
+
+        # Clean up.
+        remove_files([outfile,
+                      conf.sqlite_db,
+                      '%s-wal' % conf.sqlite_db,
+                      '%s-shm' % conf.sqlite_db])
+        os.removedirs(out_dir)
+
+    def test_dump_columnar(self):
+        """Write out the results to file: columnar batch.
+        """
+        # Given parsed data
+        results = [
+            {'BA-CLM-v01.xlsx|CLM-001': {'B1': u'CLM\u2011001',
+                                         'B2': u'short',
+                                         'B3': u'Walloon Coal Measures'},
+             'BA-CLM-v01.xlsx|CLM-002': {'B1': u'CLM-002',
+                                         'B2': None,
+                                         'B3': None}},
+            {'BA-NIC-v01.xlsx|NIC-001': {'B1': u'NIC-001',
+                                         'B2': u'long enough',
+                                         'B3': u'Hunter'}}]
+
+        # And the cell rules
+        out_dir = tempfile.mkdtemp()
+        conf = baip_parser.ParserConfig()
+        conf.cells_to_extract = ['B1', 'B2', 'B3']
+        conf.cell_order = ['B3', 'B1', 'B2']
+        conf.cell_map = {'B1': ['sheet_name'],
+                         'B2': ['remark'],
+                         'B3': ['formation']}
+        conf.ignore_if_empty = ['B2', 'B3']
+        conf.cell_field_thresholds = {'B2': 5}
+        conf.header_field_lengths = {'formation': 10}
+        conf.outfile = os.path.join(out_dir, 'out.csv')
+
+        # When I dump the results row at a time and by column
+        outfile = self._parserd.dump(results, conf=conf)
+        outfile_fh = open(outfile)
+        expected = outfile_fh.read()
+        outfile_fh.close()
+
+        conf.columnar_min_rows = 3
+        outfile = self._parserd.dump(results, conf=conf)
+        outfile_fh = open(outfile)
+        received = outfile_fh.read()
+        outfile_fh.close()
+
+        # Then the output should match
+        msg = 'Columnar dump content error'
+        self.assertEqual(received, expected, msg)
+        self.assertEqual(self._parserd.stats['columnar_rows'], 3)
+
+        # Clean up.
+        self._parserd.stats.clear()
+        remove_files(outfile)
+        os.removedirs(out_dir)
+
     def test_dump_length_check(self):
         """Write out the results to file: length_check.
         """
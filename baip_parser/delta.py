@@ -0,0 +1,198 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.Delta` reduces the output of each cycle to the
+rows that have changed since the previous cycle.
+
+"""
+__all__ = ["Delta"]
+
+import os
+import json
+import hashlib
+import collections
+
+from logga.log import log
+
+
+class Delta(object):
+    """:class:`baip_parser.Delta`
+
+    The last emitted row of each ``<workbook>|<worksheet>`` key is
+    remembered as a digest of its values.  Each row of the next output
+    is compared against its key's digest and is emitted as an
+    :attr:`INSERT` (new key), an :attr:`UPDATE` (values changed) or not
+    at all (unchanged).  Keys that were not output are emitted as a
+    :attr:`DELETE` if their workbook is in :attr:`parsed` or is no
+    longer in :attr:`present`.  The digests of the other keys are
+    carried forward, so that a workbook that was simply not parsed this
+    cycle keeps its rows.
+
+    The new digests are only persisted with :meth:`save` once the output
+    has been written.
+
+    .. attribute:: delta_file
+
+        JSON file of the form ``{<key>: <digest>, ...}``.  If ``None``,
+        digests are held for the life of the object only
+
+    .. attribute:: parsed
+
+        set of the workbook names (as per the ``<workbook>`` part of the
+        key) whose complete output is compared.  If ``None``, the output
+        is taken to cover every workbook
+
+    .. attribute:: present
+
+        set of the workbook names that are still available for parsing.
+        If ``None``, no workbook is taken to have gone
+
+    .. attribute:: stats
+
+        :class:`collections.Counter` of the operations emitted
+
+    """
+    OPERATION_HEADER = 'operation'
+    KEY_HEADER = 'key'
+    INSERT = 'insert'
+    UPDATE = 'update'
+    DELETE = 'delete'
+
+    _delta_file = None
+    _digests = {}
+    _parsed = None
+    _present = None
+    _stats = None
+
+    def __init__(self, delta_file=None):
+        """Delta initialiser.
+
+        """
+        self._delta_file = delta_file
+        self._digests = {}
+        self._pending = None
+        self._stats = collections.Counter()
+
+        self.load()
+
+    @property
+    def delta_file(self):
+        return self._delta_file
+
+    @property
+    def digests(self):
+        return self._digests
+
+    @property
+    def parsed(self):
+        return self._parsed
+
+    @parsed.setter
+    def parsed(self, value):
+        self._parsed = value
+
+    @property
+    def present(self):
+        return self._present
+
+    @present.setter
+    def present(self, value):
+        self._present = value
+
+    @property
+    def stats(self):
+        return self._stats
+
+    def load(self):
+        """Read the last emitted digests from :attr:`delta_file`.
+
+        """
+        if self.delta_file is not None and os.path.exists(self.delta_file):
+            try:
+                fh = open(self.delta_file)
+                self._digests = json.load(fh)
+                fh.close()
+            except (IOError, ValueError) as error:
+                log.error('Unable to load delta digests "%s": %s' %
+                          (self.delta_file, error))
+                self._digests = {}
+
+    def save(self):
+        """Adopt the digests of the last :meth:`changes` run and write
+        them to :attr:`delta_file`.
+
+        """
+        if self._pending is not None:
+            self._digests = self._pending
+            self._pending = None
+
+        if self.delta_file is not None:
+            tmp_file = '%s.tmp' % self.delta_file
+            try:
+                fh = open(tmp_file, 'w')
+                json.dump(self._digests, fh)
+                fh.close()
+                os.rename(tmp_file, self.delta_file)
+            except (IOError, OSError) as error:
+                log.error('Unable to save delta digests "%s": %s' %
+                          (self.delta_file, error))
+
+    @staticmethod
+    def digest(row):
+        """Digest of the values in *row*.
+
+        """
+        return hashlib.md5(repr(tuple(row))).hexdigest()
+
+    def deleted(self, key):
+        """Check if *key*, which was not output, has been deleted.
+
+        **Returns:**
+            ``True`` if the key's workbook was parsed (as per
+            :attr:`parsed`) or has gone (as per :attr:`present`)
+
+        """
+        workbook = key.split('|', 1)[0]
+
+        return (self.parsed is None or
+                workbook in self.parsed or
+                (self.present is not None and workbook not in self.present))
+
+    def changes(self, rows):
+        """Generator that reduces *rows* to the rows that have changed.
+
+        **Args:**
+            *rows*: iterable of ``(<key>, <row>)`` tuples that make up
+            the complete output
+
+        **Returns:**
+            generator of ``(<operation>, <key>, <value>, ...)`` tuples.
+            Deleted keys follow the other changes and carry no values
+
+        """
+        digests = {}
+        for key, row in rows:
+            digest = self.digest(row)
+            previous = self.digests.get(key)
+            digests[key] = digest
+
+            operation = None
+            if previous is None:
+                operation = self.INSERT
+            elif previous != digest:
+                operation = self.UPDATE
+            else:
+                self.stats['delta_unchanged'] += 1
+
+            if operation is not None:
+                self.stats['delta_%s' % operation] += 1
+                yield (operation, key) + tuple(row)
+
+        for key in sorted(set(self.digests) - set(digests)):
+            if not self.deleted(key):
+                digests[key] = self.digests[key]
+                self.stats['delta_retained'] += 1
+                continue
+
+            self.stats['delta_%s' % self.DELETE] += 1
+            yield (self.DELETE, key)
+
+        self._pending = digests
@@ -0,0 +1,239 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.DocxEngine` extracts table cells and content
+controls from Word (``docx``) reports.
+
+"""
+__all__ = ["DocxEngine"]
+
+import zipfile
+import xml.etree.cElementTree as ElementTree
+
+from openpyxl.cell import coordinate_from_string, column_index_from_string
+
+from logga.log import log
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+TBL_TAG = '{%s}tbl' % W_NS
+TR_TAG = '{%s}tr' % W_NS
+TC_TAG = '{%s}tc' % W_NS
+P_TAG = '{%s}p' % W_NS
+T_TAG = '{%s}t' % W_NS
+TAB_TAG = '{%s}tab' % W_NS
+BR_TAG = '{%s}br' % W_NS
+GRID_SPAN_TAG = '{%s}gridSpan' % W_NS
+TBL_CAPTION_TAG = '{%s}tblCaption' % W_NS
+SDT_TAG = '{%s}sdt' % W_NS
+TAG_TAG = '{%s}tag' % W_NS
+ALIAS_TAG = '{%s}alias' % W_NS
+VAL_ATTR = '{%s}val' % W_NS
+
+
+class DocxEngine(object):
+    """:class:`baip_parser.DocxEngine`
+
+    :class:`baip_parser.Parser` engine for ``docx`` reports.  The
+    ``word/document.xml`` member is streamed once and only the text of
+    the tables and content controls is kept.  No document object model
+    is built.
+
+    Each top level table is a section named after its caption (or
+    ``Table<n>`` in document order).  Its cells are addressed as per a
+    worksheet: ``B1`` is the second column of the first row.  A merged
+    (``gridSpan``) cell holds its text in its first column.
+
+    The content controls are held in the :attr:`CONTROLS` section.  Each
+    control is addressed by its tag (or, failing that, its title).
+
+    Paragraphs within a cell or control are separated by new lines.
+    Empty cells and controls have the value ``None``.
+
+    .. attribute:: sheet_names
+
+        the section names in document order
+
+    """
+    KIND = 'docx'
+    DOCUMENT = 'word/document.xml'
+    CONTROLS = 'Controls'
+
+    _sheet_names = None
+
+    def __init__(self, filepath):
+        """DocxEngine initialiser.
+
+        **Raises:**
+            :exc:`IOError` if *filepath* is not a readable ``docx``
+            report
+
+        """
+        self._filepath = filepath
+        self._sheet_names = None
+        self._sections = {}
+
+        try:
+            self._archive = zipfile.ZipFile(filepath)
+        except zipfile.BadZipfile as error:
+            raise IOError('Unable to open "%s": %s' % (filepath, error))
+
+        if self.DOCUMENT not in self._archive.namelist():
+            self.close()
+            raise IOError('"%s" has no %s member' % (filepath, self.DOCUMENT))
+
+    @property
+    def sheet_names(self):
+        if self._sheet_names is None:
+            self.read_document()
+
+        return self._sheet_names
+
+    def read_document(self):
+        """Stream the document member and keep the text of its tables
+        and content controls.
+
+        """
+        self._sheet_names = []
+        self._sections = {}
+
+        tables = []
+        controls = {}
+
+        table = None
+        row = None
+        depth = 0
+        # Active text buffers: the current top level cell and any open
+        # content controls.
+        cell = None
+        sdts = []
+
+        fh = self._archive.open(self.DOCUMENT)
+        try:
+            for event, element in ElementTree.iterparse(fh,
+                                                        ('start', 'end')):
+                tag = element.tag
+                if event == 'start':
+                    if tag == TBL_TAG:
+                        depth += 1
+                        if depth == 1:
+                            table = {'name': None, 'rows': []}
+                    elif tag == TR_TAG and depth == 1:
+                        row = []
+                    elif tag == TC_TAG and depth == 1:
+                        cell = []
+                    elif tag == SDT_TAG:
+                        sdts.append({'tag': None, 'alias': None, 'text': []})
+                    continue
+
+                buffers = [x['text'] for x in sdts]
+                if cell is not None:
+                    buffers.append(cell)
+
+                if tag == T_TAG:
+                    for buf in buffers:
+                        buf.append(element.text or u'')
+                elif tag == TAB_TAG:
+                    for buf in buffers:
+                        buf.append(u'\t')
+                elif tag in (BR_TAG, P_TAG):
+                    for buf in buffers:
+                        buf.append(u'\n')
+                    if tag == P_TAG:
+                        element.clear()
+                elif tag == TAG_TAG and sdts:
+                    sdts[-1]['tag'] = element.get(VAL_ATTR)
+                elif tag == ALIAS_TAG and sdts:
+                    sdts[-1]['alias'] = element.get(VAL_ATTR)
+                elif tag == TBL_CAPTION_TAG and depth == 1:
+                    table['name'] = element.get(VAL_ATTR)
+                elif tag == TC_TAG and depth == 1:
+                    span = element.find('{%s}tcPr/%s' % (W_NS, GRID_SPAN_TAG))
+                    row.append(self.text(cell))
+                    if span is not None:
+                        row.extend([None] * (int(span.get(VAL_ATTR)) - 1))
+                    cell = None
+                elif tag == TR_TAG and depth == 1:
+                    table['rows'].append(row)
+                    row = None
+                elif tag == TBL_TAG:
+                    depth -= 1
+                    if depth == 0:
+                        tables.append(table)
+                        table = None
+                        element.clear()
+                elif tag == SDT_TAG:
+                    sdt = sdts.pop()
+                    name = sdt['tag'] or sdt['alias']
+                    if name is not None and name not in controls:
+                        controls[name] = self.text(sdt['text'])
+        except SyntaxError as error:
+            raise IOError('Unable to read "%s": %s' % (self._filepath, error))
+        finally:
+            fh.close()
+
+        for index, table in enumerate(tables):
+            name = table['name'] or 'Table%d' % (index + 1)
+            if name in self._sections:
+                log.warn('Duplicate table "%s" in "%s": ignoring' %
+                         (name, self._filepath))
+                continue
+            self._sheet_names.append(name)
+            self._sections[name] = table['rows']
+
+        if controls:
+            self._sheet_names.append(self.CONTROLS)
+            self._sections[self.CONTROLS] = controls
+
+    @staticmethod
+    def text(buf):
+        """Join the text *buf* of a cell or content control.
+
+        **Returns:**
+            the text or ``None`` if it is empty
+
+        """
+        value = u''.join(buf).strip(u'\n')
+
+        return value or None
+
+    def extract(self, sheet, cells):
+        """Extract *cells* from the section *sheet*.
+
+        **Args:**
+            *sheet*: section name as per :attr:`sheet_names`
+
+            *cells*: list of the cells (for example, ``['B1']``) of a
+            table section, or of the tags of the :attr:`CONTROLS`
+            section, to extract
+
+        **Returns:**
+            dictionary of the form ``{<cell>: <value>}``
+
+        """
+        if self._sheet_names is None:
+            self.read_document()
+
+        values = {}
+
+        section = self._sections[sheet]
+        for cell in cells:
+            value = None
+            if sheet == self.CONTROLS:
+                value = section.get(cell)
+            else:
+                try:
+                    column, row = coordinate_from_string(cell.upper())
+                    column = column_index_from_string(column) - 1
+                except Exception:  # pylint: disable=W0703
+                    column = row = None
+                if (row is not None and
+                        0 < row <= len(section) and
+                        column < len(section[row - 1])):
+                    value = section[row - 1][column]
+            values[cell] = value
+
+        return values
+
+    def close(self):
+        """Release the report archive.
+
+        """
+        self._archive.close()
@@ -0,0 +1,203 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.Fanout` writes a single stream of output rows
+to several :class:`baip_parser.Writer` sinks at once.
+
+"""
+__all__ = ["Fanout"]
+
+import Queue
+import threading
+import collections
+
+from logga.log import log
+
+
+class Fanout(object):
+    """:class:`baip_parser.Fanout`
+
+    Each sink is driven by its own writer thread that reads the rows
+    from a bounded buffer of :attr:`buffer_rows` rows.  The row stream
+    is consumed once and each row is handed to every buffer in turn.  A
+    slow sink fills its buffer and holds up the row stream, while the
+    faster sinks run ahead by no more than their own buffer.
+
+    A sink that fails is logged and its remaining rows are discarded so
+    that the other sinks are not held up.
+
+    .. attribute:: sinks
+
+        list of ``(<name>, <writer>)`` tuples
+
+    .. attribute:: buffer_rows
+
+        maximum number of rows buffered ahead of each sink
+
+    .. attribute:: stats
+
+        :class:`collections.Counter` of fan-out statistics
+
+    .. attribute:: errors
+
+        dictionary of ``<name>: <exception>`` for the sinks that failed
+        during the last :meth:`write`
+
+    """
+    _END = object()
+
+    _sinks = []
+    _buffer_rows = 1000
+    _stats = None
+    _errors = {}
+    _threads = []
+
+    def __init__(self, sinks=None, buffer_rows=1000):
+        """Fanout initialiser.
+
+        """
+        self._sinks = []
+        if sinks is not None:
+            self._sinks.extend(sinks)
+        self._buffer_rows = buffer_rows
+        self._stats = collections.Counter()
+        self._errors = {}
+        self._threads = []
+
+    @property
+    def sinks(self):
+        return self._sinks
+
+    @property
+    def buffer_rows(self):
+        return self._buffer_rows
+
+    @property
+    def stats(self):
+        return self._stats
+
+    @property
+    def errors(self):
+        return self._errors
+
+    def write(self, rows, word_boundary=False):
+        """Write *rows* to all :attr:`sinks`.
+
+        **Args:**
+            *rows*: iterable of ``(<row>, <key>)`` tuples where *key* is
+            the row's ``<workbook>|<worksheet>`` key
+
+            *word_boundary*: as per :meth:`baip_parser.Writer.write`
+
+        **Returns:**
+            ``True`` if every sink was written successfully
+
+        """
+        self._errors = {}
+
+        buffers = [(x, self.start(x, y, word_boundary)) for x, y in self.sinks]
+
+        for row in rows:
+            for name, buf in buffers:
+                self.put(name, buf, row)
+        self.finish(buffers)
+
+        return not self.errors
+
+    def start(self, name, writer, word_boundary=False):
+        """Start the writer thread of sink *name*.
+
+        **Args:**
+            *name*: the sink's name
+
+            *writer*: the sink's :class:`baip_parser.Writer`
+
+            *word_boundary*: as per :meth:`baip_parser.Writer.write`
+
+        **Returns:**
+            the sink's bounded buffer that its rows are :meth:`put` to
+
+        """
+        buf = Queue.Queue(maxsize=max(self.buffer_rows, 1))
+        thread = threading.Thread(target=self._drive,
+                                  args=(name, writer, buf, word_boundary))
+        thread.daemon = True
+        thread.start()
+        self._threads.append(thread)
+
+        return buf
+
+    def finish(self, buffers):
+        """End the row stream of each ``(<name>, <buffer>)`` in
+        *buffers* and wait for the writer threads to complete.
+
+        """
+        for name, buf in buffers:
+            self.put(name, buf, self._END)
+
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def put(self, name, buf, item):
+        """Add *item* to the buffer *buf* of sink *name*, waiting for
+        room if the buffer is full.
+
+        """
+        try:
+            buf.put_nowait(item)
+        except Queue.Full:
+            self.stats['sink_waits_%s' % name] += 1
+            buf.put(item)
+
+    def _drive(self, name, writer, buf, word_boundary):
+        """Writer thread of sink *name*.
+
+        """
+        items = self.stream(buf)
+        data, keys = self.split(items)
+        try:
+            writer.write(data, word_boundary=word_boundary, keys=keys)
+        except Exception as error:  # pylint: disable=W0703
+            log.error('Output sink "%s" failed: %s' % (name, error))
+            self.errors[name] = error
+            self.stats['sink_errors'] += 1
+        finally:
+            # Keep the row stream moving for the other sinks.
+            for _ in items:
+                pass
+
+    def stream(self, buf):
+        """Generator of the items in *buf* up to the end marker.
+
+        """
+        item = buf.get()
+        while item is not self._END:
+            yield item
+            item = buf.get()
+
+    @staticmethod
+    def split(items):
+        """Split the ``(<row>, <key>)`` *items* into separate row and
+        key iterators that can be consumed independently.
+
+        Only the side that is behind holds the values the other side has
+        read ahead.  A writer that never reads the keys only holds the
+        keys.
+
+        **Returns:**
+            tuple of the form ``(<rows>, <keys>)``
+
+        """
+        pending = (collections.deque(), collections.deque())
+
+        def side(index):
+            while True:
+                if not pending[index]:
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        break
+                    pending[0].append(item[0])
+                    pending[1].append(item[1])
+                yield pending[index].popleft()
+
+        return (side(0), side(1))
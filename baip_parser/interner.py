@@ -0,0 +1,124 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.Interner` shares a single copy of each string
+value that is repeated across the parsed worksheets.
+
+"""
+__all__ = ["Interner"]
+
+import collections
+
+from logga.log import log
+
+
+class Interner(object):
+    """:class:`baip_parser.Interner`
+
+    The same titles, header strings and region names are extracted from
+    thousands of worksheets.  Each extraction is a separate string
+    object that is held until the results are dumped.  Passing the
+    results through :meth:`intern_result` swaps each repeated string
+    for the first copy seen so that only one copy is held.
+
+    The table of first copies is bounded by :attr:`max_strings`.  Once
+    the table is full, new strings are passed through unshared.  The
+    table is meant to live for a single batch and is emptied by
+    :meth:`clear`.
+
+    ``str`` and ``unicode`` values are kept apart so that interning never
+    changes a value's type.
+
+    .. attribute:: max_strings
+
+        maximum number of strings held in the table
+
+    .. attribute:: stats
+
+        :class:`collections.Counter` of the strings seen
+        (``strings_seen``), the strings replaced by a shared copy
+        (``strings_shared``) and the new strings that did not fit in the
+        table (``strings_overflow``)
+
+    """
+    _max_strings = 100000
+    _stats = None
+
+    def __init__(self, max_strings=100000):
+        """Interner initialiser.
+
+        """
+        self._max_strings = max_strings
+        self._table = {}
+        self._stats = collections.Counter()
+
+    @property
+    def max_strings(self):
+        return self._max_strings
+
+    @property
+    def stats(self):
+        return self._stats
+
+    @property
+    def size(self):
+        return len(self._table)
+
+    @property
+    def ratio(self):
+        """Fraction of the strings seen that were replaced by a shared
+        copy.
+
+        """
+        ratio = 0.0
+
+        if self.stats['strings_seen']:
+            ratio = (float(self.stats['strings_shared']) /
+                     self.stats['strings_seen'])
+
+        return ratio
+
+    def intern(self, value):
+        """Return the shared copy of *value*.
+
+        Values that are not strings are returned unchanged.
+
+        """
+        if isinstance(value, basestring):
+            self.stats['strings_seen'] += 1
+            entry = (type(value), value)
+            shared = self._table.get(entry)
+            if shared is not None:
+                self.stats['strings_shared'] += 1
+                value = shared
+            elif len(self._table) < self.max_strings:
+                self._table[entry] = value
+            else:
+                self.stats['strings_overflow'] += 1
+
+        return value
+
+    def intern_result(self, result):
+        """Intern the keys, cell names and values of *result*.
+
+        **Args:**
+            *result*: the :meth:`baip_parser.Parser.parse_sheets`
+            structure of a workbook
+
+        **Returns:**
+            the interned copy of *result*
+
+        """
+        interned = collections.OrderedDict()
+
+        for key, cells in result.iteritems():
+            interned[self.intern(key)] = dict((self.intern(x),
+                                               self.intern(y))
+                                              for x, y in cells.iteritems())
+
+        return interned
+
+    def clear(self):
+        """Empty the table ready for the next batch.
+
+        """
+        log.debug('Releasing %d interned strings' % self.size)
+        self._table.clear()
@@ -0,0 +1,120 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.JsonLinesWriter` streams the parsed worksheets
+to a JSON Lines file
+
+"""
+__all__ = [
+    "JsonLinesWriter",
+]
+import os
+import datetime
+import decimal
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+from logga.log import log
+
+
+def _default(value):
+    """Serialise the values that the JSON encoder does not support.
+
+    ``datetime``, ``date`` and ``time`` values are written in ISO 8601
+    format.  ``Decimal`` values are written as numbers (``simplejson``
+    does so natively).
+
+    """
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        encoded = value.isoformat()
+    elif isinstance(value, decimal.Decimal):
+        encoded = float(value)
+    else:
+        raise TypeError('%r is not JSON serializable' % (value,))
+
+    return encoded
+
+
+class JsonLinesWriter(object):
+    """:class:`baip_parser.JsonLinesWriter`
+
+    Each worksheet is written as one JSON object per line of the form::
+
+        {"<workbook>|<worksheet>": {"<cell>": <value>, ...}}
+
+    Lines are flushed as each workbook is written so that the file can
+    be tailed while the parse is under way.  ``simplejson`` is used as
+    the encoder if it is installed.
+
+    .. attribute:: outfile
+
+        name of the JSON Lines file to write to.  Each :meth:`open`
+        appends to the file so that lines that have not yet been read
+        by a consumer are never lost
+
+    """
+    _outfile = None
+    _fh = None
+
+    def __init__(self, outfile=None):
+        """JsonLinesWriter initialiser.
+
+        """
+        if outfile is not None:
+            self._outfile = outfile
+
+    @property
+    def outfile(self):
+        return self._outfile
+
+    @outfile.setter
+    def outfile(self, value=None):
+        self._outfile = value
+
+    def open(self):
+        """Open :attr:`outfile` for appending.
+
+        A partial last line (from an interrupted run) is terminated so
+        that the new lines are not run into it.
+
+        """
+        self.close()
+
+        log.debug('Streaming worksheets to "%s"' % self.outfile)
+        self._fh = open(self.outfile, 'ab')
+        self._fh.seek(0, os.SEEK_END)
+        if self._fh.tell() > 0:
+            fh = open(self.outfile, 'rb')
+            fh.seek(-1, os.SEEK_END)
+            if fh.read(1) != '\n':
+                self._fh.write('\n')
+            fh.close()
+
+    def write(self, result):
+        """Write each worksheet of *result* as a line of :attr:`outfile`.
+
+        **Args:**
+            *result*: the :meth:`baip_parser.Parser.parse_sheets`
+            structure of a workbook
+
+        """
+        for key, cells in result.iteritems():
+            self._fh.write(self.encode({key: cells}))
+            self._fh.write('\n')
+        self._fh.flush()
+
+    @staticmethod
+    def encode(value):
+        """Encode *value* as a single line of JSON.
+
+        """
+        return json.dumps(value, default=_default, separators=(',', ':'))
+
+    def close(self):
+        """Close :attr:`outfile`.
+
+        """
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
@@ -0,0 +1,322 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.Ledger` tracks workbooks that fail to parse
+so that they can be retried with exponential backoff and eventually
+quarantined.
+
+"""
+__all__ = ["Ledger"]
+
+import os
+import json
+import time
+import shutil
+
+from logga.log import log
+
+
+class Ledger(object):
+    """:class:`baip_parser.Ledger`
+
+    .. attribute:: ledger_file
+
+        optional file to persist the ledger to so that failure counts
+        survive a daemon restart
+
+    .. attribute:: max_failures
+
+        number of failed attempts before a file is quarantined
+
+    .. attribute:: retry_delay
+
+        seconds to wait before the first retry.  Each subsequent failure
+        doubles the delay
+
+    .. attribute:: max_retry_delay
+
+        ceiling (in seconds) on the retry delay
+
+    .. attribute:: quarantine_dir
+
+        directory that failed files are moved to once
+        :attr:`max_failures` is reached.  If ``None``, failed files stay
+        in place but are no longer retried
+
+    .. attribute:: inbound_dir
+
+        root of the tree that files are sourced from.  Quarantined files
+        keep their path relative to :attr:`inbound_dir` so that files of
+        the same name in different directories do not collide
+
+    """
+    _ledger_file = None
+    _max_failures = 3
+    _retry_delay = 60.0
+    _max_retry_delay = 3600.0
+    _quarantine_dir = None
+    _inbound_dir = None
+    _entries = {}
+
+    def __init__(self, ledger_file=None):
+        """Ledger initialiser.
+
+        """
+        self._entries = {}
+
+        if ledger_file is not None:
+            self._ledger_file = ledger_file
+            self.load()
+
+    @property
+    def ledger_file(self):
+        return self._ledger_file
+
+    @ledger_file.setter
+    def ledger_file(self, value):
+        self._ledger_file = value
+
+    @property
+    def max_failures(self):
+        return self._max_failures
+
+    @max_failures.setter
+    def max_failures(self, value):
+        self._max_failures = value
+
+    @property
+    def retry_delay(self):
+        return self._retry_delay
+
+    @retry_delay.setter
+    def retry_delay(self, value):
+        self._retry_delay = value
+
+    @property
+    def max_retry_delay(self):
+        return self._max_retry_delay
+
+    @max_retry_delay.setter
+    def max_retry_delay(self, value):
+        self._max_retry_delay = value
+
+    @property
+    def quarantine_dir(self):
+        return self._quarantine_dir
+
+    @quarantine_dir.setter
+    def quarantine_dir(self, value):
+        self._quarantine_dir = value
+
+    @property
+    def inbound_dir(self):
+        return self._inbound_dir
+
+    @inbound_dir.setter
+    def inbound_dir(self, value):
+        self._inbound_dir = value
+
+    @property
+    def entries(self):
+        return self._entries
+
+    def load(self):
+        """Read the ledger entries from :attr:`ledger_file`.
+
+        """
+        if self.ledger_file is not None and os.path.exists(self.ledger_file):
+            try:
+                fh = open(self.ledger_file)
+                self._entries = json.load(fh)
+                fh.close()
+            except (IOError, ValueError) as error:
+                log.error('Unable to load ledger "%s": %s' %
+                          (self.ledger_file, error))
+                self._entries = {}
+
+    def save(self):
+        """Write the ledger entries to :attr:`ledger_file`.
+
+        The write is to a temporary file that is renamed into place so
+        that a crash never leaves a truncated ledger behind.
+
+        """
+        if self.ledger_file is not None:
+            tmp_file = '%s.tmp' % self.ledger_file
+            try:
+                fh = open(tmp_file, 'w')
+                json.dump(self._entries, fh)
+                fh.close()
+                os.rename(tmp_file, self.ledger_file)
+            except (IOError, OSError) as error:
+                log.error('Unable to save ledger "%s": %s' %
+                          (self.ledger_file, error))
+
+    @staticmethod
+    def signature(filepath):
+        """Cheap file signature used to detect that a failed file has
+        been replaced since its last attempt.
+
+        **Returns:**
+            list of the form ``[<size>, <mtime>]`` or ``None`` if
+            *filepath* cannot be stat'ed
+
+        """
+        signature = None
+
+        try:
+            stat = os.stat(filepath)
+            signature = [stat.st_size, stat.st_mtime]
+        except OSError as error:
+            log.debug('Unable to stat "%s": %s' % (filepath, error))
+
+        return signature
+
+    def ready(self, filepath, now=None):
+        """Check whether *filepath* can be attempted.
+
+        A file is ready if it has no failure history, its retry delay
+        has expired or it has changed since the last failed attempt.
+
+        **Args:**
+            *filepath*: fully qualified name of the file to check
+
+            *now*: override the current time (epoch seconds)
+
+        **Returns:**
+            Boolean ``True`` if *filepath* should be parsed.  Boolean
+            ``False`` otherwise
+
+        """
+        status = True
+
+        entry = self._entries.get(filepath)
+        if entry is not None:
+            if now is None:
+                now = time.time()
+
+            if entry.get('signature') != self.signature(filepath):
+                log.info('Failed file "%s" has changed: retrying' % filepath)
+                del self._entries[filepath]
+            elif entry.get('quarantined'):
+                status = False
+            elif now < entry.get('next_attempt', 0):
+                log.debug('File "%s" deferred until %s' %
+                          (filepath, entry.get('next_attempt')))
+                status = False
+
+        return status
+
+    def failed(self, filepath, error=None, now=None, dry=False, fatal=False):
+        """Record a failed attempt against *filepath*.
+
+        The next attempt is deferred by :attr:`retry_delay` doubled for
+        each previous failure (capped at :attr:`max_retry_delay`).  On
+        reaching :attr:`max_failures` the file is quarantined.
+
+        **Args:**
+            *filepath*: fully qualified name of the file that failed
+
+            *error*: the reason for the failure
+
+            *now*: override the current time (epoch seconds)
+
+            *dry*: only report, do not move the file
+
+            *fatal*: the failure will recur on every attempt so
+            quarantine the file straight away
+
+        **Returns:**
+            Boolean ``True`` if the file was quarantined.  Boolean
+            ``False`` otherwise
+
+        """
+        if now is None:
+            now = time.time()
+
+        entry = self._entries.setdefault(filepath, {'failures': 0})
+        entry['failures'] += 1
+        entry['error'] = str(error)
+        entry['signature'] = self.signature(filepath)
+
+        delay = min(self.retry_delay * 2 ** (entry['failures'] - 1),
+                    self.max_retry_delay)
+        entry['next_attempt'] = now + delay
+        log.warn('File "%s" failure %d (retry in %.1fs): %s' %
+                 (filepath, entry['failures'], delay, error))
+
+        quarantined = False
+        if fatal or entry['failures'] >= self.max_failures:
+            quarantined = self.quarantine(filepath, dry=dry)
+
+        self.save()
+
+        return quarantined
+
+    def succeeded(self, filepath):
+        """Clear any failure history held against *filepath*.
+
+        """
+        if self._entries.pop(filepath, None) is not None:
+            self.save()
+
+    def quarantine(self, filepath, dry=False):
+        """Take *filepath* out of the parse pipeline.
+
+        If :attr:`quarantine_dir` is defined, the file is moved there.
+        Otherwise the ledger entry is flagged so that the file is no
+        longer attempted until it changes.
+
+        **Args:**
+            *filepath*: fully qualified name of the file to quarantine
+
+            *dry*: only report, do not move the file
+
+        **Returns:**
+            Boolean ``True`` on success.  Boolean ``False`` otherwise
+
+        """
+        status = True
+
+        entry = self._entries.setdefault(filepath, {'failures': 0})
+        entry['quarantined'] = True
+
+        if self.quarantine_dir is not None and not dry:
+            target = self.quarantine_target(filepath)
+            log.warn('Quarantining "%s" to "%s"' % (filepath, target))
+            try:
+                if not os.path.isdir(os.path.dirname(target)):
+                    os.makedirs(os.path.dirname(target))
+                shutil.move(filepath, target)
+                del self._entries[filepath]
+            except (IOError, OSError) as error:
+                log.error('Quarantine of "%s" failed: %s' %
+                          (filepath, error))
+                status = False
+        else:
+            log.warn('Quarantining "%s" in place' % filepath)
+
+        return status
+
+    def quarantine_target(self, filepath):
+        """Name of the file that *filepath* is quarantined to.
+
+        The path of *filepath* relative to :attr:`inbound_dir` is kept
+        beneath :attr:`quarantine_dir`.  Files outside
+        :attr:`inbound_dir` keep only their base name.  If the target is
+        already taken, a ``.<n>`` suffix is added.
+
+        """
+        relative = os.path.basename(filepath)
+        if self.inbound_dir is not None:
+            path = os.path.relpath(os.path.abspath(filepath),
+                                   os.path.abspath(self.inbound_dir))
+            if not path.startswith(os.pardir):
+                relative = path
+
+        target = os.path.join(self.quarantine_dir, relative)
+        candidate = target
+        suffix = 0
+        while os.path.exists(candidate):
+            suffix += 1
+            candidate = '%s.%d' % (target, suffix)
+
+        return candidate
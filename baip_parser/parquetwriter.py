@@ -0,0 +1,113 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.ParquetWriter` supports the Apache Parquet
+output
+
+"""
+__all__ = [
+    "ParquetWriter",
+]
+import itertools
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from baip_parser.writer import Writer
+from logga.log import log
+
+
+class ParquetWriter(Writer):
+    """:class:`baip_parser.Writer` backend that writes the output rows to
+    an Apache Parquet file (:attr:`outfile`).
+
+    Requires :mod:`pyarrow`.
+
+    The first column holds each row's ``<workbook>|<worksheet>`` key
+    (:attr:`KEY_COLUMN`).  The remaining columns are named after
+    :attr:`columns`.  As per the CSV output, all values are written as
+    strings.  Rows are written in row groups of :attr:`batch_rows` rows
+    so that the whole output is never held in memory.
+
+    .. attribute:: batch_rows
+
+        number of rows in each Parquet row group
+
+    """
+    _batch_rows = 10000
+
+    @property
+    def batch_rows(self):
+        return self._batch_rows
+
+    @batch_rows.setter
+    def batch_rows(self, value):
+        self._batch_rows = value
+
+    def write_output(self, data, word_boundary=False, keys=None):
+        """Write the list of tuple values in *data* against their *keys*.
+
+        **Args:**
+            *data*: list of tuples to write out
+
+            *word_boundary*: if ``True``, attempts to tidy-up a truncated
+            string by removing the last word in the sentence
+
+            *keys*: list of ``<workbook>|<worksheet>`` keys that
+            align with the rows in *data*
+
+        """
+        log.debug('Preparing "%s" for output' % self.outfile)
+
+        if pyarrow is None:
+            raise ImportError('Parquet output requires pyarrow')
+
+        if keys is None:
+            log.error('Parquet output requires row keys: nothing written')
+        else:
+            columns = self.columns
+            names = [self.KEY_COLUMN] + columns
+            schema = pyarrow.schema([pyarrow.field(x, pyarrow.string())
+                                     for x in names])
+            rows = self.prepare(data, word_boundary, keys, keyed=True)
+
+            # As per the CSV output, the last of any duplicate header wins.
+            last = len(self.headers) - 1
+            indexes = [last - self.headers[::-1].index(x) for x in columns]
+
+            counter = 0
+            writer = pyarrow.parquet.ParquetWriter(self.outfile, schema)
+            try:
+                while True:
+                    batch = list(itertools.islice(rows, self.batch_rows))
+                    if not batch:
+                        break
+
+                    values = [[x[0] for x in batch]]
+                    for index in indexes:
+                        values.append([self.text(x[1][index])
+                                       for x in batch])
+
+                    arrays = [pyarrow.array(x, type=pyarrow.string())
+                              for x in values]
+                    writer.write_table(pyarrow.Table.from_arrays(arrays,
+                                                                 names))
+                    counter += len(batch)
+            finally:
+                writer.close()
+
+            log.debug('%d records written to "%s"' % (counter, self.outfile))
+
+    @staticmethod
+    def text(value):
+        """Convert *value* into its string form (``None`` is kept).
+
+        """
+        if value is not None and not isinstance(value, unicode):
+            if isinstance(value, str):
+                value = value.decode('utf-8')
+            else:
+                value = unicode(value)
+
+        return value
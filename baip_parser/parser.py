@@ -5,10 +5,29 @@
 __all__ = ["Parser"]
 
 import os
+import zipfile
+import collections
+import multiprocessing
+import xml.etree.cElementTree as ElementTree
 import openpyxl
-
+from openpyxl.cell.read_only import ReadOnlyCell
+from openpyxl.date_time import W3CDTF_to_datetime
+from openpyxl.xml.constants import SHEET_MAIN_NS
+from openpyxl.xml.functions import iterparse, safe_iterator
+from openpyxl.worksheet.iter_worksheet import (ROW_TAG,
+                                               CELL_TAG,
+                                               VALUE_TAG,
+                                               FORMULA_TAG)
+
+from baip_parser.xlsengine import XlsEngine
+from baip_parser.xlsbengine import XlsbEngine
+from baip_parser.docxengine import DocxEngine
+from baip_parser.templates import Templates
 from logga.log import log
 
+# Workbook opened once by each sheet worker process.
+_WORKER_WORKBOOK = None
+
 
 class Parser(object):
     """:class:`baip_parser.Parser`
@@ -16,11 +35,89 @@ class Parser(object):
     .. attribute:: *filepath*
         fully qualified name of the ``xlsx`` file to parse.
 
+    .. attribute:: *engine*
+        the :attr:`ENGINES` extraction engine of the open workbook, or
+        ``None`` if :attr:`workbook` was opened by openpyxl.  An engine
+        provides ``sheet_names``, ``extract(<sheet>, <cells>)`` (which
+        returns a ``{<cell>: <value>}`` dictionary) and ``close()``
+
+    .. attribute:: *cache*
+        optional :class:`baip_parser.SheetCache`.  When set, the
+        workbook is opened in read-only mode and only the worksheets
+        whose zip members have changed since the last parse are
+        re-extracted.
+
+    .. attribute:: *stats*
+        :class:`collections.Counter` of parse statistics
+
+    .. attribute:: *sheet_workers*
+        number of worker processes to split a single workbook's
+        worksheets across.  A value of ``0`` or ``1`` parses serially
+
+    .. attribute:: *sheet_parallel_min*
+        minimum number of worksheets before :attr:`sheet_workers` are
+        engaged
+
+    .. attribute:: *max_sheet_bytes*
+        limit on the total uncompressed size of the worksheet and shared
+        strings members.  Larger workbooks are refused by :meth:`open`.
+        ``0`` means no limit
+
+    .. attribute:: *interner*
+        optional :class:`baip_parser.Interner`.  When set, the parsed
+        keys, cell names and string values are shared through its table
+
+    .. attribute:: *templates*
+        optional :class:`baip_parser.Templates`.  When set, the workbook
+        is opened in read-only mode and extracted as per its template's
+        cached plan.  Each worksheet is then read in a single pass that
+        stops at the last row holding a cell to extract
+
+    .. attribute:: *metadata_only*
+        if ``True``, only the workbook level metadata is extracted by
+        :meth:`parse_metadata`.  No worksheets are opened
+
+    .. attribute:: *docx_tables*
+        names of the ``docx`` report tables to extract the
+        :attr:`cells_to_extract` from.  If empty, all tables are
+        extracted
+
+    .. attribute:: *docx_controls*
+        tags of the ``docx`` report content controls to extract.  If
+        empty, the content controls are not extracted
+
     """
+    SHARED_STRINGS = 'xl/sharedStrings.xml'
+    STYLES = 'xl/styles.xml'
+    SHEET_MEMBERS = ('xl/worksheets/',
+                     SHARED_STRINGS,
+                     XlsbEngine.SHARED_STRINGS,
+                     DocxEngine.DOCUMENT)
+    ENGINES = {'.xls': XlsEngine,
+               '.xlsb': XlsbEngine,
+               '.docx': DocxEngine}
+    CORE_PROPERTIES = 'docProps/core.xml'
+    APP_PROPERTIES = 'docProps/app.xml'
+    WORKBOOK = 'xl/workbook.xml'
+    METADATA = 'Metadata'
+    METADATA_DATES = ('created', 'modified', 'lastprinted')
+
     _filepath = None
     _workbook = None
+    _engine = None
     _skip_sheets = []
     _cells_to_extract = []
+    _cache = None
+    _stats = None
+    _sheet_workers = 0
+    _sheet_parallel_min = 50
+    _max_sheet_bytes = 0
+    _interner = None
+    _templates = None
+    _metadata_only = False
+    _docx_tables = []
+    _docx_controls = []
+    _archive = None
 
     @property
     def filepath(self):
@@ -38,12 +135,22 @@ class Parser(object):
     def workbook(self, value):
         self._workbook = value
 
+    @property
+    def engine(self):
+        return self._engine
+
+    @engine.setter
+    def engine(self, value):
+        self._engine = value
+
     @property
     def sheet_names(self):
         sheet_names = []
 
         if self.workbook is not None:
             sheet_names.extend(self.workbook.sheetnames)
+        elif self.engine is not None:
+            sheet_names.extend(self.engine.sheet_names)
 
         return sheet_names
 
@@ -71,16 +178,114 @@ class Parser(object):
         if values is not None and isinstance(values, list):
             self._cells_to_extract.extend(values)
 
+    @property
+    def cache(self):
+        return self._cache
+
+    @cache.setter
+    def cache(self, value):
+        self._cache = value
+
+    @property
+    def stats(self):
+        return self._stats
+
+    @property
+    def sheet_workers(self):
+        return self._sheet_workers
+
+    @sheet_workers.setter
+    def sheet_workers(self, value):
+        self._sheet_workers = value
+
+    @property
+    def sheet_parallel_min(self):
+        return self._sheet_parallel_min
+
+    @sheet_parallel_min.setter
+    def sheet_parallel_min(self, value):
+        self._sheet_parallel_min = value
+
+    @property
+    def max_sheet_bytes(self):
+        return self._max_sheet_bytes
+
+    @max_sheet_bytes.setter
+    def max_sheet_bytes(self, value):
+        self._max_sheet_bytes = value
+
+    @property
+    def interner(self):
+        return self._interner
+
+    @interner.setter
+    def interner(self, value):
+        self._interner = value
+
+    @property
+    def templates(self):
+        return self._templates
+
+    @templates.setter
+    def templates(self, value):
+        self._templates = value
+
+    @property
+    def metadata_only(self):
+        return self._metadata_only
+
+    @metadata_only.setter
+    def metadata_only(self, value):
+        self._metadata_only = value
+
+    @property
+    def docx_tables(self):
+        return self._docx_tables
+
+    @docx_tables.setter
+    def docx_tables(self, values=None):
+        self._docx_tables = list(values or [])
+
+    @property
+    def docx_controls(self):
+        return self._docx_controls
+
+    @docx_controls.setter
+    def docx_controls(self, values=None):
+        self._docx_controls = list(values or [])
+
+    @property
+    def read_only(self):
+        """Workbooks are opened in read-only (lazy) mode when worksheets
+        are to be cached, planned or extracted by worker processes.
+
+        """
+        return (self.cache is not None or
+                self.templates is not None or
+                self.sheet_workers > 1)
+
     def __init__(self):
-        pass
+        self._stats = collections.Counter()
 
     def open(self, filepath=None):
         """Attempt to open the ``xlsx`` file for processing.
 
+        Files whose extension is in :attr:`ENGINES` (``xls``, ``xlsb``
+        and ``docx``) are opened by their :attr:`engine` instead.  If
+        :attr:`metadata_only` is set, only the zip archive is opened.  A
+        legacy ``xls`` workbook is then opened by the
+        :class:`baip_parser.XlsEngine` for its worksheet names, or is
+        skipped (without failing) if :mod:`xlrd` is not installed.
+
         **Args:**
             *filepath*: override the :attr:`parser.filepath` attribute
 
+        **Returns:**
+            Boolean ``True`` if the workbook was opened.  Boolean
+            ``False`` otherwise
+
         """
+        status = False
         file_to_open = None
 
         if filepath is not None:
@@ -88,15 +293,105 @@ class Parser(object):
         else:
             file_to_open = self.filepath
 
+        engine = None
         if file_to_open is not None:
+            extension = os.path.splitext(file_to_open)[1].lower()
+            engine = self.ENGINES.get(extension)
+
+        if file_to_open is not None and self.metadata_only:
+            log.debug('Attempting to open metadata of: %s' % file_to_open)
+            try:
+                if (engine is XlsEngine and
+                        not zipfile.is_zipfile(file_to_open)):
+                    if XlsEngine.available():
+                        self.engine = XlsEngine(file_to_open)
+                    else:
+                        log.warn('xls metadata requires xlrd: skipping "%s"' %
+                                 file_to_open)
+                        self.stats['metadata_skipped'] += 1
+                else:
+                    self._archive = zipfile.ZipFile(file_to_open)
+                self.filepath = file_to_open
+                status = True
+            except (IOError, zipfile.BadZipfile) as error:
+                log.error('Unable to open "%s": %s' % (file_to_open, error))
+        elif file_to_open is not None and self.oversized(file_to_open):
+            self.stats['oversized'] += 1
+        elif engine is not None:
+            log.debug('Attempting to open %s file: %s' %
+                      (engine.KIND, file_to_open))
+            try:
+                self.engine = engine(file_to_open)
+                self.filepath = file_to_open
+                status = True
+            except IOError as error:
+                log.error(error)
+        elif file_to_open is not None:
             log.debug('Attempting to open xlsx file: %s' % file_to_open)
             try:
                 self.workbook = openpyxl.load_workbook(file_to_open,
+                                                       read_only=self.read_only,
                                                        data_only=True)
                 self.filepath = file_to_open
+                status = True
             except openpyxl.exceptions.InvalidFileException as error:
                 log.error(error)
 
+        return status
+
+    def oversized(self, filepath):
+        """Check the total uncompressed size of the worksheet and shared
+        strings members of *filepath* against :attr:`max_sheet_bytes`.
+
+        The sizes are read from the zip central directory so nothing is
+        decompressed.  This guards :meth:`open` against zip bombs and
+        runaway worksheets.
+
+        **Returns:**
+            Boolean ``True`` if the workbook is over the limit.  Boolean
+            ``False`` otherwise
+
+        """
+        oversized = False
+
+        if self.max_sheet_bytes:
+            try:
+                archive = zipfile.ZipFile(filepath)
+                size = sum([x.file_size for x in archive.infolist()
+                            if x.filename.startswith(self.SHEET_MEMBERS)])
+                archive.close()
+                if size > self.max_sheet_bytes:
+                    log.error('Workbook "%s" worksheets uncompress to %d '
+                              'bytes (limit %d): refusing to open' %
+                              (filepath, size, self.max_sheet_bytes))
+                    oversized = True
+            except (IOError, zipfile.BadZipfile) as err:
+                # Let openpyxl report on files that are not workbooks.
+                log.debug('Unable to size "%s": %s' % (filepath, err))
+
+        return oversized
+
+    def close(self):
+        """Release the resources held by :attr:`workbook`.
+
+        Read-only workbooks keep the zip archive open for lazy sheet
+        access.
+
+        """
+        if self.workbook is not None:
+            archive = getattr(self.workbook, '_archive', None)
+            if archive is not None:
+                archive.close()
+            self.workbook = None
+
+        if self.engine is not None:
+            self.engine.close()
+            self.engine = None
+
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+
     def skip_sheet(self, sheet_name):
         """Performs a case-insensitive search of *sheet_name*
         against :attr:`parser.skip_sheets`
@@ -133,25 +428,575 @@ class Parser(object):
                  'WorkbookLog': {'B1': u'Date'}}
 
         """
-        parsed_values = {}
+        if self.metadata_only:
+            return self.parse_metadata()
 
-        for sheet in self.workbook.get_sheet_names():
-            log.info('Extracting from sheet name: "%s"' % sheet)
-            if self.skip_sheet(sheet):
-                continue
+        if self.engine is not None:
+            return self.parse_sheets_engine()
+
+        if self.cache is not None and self.workbook is not None:
+            return self.parse_sheets_cached()
+
+        parsed_values = collections.OrderedDict()
+
+        plan = self.plan()
 
+        sheets = []
+        if plan is not None:
+            sheets = [x[0] for x in plan['sheets']]
+        elif self.workbook is not None:
+            sheets = [x for x in self.workbook.get_sheet_names()
+                      if not self.skip_sheet(x)]
+        else:
+            log.warn('No workbook open: skipping sheet parse')
+
+        if plan is None and self.read_only:
+            plan = self.cells_plan()
+
+        extracted = None
+        if self.parallel(sheets):
+            extracted = self.extract_parallel(sheets, plan)
+
+        for sheet in sheets:
             # Need to make the key unique as the concatenation of the
             # workbook and worksheet
             key = '%s|%s' % (os.path.basename(self.filepath), sheet)
-            parsed_values[key] = {}
 
-            # Set active sheet.
+            if extracted is not None:
+                parsed_values[key] = dict((k, v[0])
+                                          for k, v in extracted[sheet])
+            elif plan is not None:
+                log.info('Extracting from sheet name: "%s"' % sheet)
+                values = self.read_planned(sheet, plan)
+                parsed_values[key] = dict((k, v[0])
+                                          for k, v in values.iteritems())
+            else:
+                log.info('Extracting from sheet name: "%s"' % sheet)
+                parsed_values[key] = {}
+
+                # Set active sheet.
+                ws = self.workbook.get_sheet_by_name(sheet)
+
+                # Extract required cells.
+                for cell in self.cells_to_extract:
+                    value = ws[cell].value
+                    log.debug('Extracted cell|value: %s|%s' % (cell, value))
+                    parsed_values[key][cell] = value
+
+        if self.interner is not None:
+            parsed_values = self.interner.intern_result(parsed_values)
+
+        return parsed_values
+
+    def parse_sheets_engine(self):
+        """Variant of :meth:`parse_sheets` that extracts the worksheets
+        through :attr:`engine`.
+
+        The sections of a ``docx`` report are limited to the
+        :attr:`docx_tables` (from which the :attr:`cells_to_extract` are
+        extracted) and the content controls section (from which the
+        :attr:`docx_controls` are extracted).
+
+        **Returns:**
+            dictionary structure as per :meth:`parse_sheets`
+
+        """
+        parsed_values = collections.OrderedDict()
+
+        sheets = [x for x in self.engine.sheet_names
+                  if not self.skip_sheet(x)]
+
+        docx = self.engine.KIND == DocxEngine.KIND
+        if docx:
+            sheets = [x for x in sheets if self.docx_section(x)]
+
+        for sheet in sheets:
+            key = '%s|%s' % (os.path.basename(self.filepath), sheet)
+            log.info('Extracting from sheet name: "%s"' % sheet)
+            cells = self.cells_to_extract
+            if docx and sheet == DocxEngine.CONTROLS:
+                cells = self.docx_controls
+            parsed_values[key] = self.engine.extract(sheet, cells)
+
+        self.stats['%s_parsed' % self.engine.KIND] += 1
+
+        if self.interner is not None:
+            parsed_values = self.interner.intern_result(parsed_values)
+
+        return parsed_values
+
+    def docx_section(self, sheet):
+        """Check if the ``docx`` report section *sheet* is one of the
+        :attr:`docx_tables` or, if :attr:`docx_controls` are set, the
+        content controls section.
+
+        **Returns:**
+            Boolean ``True`` if the section should be extracted.
+            Boolean ``False`` otherwise
+
+        """
+        if sheet == DocxEngine.CONTROLS:
+            wanted = len(self.docx_controls) > 0
+        else:
+            tables = [x.lower() for x in self.docx_tables]
+            wanted = not tables or sheet.lower() in tables
+
+        return wanted
+
+    def parse_metadata(self):
+        """Variant of :meth:`parse_sheets` that extracts the workbook
+        level metadata only.
+
+        Just the ``docProps/core.xml``, ``docProps/app.xml`` and
+        ``xl/workbook.xml`` members are read.  The
+        :attr:`cells_to_extract` are the (case-insensitive) names of the
+        document properties, for example ``creator``,
+        ``lastModifiedBy``, ``created``, ``modified``, ``title`` or
+        ``Application``, plus:
+
+        * ``sheet_names``: the ``|`` separated worksheet names in
+          workbook order
+
+        * ``sheet_count``: the number of worksheets
+
+        ``created``, ``modified`` and ``lastPrinted`` are returned as
+        ``datetime``.  Legacy ``xls`` workbooks only have their worksheet
+        names.
+
+        **Returns:**
+            dictionary structure as per :meth:`parse_sheets` with a
+            single :attr:`METADATA` key for the workbook.  Empty if the
+            workbook was skipped by :meth:`open`
+
+        """
+        parsed_values = collections.OrderedDict()
+
+        if self._archive is None and self.engine is None:
+            return parsed_values
+
+        metadata = {}
+        if self._archive is not None:
+            for member in (self.CORE_PROPERTIES, self.APP_PROPERTIES):
+                metadata.update(self.read_properties(member))
+
+        sheet_names = self.metadata_sheet_names()
+        if sheet_names is not None:
+            metadata['sheet_names'] = u'|'.join(sheet_names)
+            metadata['sheet_count'] = len(sheet_names)
+
+        key = '%s|%s' % (os.path.basename(self.filepath), self.METADATA)
+        parsed_values[key] = dict((x, metadata.get(x.lower()))
+                                  for x in self.cells_to_extract)
+
+        self.stats['metadata_parsed'] += 1
+
+        if self.interner is not None:
+            parsed_values = self.interner.intern_result(parsed_values)
+
+        return parsed_values
+
+    def read_properties(self, member):
+        """Read the simple document properties held by *member*.
+
+        **Returns:**
+            dictionary of the form ``{<property>: <value>}`` keyed by
+            the lower case property name.  Empty if *member* is missing
+
+        """
+        properties = {}
+
+        try:
+            tree = ElementTree.fromstring(self._archive.read(member))
+        except KeyError:
+            log.debug('No %s in "%s"' % (member, self.filepath))
+            tree = []
+        except SyntaxError as error:
+            log.warn('Unable to read %s in "%s": %s' %
+                     (member, self.filepath, error))
+            tree = []
+
+        for element in tree:
+            # Skip the vectors, such as HeadingPairs and TitlesOfParts.
+            if len(element):
+                continue
+
+            name = element.tag.rsplit('}', 1)[-1].lower()
+            value = element.text
+            if value is not None and name in self.METADATA_DATES:
+                try:
+                    value = W3CDTF_to_datetime(value)
+                except (AttributeError, ValueError) as error:
+                    log.warn('Invalid %s date "%s": %s' %
+                             (name, value, error))
+            properties[name] = value
+
+        return properties
+
+    def metadata_sheet_names(self):
+        """Read the worksheet names from the workbook part.  ``xlsb``
+        workbooks are read by the :class:`baip_parser.XlsbEngine` and
+        ``xls`` workbooks by the open :attr:`engine`.
+
+        **Returns:**
+            list of worksheet names in workbook order or ``None`` if
+            the archive is not a workbook
+
+        """
+        sheet_names = None
+
+        members = []
+        if self.engine is not None:
+            sheet_names = list(self.engine.sheet_names)
+        else:
+            members = self._archive.namelist()
+
+        if self.WORKBOOK in members:
+            tree = ElementTree.fromstring(self._archive.read(self.WORKBOOK))
+            sheets = tree.find('{%s}sheets' % SHEET_MAIN_NS)
+            sheet_names = []
+            if sheets is not None:
+                sheet_names = [x.get('name') for x in sheets]
+        elif XlsbEngine.WORKBOOK in members:
+            engine = XlsbEngine(self.filepath)
+            sheet_names = list(engine.sheet_names)
+            engine.close()
+
+        return sheet_names
+
+    def parallel(self, sheets):
+        """Check whether the worksheets in *sheets* should be extracted
+        by :attr:`sheet_workers` worker processes.
+
+        """
+        return (self.sheet_workers > 1 and
+                len(sheets) >= max(self.sheet_parallel_min, 2))
+
+    def extract_parallel(self, sheets, plan):
+        """Split the extraction of *sheets* across :attr:`sheet_workers`
+        worker processes.
+
+        Each worker opens :attr:`filepath` independently (in read-only
+        mode) and then extracts the worksheets it is handed as per
+        :meth:`read_planned`.  Worksheets are handed out in small chunks
+        so that a few large worksheets do not hold up the others.
+
+        **Args:**
+            *sheets*: list of worksheet names to extract
+
+            *plan*: the extraction plan as per :meth:`plan` or
+            :meth:`cells_plan`
+
+        **Returns:**
+            dictionary of the form::
+
+                {<worksheet_name>: [(<cell>, (<value>, <sst_index>)), ...]}
+
+        """
+        workers = min(self.sheet_workers, len(sheets))
+        chunksize = max(1, len(sheets) // (workers * 4))
+        log.info('Extracting %d sheets from "%s" across %d workers' %
+                 (len(sheets), self.filepath, workers))
+
+        extracted = {}
+
+        pool = multiprocessing.Pool(workers,
+                                    initializer=_init_sheet_worker,
+                                    initargs=(self.filepath,))
+        try:
+            tasks = [(x, plan) for x in sheets]
+            for sheet, values in pool.imap(_extract_sheet,
+                                           tasks,
+                                           chunksize):
+                extracted[sheet] = values
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+        self.stats['sheets_parallel'] += len(sheets)
+
+        return extracted
+
+    def member_crcs(self):
+        """Read the CRC and uncompressed size of every member from the
+        zip central directory of :attr:`filepath`.  Nothing is
+        decompressed.
+
+        **Returns:**
+            dictionary of the form::
+
+                {<member>: (<crc>, <size>), ...}
+
+        """
+        archive = zipfile.ZipFile(self.filepath)
+        crcs = dict((x.filename, (x.CRC, x.file_size))
+                    for x in archive.infolist())
+        archive.close()
+
+        return crcs
+
+    def parse_sheets_cached(self):
+        """Variant of :meth:`parse_sheets` that only extracts from the
+        worksheets that have changed since the workbook was cached.
+
+        A worksheet is unchanged if its zip member CRC and size match
+        the cached values.  If only the shared strings table has
+        changed, cached string values are re-resolved against the new
+        table.  A change to the cells to extract or the styles (which
+        drive date conversion) invalidates the whole entry.
+
+        **Returns:**
+            dictionary structure as per :meth:`parse_sheets`
+
+        """
+        parsed_values = collections.OrderedDict()
+
+        crcs = self.member_crcs()
+        parts = dict((x, crcs.get(x)) for x in [self.SHARED_STRINGS,
+                                               self.STYLES])
+
+        entry = self.cache.load(self.filepath)
+        if (entry is not None and
+                (entry.get('cells') != self.cells_to_extract or
+                 entry.get('parts', {}).get(self.STYLES) !=
+                 parts[self.STYLES])):
+            log.debug('Sheet cache for "%s" invalidated' % self.filepath)
+            entry = None
+
+        cached_sheets = {}
+        strings_changed = False
+        if entry is not None:
+            cached_sheets = entry.get('sheets', {})
+            strings_changed = (entry.get('parts', {}).get(self.SHARED_STRINGS)
+                               != parts[self.SHARED_STRINGS])
+
+        new_entry = {'cells': list(self.cells_to_extract),
+                     'parts': parts,
+                     'sheets': {}}
+
+        plan = self.plan()
+        if plan is not None:
+            sheets = [x[0] for x in plan['sheets']]
+        else:
+            sheets = [x for x in self.workbook.get_sheet_names()
+                      if not self.skip_sheet(x)]
+            plan = self.cells_plan()
+
+        changed = []
+        for sheet in sheets:
             ws = self.workbook.get_sheet_by_name(sheet)
+            member = ws.worksheet_path
+            crc = crcs.get(member)
+
+            cached = cached_sheets.get(sheet)
+            if (cached is not None and
+                    cached.get('member') == member and
+                    cached.get('crc') == crc):
+                log.debug('Sheet "%s" unchanged: using cache' % sheet)
+                values = cached['values']
+                if strings_changed:
+                    values = self.resolve_strings(values, ws.shared_strings)
+                self.stats['sheets_cached'] += 1
+            else:
+                changed.append(sheet)
+                values = None
+
+            new_entry['sheets'][sheet] = {'member': member,
+                                          'crc': crc,
+                                          'values': values}
+
+        extracted = None
+        if self.parallel(changed):
+            extracted = self.extract_parallel(changed, plan)
+
+        for sheet in changed:
+            if extracted is not None:
+                values = dict(extracted[sheet])
+            else:
+                log.info('Extracting from sheet name: "%s"' % sheet)
+                values = self.read_planned(sheet, plan)
+            new_entry['sheets'][sheet]['values'] = values
+            self.stats['sheets_extracted'] += 1
+
+        for sheet in sheets:
+            key = '%s|%s' % (os.path.basename(self.filepath), sheet)
+            values = new_entry['sheets'][sheet]['values']
+            parsed_values[key] = dict((k, v[0])
+                                      for k, v in values.iteritems())
+
+        self.cache.save(self.filepath, new_entry)
 
-            # Extract required cells.
-            for cell in self.cells_to_extract:
-                value = ws[cell].value
-                log.debug('Extracted cell|value: %s|%s' % (cell, value))
-                parsed_values[key][cell] = value
+        if self.interner is not None:
+            parsed_values = self.interner.intern_result(parsed_values)
 
         return parsed_values
+
+    def plan(self):
+        """Get the :attr:`templates` extraction plan of :attr:`workbook`.
+
+        The plan is resolved and cached on the first workbook of each
+        template.  A cached plan for different :attr:`cells_to_extract`
+        or :attr:`skip_sheets` is resolved again.
+
+        **Returns:**
+            the :class:`baip_parser.Templates` plan dictionary or
+            ``None`` if :attr:`templates` is not set
+
+        """
+        plan = None
+
+        if self.templates is not None and self.workbook is not None:
+            fingerprint, sheets = self.templates.fingerprint(
+                self.workbook._archive)  # pylint: disable=W0212
+            plan = self.templates.load(fingerprint)
+            if (plan is not None and
+                    plan['cells'] == self.cells_to_extract and
+                    plan['skip_sheets'] == self.skip_sheets):
+                log.debug('Workbook "%s" matches template %s' %
+                          (self.filepath, fingerprint))
+                self.stats['template_hits'] += 1
+            else:
+                plan = self.templates.build(sheets,
+                                            self.skip_sheets,
+                                            self.cells_to_extract)
+                self.templates.save(fingerprint, plan)
+                self.stats['template_misses'] += 1
+
+        return plan
+
+    def cells_plan(self):
+        """Resolve the extraction plan of :attr:`cells_to_extract` for a
+        workbook that has no :attr:`templates` plan.
+
+        The plan holds the rows to read but no worksheets.  Each
+        worksheet's zip member is taken from the worksheet itself.
+
+        **Returns:**
+            the :meth:`baip_parser.Templates.build` plan dictionary
+
+        """
+        return Templates.build([], self.skip_sheets, self.cells_to_extract)
+
+    def read_planned(self, sheet, plan):
+        """Extract the cells of *plan* from the worksheet *sheet* of the
+        read-only :attr:`workbook` as per :func:`read_planned`.
+
+        """
+        return read_planned(self.workbook, sheet, plan)
+
+    @staticmethod
+    def planned_value(ws, row, cell):
+        """Convert the worksheet XML *cell* element of *row* in the
+        read-only worksheet *ws*.
+
+        **Returns:**
+            tuple of the form ``(<value>, <sst_index>)`` where
+            *sst_index* is the shared strings table index for string
+            cells and ``None`` otherwise
+
+        """
+        value = cell.find(VALUE_TAG)
+        if value is not None:
+            value = value.text
+        ws_cell = ReadOnlyCell(ws,
+                               row,
+                               cell.get('r').rstrip('0123456789'),
+                               value,
+                               cell.get('t', 'n'),
+                               int(cell.get('s', 0)))
+
+        sst_index = None
+        if ws_cell.data_type == openpyxl.cell.Cell.TYPE_STRING:
+            sst_index = int(ws_cell.internal_value)
+
+        return (ws_cell.value, sst_index)
+
+    @staticmethod
+    def resolve_strings(values, shared_strings):
+        """Re-resolve the cached shared string *values* against the
+        current *shared_strings* table.
+
+        """
+        resolved = {}
+
+        for cell, (value, sst_index) in values.iteritems():
+            if sst_index is not None:
+                value = unicode(shared_strings[sst_index])
+            resolved[cell] = (value, sst_index)
+
+        return resolved
+
+
+def read_planned(workbook, sheet, plan):
+    """Extract the cells of *plan* from the worksheet *sheet* of the
+    read-only *workbook* in a single pass over its zip member.
+
+    The pass stops at the last row that holds a cell to extract.  In
+    read-only mode, openpyxl would otherwise stream the worksheet once
+    for each cell.
+
+    **Returns:**
+        dictionary of the form ``{<cell>: (<value>, <sst_index>)}`` as
+        per :meth:`Parser.planned_value`
+
+    """
+    values = dict((x, (None, None)) for x in plan['cells'])
+
+    ws = workbook.get_sheet_by_name(sheet)
+    member = dict(plan['sheets']).get(sheet, ws.worksheet_path)
+    source = workbook._archive.open(member)  # pylint: disable=W0212
+    try:
+        for _, element in iterparse(source):
+            if element.tag == ROW_TAG:
+                row = int(element.get('r'))
+                if row > plan['max_row']:
+                    break
+                targets = plan['targets'].get(row)
+                if targets is not None:
+                    for cell in safe_iterator(element, CELL_TAG):
+                        target = targets.get(cell.get('r'))
+                        if target is not None:
+                            values[target] = Parser.planned_value(ws,
+                                                                  row,
+                                                                  cell)
+            if element.tag not in (CELL_TAG, VALUE_TAG, FORMULA_TAG):
+                element.clear()
+    finally:
+        source.close()
+
+    return values
+
+
+def _init_sheet_worker(filepath):
+    """Sheet worker process initialiser that opens the workbook
+    *filepath* once for all of the worksheets handed to the worker.
+
+    """
+    global _WORKER_WORKBOOK  # pylint: disable=W0603
+
+    _WORKER_WORKBOOK = openpyxl.load_workbook(filepath,
+                                              read_only=True,
+                                              data_only=True)
+
+
+def _extract_sheet(task):
+    """Sheet worker task that extracts the cells from a single
+    worksheet.
+
+    **Args:**
+        *task*: tuple of the form ``(<worksheet_name>, <plan>)`` where
+        *plan* is as per :func:`read_planned`
+
+    **Returns:**
+        tuple of the form ``(<worksheet_name>, [(<cell>, (<value>,
+        <sst_index>)), ...])``
+
+    """
+    sheet, plan = task
+
+    values = read_planned(_WORKER_WORKBOOK, sheet, plan).items()
+
+    return (sheet, values)
+
@@ -0,0 +1,223 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.Prefetcher` reads upcoming workbooks ahead of
+the parser so that CPU bound parsing does not wait on a cold read.
+
+"""
+__all__ = ["Prefetcher"]
+
+import os
+import Queue
+import threading
+import collections
+
+from logga.log import log
+
+
+class Prefetcher(object):
+    """:class:`baip_parser.Prefetcher`
+
+    A small pool of I/O threads warms the operating system page cache
+    with the next files in parse order.  Where ``posix_fadvise`` is
+    available the kernel is asked to read ahead (``WILLNEED``).
+    Otherwise the file is read through and discarded.  The parser then
+    opens the file by name as usual.
+
+    At most :attr:`depth` files and :attr:`budget` bytes are held ahead
+    of the parser.  Each file is released with :meth:`done` once it has
+    been parsed, which makes room for the next.
+
+    .. attribute:: threads
+
+        number of I/O threads
+
+    .. attribute:: depth
+
+        maximum number of files held ahead of the parser
+
+    .. attribute:: budget
+
+        maximum number of bytes held ahead of the parser.  A single file
+        larger than the budget is still prefetched when nothing else is
+        held
+
+    .. attribute:: stats
+
+        :class:`collections.Counter` of prefetch statistics
+
+    """
+    CHUNK_SIZE = 1024 * 1024
+
+    _threads = 2
+    _depth = 4
+    _budget = 256 * 1024 * 1024
+    _stats = None
+
+    def __init__(self, threads=2, depth=4, budget=256 * 1024 * 1024):
+        """Prefetcher initialiser.
+
+        """
+        self._threads = threads
+        self._depth = depth
+        self._budget = budget
+        self._stats = collections.Counter()
+
+        self._lock = threading.Lock()
+        self._queue = Queue.Queue()
+        self._pending = collections.deque()
+        self._held = {}
+        self._used = 0
+        self._workers = []
+
+    @property
+    def threads(self):
+        return self._threads
+
+    @property
+    def depth(self):
+        return self._depth
+
+    @property
+    def budget(self):
+        return self._budget
+
+    @property
+    def stats(self):
+        return self._stats
+
+    @property
+    def held(self):
+        """Files currently held ahead of the parser.
+
+        """
+        return sorted(self._held.keys())
+
+    def start(self):
+        """Start the I/O threads.
+
+        """
+        while len(self._workers) < self.threads:
+            worker = threading.Thread(target=self._run)
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def schedule(self, files):
+        """Queue *files* for prefetch in parse order.
+
+        """
+        self.start()
+
+        with self._lock:
+            self._pending.extend(files)
+        self.fill()
+
+    def fill(self):
+        """Hand the next pending files to the I/O threads while within
+        :attr:`depth` and :attr:`budget`.
+
+        """
+        with self._lock:
+            while self._pending and len(self._held) < self.depth:
+                filepath = self._pending[0]
+                try:
+                    size = os.path.getsize(filepath)
+                except OSError:
+                    self._pending.popleft()
+                    continue
+
+                if self._held and self._used + size > self.budget:
+                    break
+
+                self._pending.popleft()
+                self._held[filepath] = size
+                self._used += size
+                self._queue.put(filepath)
+
+    def done(self, filepath):
+        """Release *filepath* once it has been parsed.
+
+        A file that was parsed before its turn to be prefetched is
+        dropped from the pending files.
+
+        """
+        with self._lock:
+            size = self._held.pop(filepath, None)
+            if size is not None:
+                self._used -= size
+            else:
+                self.stats['prefetch_missed'] += 1
+                if filepath in self._pending:
+                    self._pending.remove(filepath)
+        self.fill()
+
+    def clear(self):
+        """Drop all pending and held files at the end of a cycle.
+
+        """
+        with self._lock:
+            self._pending.clear()
+            self._held.clear()
+            self._used = 0
+
+    def wait(self):
+        """Block until the I/O threads have caught up.
+
+        """
+        self._queue.join()
+
+    def stop(self):
+        """Stop the I/O threads.
+
+        """
+        self.clear()
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def warm(self, filepath):
+        """Bring *filepath* into the page cache.
+
+        **Returns:**
+            number of bytes read (``0`` if the kernel was advised)
+
+        """
+        read = 0
+
+        fd = os.open(filepath, os.O_RDONLY)
+        try:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(fd, 0, 0,
+                                 os.POSIX_FADV_WILLNEED)  # pylint: disable=E1101
+            else:
+                chunk = os.read(fd, self.CHUNK_SIZE)
+                while chunk:
+                    read += len(chunk)
+                    chunk = os.read(fd, self.CHUNK_SIZE)
+        finally:
+            os.close(fd)
+
+        return read
+
+    def _run(self):
+        """I/O thread main loop.
+
+        """
+        while True:
+            filepath = self._queue.get()
+            try:
+                if filepath is None:
+                    break
+
+                with self._lock:
+                    wanted = filepath in self._held
+                if wanted:
+                    read = self.warm(filepath)
+                    with self._lock:
+                        self.stats['prefetched'] += 1
+                        self.stats['prefetched_bytes'] += read
+            except (IOError, OSError) as err:
+                log.debug('Unable to prefetch "%s": %s' % (filepath, err))
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,290 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.Scanner` sources candidate files from the
+inbound directory tree without re-listing the directories that have not
+changed.
+
+"""
+__all__ = ["Scanner"]
+
+import os
+import re
+import time
+import fnmatch
+import collections
+import multiprocessing.pool
+
+from logga.log import log
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+
+class Scanner(object):
+    """:class:`baip_parser.Scanner`
+
+    Each directory's modification time is cached along with its matching
+    file names and its subdirectory names.  A directory's modification
+    time only changes when entries are added, removed or renamed so an
+    unchanged directory costs a single ``stat`` per scan.  Its
+    subdirectories are still checked in the same way.
+
+    A cache entry is only trusted once the scan that produced it is at
+    least :attr:`MTIME_GRACE` seconds younger than the directory's
+    modification time.  This covers file systems with coarse time
+    stamps.
+
+    Directories are listed with ``scandir`` where available (Python 3.5
+    or the ``scandir`` package).
+
+    .. attribute:: exclude_dirs
+
+        list of :mod:`fnmatch` patterns.  Directories whose name or path
+        relative to the scanned directory match are not descended into
+
+    .. attribute:: threads
+
+        number of threads that list a level of the tree in parallel.
+        ``0`` or ``1`` lists serially
+
+    .. attribute:: parallel_min
+
+        minimum number of directories in a level of the tree before
+        :attr:`threads` are engaged
+
+    .. attribute:: stats
+
+        :class:`collections.Counter` of scan statistics
+
+    """
+    MTIME_GRACE = 1.0
+
+    _exclude_dirs = []
+    _threads = 0
+    _parallel_min = 64
+    _stats = None
+    _cache = {}
+
+    def __init__(self, exclude_dirs=None, threads=0, parallel_min=64):
+        """Scanner initialiser.
+
+        """
+        self._exclude_dirs = []
+        if exclude_dirs is not None:
+            self._exclude_dirs.extend(exclude_dirs)
+        self._threads = threads
+        self._parallel_min = parallel_min
+        self._stats = collections.Counter()
+        self._cache = {}
+
+    @property
+    def exclude_dirs(self):
+        return self._exclude_dirs
+
+    @exclude_dirs.setter
+    def exclude_dirs(self, values=None):
+        self._exclude_dirs = []
+        if values is not None:
+            self._exclude_dirs.extend(values)
+
+    @property
+    def threads(self):
+        return self._threads
+
+    @threads.setter
+    def threads(self, value):
+        self._threads = value
+
+    @property
+    def parallel_min(self):
+        return self._parallel_min
+
+    @parallel_min.setter
+    def parallel_min(self, value):
+        self._parallel_min = value
+
+    @property
+    def stats(self):
+        return self._stats
+
+    def scan(self, directory, file_filter=None, done_marker=None):
+        """Source the files under *directory*.
+
+        **Args:**
+            *directory*: root of the tree to scan
+
+        **Kwargs:**
+            *file_filter*: regular expression that file names must match
+
+            *done_marker*: if set, only return files that have a sidecar
+            file of the same name plus *done_marker*.  Files without one
+            are tallied as ``awaiting_marker``
+
+        **Returns:**
+            list of matching files (directory by directory, top down)
+
+        """
+        reg_c = None
+        if file_filter is not None:
+            reg_c = re.compile(file_filter)
+        key = (file_filter, done_marker)
+
+        files = []
+        cache = {}
+        now = time.time()
+
+        frontier = [directory]
+        while frontier:
+            args = [(x, reg_c, key, now) for x in frontier]
+            if self.threads > 1 and len(frontier) >= self.parallel_min:
+                pool = multiprocessing.pool.ThreadPool(min(self.threads,
+                                                           len(frontier)))
+                try:
+                    listings = pool.map(self._scan_dir, args)
+                finally:
+                    pool.close()
+                    pool.join()
+                self.stats['dirs_parallel'] += len(frontier)
+            else:
+                listings = [self._scan_dir(x) for x in args]
+
+            level = frontier
+            frontier = []
+            for dirpath, listing in zip(level, listings):
+                if listing is None:
+                    continue
+
+                entry, cached = listing
+                cache[dirpath] = entry
+                if cached:
+                    self.stats['dirs_cached'] += 1
+                else:
+                    self.stats['dirs_scanned'] += 1
+
+                files.extend([os.path.join(dirpath, x)
+                              for x in entry['files']])
+                if entry['awaiting']:
+                    self.stats['awaiting_marker'] += entry['awaiting']
+
+                for dirname in entry['dirs']:
+                    subdir = os.path.join(dirpath, dirname)
+                    if self.excluded(subdir, directory):
+                        self.stats['dirs_excluded'] += 1
+                    else:
+                        frontier.append(subdir)
+
+        # Directories that have gone are forgotten.
+        self._cache = cache
+
+        return files
+
+    def excluded(self, dirpath, root):
+        """Check *dirpath* against the :attr:`exclude_dirs` patterns.
+
+        Patterns are matched against the directory name and the path
+        relative to *root*.
+
+        """
+        name = os.path.basename(dirpath)
+        relative = os.path.relpath(dirpath, root)
+
+        return any([fnmatch.fnmatch(name, x) or fnmatch.fnmatch(relative, x)
+                    for x in self.exclude_dirs])
+
+    @staticmethod
+    def listing(dirpath):
+        """List the entries of *dirpath*.
+
+        **Returns:**
+            tuple of the form ``([<filename>, ...], [<dirname>, ...])``
+
+        """
+        filenames = []
+        dirnames = []
+
+        # As per os.walk, symbolic links to directories are not followed.
+        if scandir is not None:
+            for entry in scandir(dirpath):
+                if not entry.is_dir():
+                    filenames.append(entry.name)
+                elif not entry.is_symlink():
+                    dirnames.append(entry.name)
+        else:
+            for name in os.listdir(dirpath):
+                path = os.path.join(dirpath, name)
+                if not os.path.isdir(path):
+                    filenames.append(name)
+                elif not os.path.islink(path):
+                    dirnames.append(name)
+
+        return (filenames, dirnames)
+
+    def _scan_dir(self, args):
+        """Produce the cache entry for a single directory, re-listing it
+        only if it has changed.
+
+        **Args:**
+            *args*: tuple of the form ``(<dirpath>, <reg_c>, <key>,
+            <now>)``
+
+        **Returns:**
+            tuple of the form ``(<entry>, <cached>)`` or ``None`` if the
+            directory could not be read
+
+        """
+        dirpath, reg_c, key, now = args
+
+        listing = None
+
+        entry = self._cache.get(dirpath)
+        try:
+            mtime = os.stat(dirpath).st_mtime
+            if (entry is not None and
+                    entry['key'] == key and
+                    entry['mtime'] == mtime and
+                    entry['scanned'] - mtime > self.MTIME_GRACE):
+                listing = (entry, True)
+            else:
+                filenames, dirnames = self.listing(dirpath)
+                entry = self.entry(filenames, dirnames, reg_c, key[1])
+                entry.update({'mtime': mtime, 'scanned': now, 'key': key})
+                listing = (entry, False)
+        except OSError as error:
+            log.debug('Unable to scan "%s": %s' % (dirpath, error))
+
+        return listing
+
+    @staticmethod
+    def entry(filenames, dirnames, reg_c=None, done_marker=None):
+        """Build the cache entry of a directory from its listing.
+
+        **Returns:**
+            dictionary of the form::
+
+                {'files': [<matching_filename>, ...],
+                 'dirs': [<dirname>, ...],
+                 'awaiting': <files_without_done_marker>}
+
+        """
+        names = set(filenames)
+        matched = []
+        awaiting = 0
+        for filename in sorted(filenames):
+            if reg_c is not None and not reg_c.match(filename):
+                continue
+
+            # The sidecar check is against the directory listing
+            # so it costs no additional system calls.
+            if done_marker and '%s%s' % (filename, done_marker) not in names:
+                awaiting += 1
+                continue
+
+            matched.append(filename)
+
+        return {'files': matched,
+                'dirs': sorted(dirnames),
+                'awaiting': awaiting}
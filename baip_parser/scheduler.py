@@ -0,0 +1,258 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.Scheduler` orders workbooks across the
+:class:`baip_parser.ParserDaemon` parse workers so that the largest
+workbooks are started first.
+
+"""
+__all__ = ["Scheduler"]
+
+import os
+import re
+import json
+import heapq
+import zipfile
+
+from baip_parser.parser import Parser
+from logga.log import log
+
+
+class Scheduler(object):
+    """:class:`baip_parser.Scheduler`
+
+    The cost of a workbook is estimated from its size on disk plus the
+    uncompressed size of its worksheet and shared strings members.  The
+    member sizes are read from the zip central directory so nothing is
+    decompressed.
+
+    Workbooks are dispatched in Longest Processing Time (LPT) order.
+    When a :attr:`history_file` is set, the observed parse time per unit
+    of cost is learned for each workbook template so that the makespan
+    predictions are expressed in seconds.
+
+    .. attribute:: history_file
+
+        JSON file that persists the learned rate of each template.  If
+        ``None``, rates are learned for the life of the object only
+
+    .. attribute:: template_pattern
+
+        regular expression applied to the workbook file name.  The first
+        group (or the whole match) identifies the workbook's template.
+        Workbooks that do not match share the default template
+
+    .. attribute:: smoothing
+
+        weight given to the most recent observation when updating a
+        template's rate
+
+    """
+    DEFAULT_TEMPLATE = '*'
+
+    _history_file = None
+    _template_pattern = None
+    _smoothing = 0.3
+    _rates = {}
+
+    def __init__(self, history_file=None, template_pattern=None):
+        """Scheduler initialiser.
+
+        """
+        self._history_file = history_file
+        self._template_pattern = template_pattern
+        self._rates = {}
+
+        self.load()
+
+    @property
+    def history_file(self):
+        return self._history_file
+
+    @history_file.setter
+    def history_file(self, value):
+        self._history_file = value
+
+    @property
+    def template_pattern(self):
+        return self._template_pattern
+
+    @template_pattern.setter
+    def template_pattern(self, value):
+        self._template_pattern = value
+
+    @property
+    def smoothing(self):
+        return self._smoothing
+
+    @smoothing.setter
+    def smoothing(self, value):
+        self._smoothing = value
+
+    @property
+    def rates(self):
+        return self._rates
+
+    def load(self):
+        """Read the learned template rates from :attr:`history_file`.
+
+        """
+        if self.history_file is not None and os.path.exists(self.history_file):
+            try:
+                fh = open(self.history_file)
+                self._rates = json.load(fh)
+                fh.close()
+            except (IOError, ValueError) as err:
+                log.warn('Unable to load schedule history "%s": %s' %
+                         (self.history_file, err))
+
+    def save(self):
+        """Persist the learned template rates to :attr:`history_file`.
+
+        """
+        if self.history_file is not None:
+            tmp_file = '%s.tmp' % self.history_file
+            try:
+                fh = open(tmp_file, 'w')
+                json.dump(self.rates, fh, indent=1, sort_keys=True)
+                fh.close()
+                os.rename(tmp_file, self.history_file)
+            except (IOError, OSError) as err:
+                log.error('Unable to save schedule history "%s": %s' %
+                          (self.history_file, err))
+
+    def template(self, filepath):
+        """Identify the template of the workbook *filepath*.
+
+        """
+        template = self.DEFAULT_TEMPLATE
+
+        if self.template_pattern is not None:
+            match = re.search(self.template_pattern,
+                              os.path.basename(filepath))
+            if match is not None:
+                if match.groups():
+                    template = match.group(1)
+                else:
+                    template = match.group(0)
+
+        return template
+
+    def cost(self, filepath):
+        """Estimate the cost of parsing the workbook *filepath*.
+
+        **Returns:**
+            the size of *filepath* on disk plus the uncompressed size of
+            its worksheet and shared strings members (in bytes)
+
+        """
+        cost = 0
+
+        try:
+            cost = os.path.getsize(filepath)
+            archive = zipfile.ZipFile(filepath)
+            cost += sum([x.file_size for x in archive.infolist()
+                         if x.filename.startswith(Parser.SHEET_MEMBERS)])
+            archive.close()
+        except (OSError, IOError, zipfile.BadZipfile) as err:
+            log.debug('Unable to size "%s": %s' % (filepath, err))
+
+        return cost
+
+    def rate(self, template):
+        """Seconds per unit of cost for *template*.
+
+        Falls back to the default template's rate and then to ``None``
+        if nothing has been learned.
+
+        """
+        rate = self.rates.get(template)
+        if rate is None:
+            rate = self.rates.get(self.DEFAULT_TEMPLATE)
+
+        return rate
+
+    def estimate(self, filepath, cost):
+        """Estimate the parse time of *filepath* from its *cost*.
+
+        **Returns:**
+            estimated seconds or *cost* itself if no rate has been
+            learned
+
+        """
+        estimate = cost
+
+        rate = self.rate(self.template(filepath))
+        if rate is not None:
+            estimate = cost * rate
+
+        return estimate
+
+    def schedule(self, files, workers=1):
+        """Order *files* largest estimate first and log the predicted
+        makespan across *workers*.
+
+        **Args:**
+            *files*: list of workbooks to schedule
+
+        **Kwargs:**
+            *workers*: number of parse workers
+
+        **Returns:**
+            list of tuples of the form ``(<filepath>, <cost>)`` in
+            dispatch order
+
+        """
+        estimates = {}
+        scheduled = []
+        for filepath in files:
+            cost = self.cost(filepath)
+            estimates[filepath] = self.estimate(filepath, cost)
+            scheduled.append((filepath, cost))
+
+        scheduled.sort(key=lambda x: estimates[x[0]], reverse=True)
+
+        if scheduled:
+            makespan = self.makespan([estimates[x[0]] for x in scheduled],
+                                     workers)
+            unit = 's' if self.rates else ' cost units'
+            log.info('Scheduled %d files across %d workers: '
+                     'predicted makespan %.1f%s (total %.1f%s)' %
+                     (len(scheduled),
+                      max(workers, 1),
+                      makespan,
+                      unit,
+                      sum(estimates.values()),
+                      unit))
+
+        return scheduled
+
+    @staticmethod
+    def makespan(estimates, workers=1):
+        """Predict the makespan of *estimates* dispatched in order to
+        the next free worker of *workers*.
+
+        """
+        loads = [0.0] * max(workers, 1)
+        for estimate in estimates:
+            heapq.heapreplace(loads, loads[0] + estimate)
+
+        return max(loads)
+
+    def record(self, filepath, cost, elapsed):
+        """Learn from the *elapsed* seconds it took to parse *filepath*
+        of *cost*.
+
+        Both the workbook's template and the default template are
+        updated.
+
+        """
+        if cost > 0:
+            observed = float(elapsed) / cost
+            templates = set([self.template(filepath),
+                             self.DEFAULT_TEMPLATE])
+            for template in templates:
+                rate = self.rates.get(template)
+                if rate is None:
+                    rate = observed
+                else:
+                    rate += self.smoothing * (observed - rate)
+                self.rates[template] = rate
@@ -0,0 +1,110 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.SheetCache` persists the values extracted from
+each worksheet along with the zip central directory CRC of the
+worksheet's XML member.
+
+"""
+__all__ = ["SheetCache"]
+
+import os
+import hashlib
+import cPickle
+
+from logga.log import log
+
+
+class SheetCache(object):
+    """:class:`baip_parser.SheetCache`
+
+    One cache file is held per workbook under :attr:`cache_dir`.  Each
+    cache entry is a dictionary of the form::
+
+        {'cells': [<cell_to_extract>, ...],
+         'parts': {<member>: (<crc>, <size>), ...},
+         'sheets': {<worksheet_name>: {'member': <member>,
+                                       'crc': (<crc>, <size>),
+                                       'values': {<cell>: (<value>,
+                                                           <sst_index>)}}}}
+
+    where *sst_index* is the shared strings table index of string
+    values (``None`` otherwise) so that cached values can be re-resolved
+    when only the shared strings table has changed.
+
+    .. attribute:: cache_dir
+
+        directory to persist the cache entries to.  If ``None``, entries
+        are held in memory only
+
+    """
+    _cache_dir = None
+    _entries = {}
+
+    def __init__(self, cache_dir=None):
+        """SheetCache initialiser.
+
+        """
+        self._cache_dir = cache_dir
+        self._entries = {}
+
+    @property
+    def cache_dir(self):
+        return self._cache_dir
+
+    @cache_dir.setter
+    def cache_dir(self, value):
+        self._cache_dir = value
+
+    def cache_file(self, filepath):
+        """Name of the cache file that holds the entry for the workbook
+        *filepath*.
+
+        """
+        name = os.path.abspath(filepath)
+        if isinstance(name, unicode):
+            name = name.encode('utf-8')
+
+        return os.path.join(self.cache_dir,
+                            '%s.cache' % hashlib.sha1(name).hexdigest())
+
+    def load(self, filepath):
+        """Get the cache entry for the workbook *filepath*.
+
+        **Returns:**
+            the cache entry dictionary or ``None`` if the workbook has
+            not been cached
+
+        """
+        entry = self._entries.get(filepath)
+
+        if entry is None and self.cache_dir is not None:
+            cache_file = self.cache_file(filepath)
+            if os.path.exists(cache_file):
+                try:
+                    fh = open(cache_file, 'rb')
+                    entry = cPickle.load(fh)
+                    fh.close()
+                except (IOError, EOFError, cPickle.UnpicklingError) as err:
+                    log.warn('Unable to load sheet cache "%s": %s' %
+                             (cache_file, err))
+
+        return entry
+
+    def save(self, filepath, entry):
+        """Store the cache *entry* for the workbook *filepath*.
+
+        """
+        if self.cache_dir is None:
+            self._entries[filepath] = entry
+        else:
+            cache_file = self.cache_file(filepath)
+            tmp_file = '%s.tmp' % cache_file
+            try:
+                if not os.path.isdir(self.cache_dir):
+                    os.makedirs(self.cache_dir)
+                fh = open(tmp_file, 'wb')
+                cPickle.dump(entry, fh, cPickle.HIGHEST_PROTOCOL)
+                fh.close()
+                os.rename(tmp_file, cache_file)
+            except (IOError, OSError) as err:
+                log.error('Unable to save sheet cache "%s": %s' %
+                          (cache_file, err))
@@ -0,0 +1,137 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.Sniffer` provides a cheap, pre-open
+classification of candidate ingest files.
+
+"""
+__all__ = ["Sniffer"]
+
+import os
+import zipfile
+
+from logga.log import log
+
+
+class Sniffer(object):
+    """:class:`baip_parser.Sniffer`
+
+    Classification only touches the first bytes of the file and the
+    zip central directory.  No archive members are decompressed.
+
+    .. attribute:: accepted_kinds
+
+        list of file kinds that will pass classification (default
+        ``['xlsx', 'xlsb', 'xls', 'docx']``)
+
+    """
+    ZIP_MAGIC = 'PK\x03\x04'
+    OLE_MAGIC = '\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+    LOCK_PREFIX = '~$'
+    KIND_MEMBERS = [('xlsx', 'xl/workbook.xml'),
+                    ('xlsb', 'xl/workbook.bin'),
+                    ('docx', 'word/document.xml')]
+
+    _accepted_kinds = ['xlsx', 'xlsb', 'xls', 'docx']
+
+    def __init__(self, accepted_kinds=None):
+        """Sniffer initialiser.
+
+        """
+        if accepted_kinds is not None:
+            self.accepted_kinds = accepted_kinds
+
+    @property
+    def accepted_kinds(self):
+        return self._accepted_kinds
+
+    @accepted_kinds.setter
+    def accepted_kinds(self, values=None):
+        self._accepted_kinds = []
+
+        if values is not None and isinstance(values, list):
+            self._accepted_kinds.extend(values)
+
+    def classify(self, filepath):
+        """Identify the kind of *filepath* without a full open.
+
+        **Args:**
+            *filepath*: fully qualified name of the file to classify
+
+        **Returns:**
+            the file kind (for example, ``xlsx``, or ``xls`` for an OLE2
+            compound document) or, if the file
+            cannot be an ingest candidate, one of the rejection
+            reasons ``lock_file``, ``unreadable``, ``not_zip`` or
+            ``unknown_zip``
+
+        """
+        kind = None
+
+        if os.path.basename(filepath).startswith(self.LOCK_PREFIX):
+            kind = 'lock_file'
+        else:
+            try:
+                fh = open(filepath, 'rb')
+                magic = fh.read(len(self.OLE_MAGIC))
+                fh.close()
+            except IOError as error:
+                log.debug('Unable to sniff "%s": %s' % (filepath, error))
+                kind = 'unreadable'
+            else:
+                if magic == self.OLE_MAGIC:
+                    kind = 'xls'
+                elif not magic.startswith(self.ZIP_MAGIC):
+                    kind = 'not_zip'
+
+        if kind is None:
+            kind = self.zip_kind(filepath)
+
+        log.debug('File "%s" classified as "%s"' % (filepath, kind))
+
+        return kind
+
+    def zip_kind(self, filepath):
+        """Check the zip central directory of *filepath* for the
+        members that identify an Office Open XML document.
+
+        **Args:**
+            *filepath*: fully qualified name of the zip file
+
+        **Returns:**
+            the file kind as per :attr:`KIND_MEMBERS` or ``unknown_zip``
+            if no identifying member exists
+
+        """
+        kind = 'unknown_zip'
+
+        try:
+            archive = zipfile.ZipFile(filepath)
+            members = set(archive.namelist())
+            archive.close()
+        except (zipfile.BadZipfile, IOError) as error:
+            log.debug('Bad zip central directory "%s": %s' %
+                      (filepath, error))
+            members = set()
+            kind = 'not_zip'
+
+        for member_kind, member in self.KIND_MEMBERS:
+            if member in members:
+                kind = member_kind
+                break
+
+        return kind
+
+    def accept(self, filepath):
+        """Wrapper around :meth:`classify` that checks the kind of
+        *filepath* against :attr:`accepted_kinds`.
+
+        **Args:**
+            *filepath*: fully qualified name of the file to check
+
+        **Returns:**
+            tuple of the form ``(<accepted>, <kind>)`` where
+            *accepted* is Boolean ``True`` if *filepath* can be parsed
+
+        """
+        kind = self.classify(filepath)
+
+        return (kind in self.accepted_kinds, kind)
@@ -0,0 +1,138 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.Sorter` provides an external merge sort that
+can order more records than will fit in memory.
+
+"""
+__all__ = ["Sorter"]
+
+import heapq
+import tempfile
+import cPickle
+
+from logga.log import log
+
+
+class Sorter(object):
+    """:class:`baip_parser.Sorter`
+
+    Records are accumulated into chunks of :attr:`chunk_size`.  Once a
+    chunk is full it is sorted and spilled to a temporary file.  The
+    sorted chunks are then streamed back through a k-way merge.
+
+    .. attribute:: chunk_size
+
+        maximum number of records to hold in memory before a sorted
+        chunk is spilled to disk
+
+    .. attribute:: tmp_dir
+
+        directory to write the spill files to (default is the system
+        temporary directory)
+
+    """
+    _chunk_size = 100000
+    _tmp_dir = None
+
+    def __init__(self, chunk_size=None, tmp_dir=None):
+        """Sorter initialiser.
+
+        """
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+
+        if tmp_dir is not None:
+            self._tmp_dir = tmp_dir
+
+    @property
+    def chunk_size(self):
+        return self._chunk_size
+
+    @chunk_size.setter
+    def chunk_size(self, value):
+        if value is not None and value > 0:
+            self._chunk_size = value
+
+    @property
+    def tmp_dir(self):
+        return self._tmp_dir
+
+    @tmp_dir.setter
+    def tmp_dir(self, value):
+        self._tmp_dir = value
+
+    def sort(self, records):
+        """Generator that yields *records* in ascending order.
+
+        Records are compared as a whole so callers should decorate
+        each record with its sort key (and a unique sequence number
+        if ties must not fall through to the payload).  For example::
+
+            (<sort_key>, <sequence>, <row>)
+
+        **Args:**
+            *records*: iterable of comparable records
+
+        **Returns:**
+            generator of the sorted records
+
+        """
+        spills = []
+        chunk = []
+
+        try:
+            for record in records:
+                chunk.append(record)
+                if len(chunk) >= self.chunk_size:
+                    spills.append(self.spill(chunk))
+                    chunk = []
+
+            chunk.sort()
+            if not spills:
+                for record in chunk:
+                    yield record
+            else:
+                if chunk:
+                    spills.append(self.spill(chunk))
+                    chunk = []
+
+                log.debug('Merging %d sorted chunks' % len(spills))
+                streams = [self.replay(fh) for fh in spills]
+                for record in heapq.merge(*streams):
+                    yield record
+        finally:
+            for fh in spills:
+                fh.close()
+
+    def spill(self, chunk):
+        """Sort *chunk* and write it out to a temporary file.
+
+        **Args:**
+            *chunk*: list of records to sort and spill
+
+        **Returns:**
+            file object of the spilled chunk rewound to the start
+
+        """
+        chunk.sort()
+        log.debug('Spilling sorted chunk of %d records' % len(chunk))
+
+        fh = tempfile.TemporaryFile(dir=self.tmp_dir)
+        for record in chunk:
+            cPickle.dump(record, fh, cPickle.HIGHEST_PROTOCOL)
+        fh.seek(0)
+
+        return fh
+
+    @staticmethod
+    def replay(fh):
+        """Generator that streams the records from a spill file.
+
+        **Args:**
+            *fh*: file object as returned by :meth:`spill`
+
+        """
+        while True:
+            try:
+                yield cPickle.load(fh)
+            except EOFError:
+                break
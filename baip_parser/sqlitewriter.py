@@ -0,0 +1,182 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.SqliteWriter` supports the SQLite database
+output
+
+"""
+__all__ = [
+    "SqliteWriter",
+]
+import sqlite3
+import itertools
+
+from baip_parser.writer import Writer
+from logga.log import log
+
+
+class SqliteWriter(Writer):
+    """:class:`baip_parser.Writer` backend that upserts the output rows
+    into a SQLite database (:attr:`outfile`).
+
+    Each row is stored against its ``<workbook>|<worksheet>`` key in
+    the :attr:`KEY_COLUMN` primary key column.  The remaining columns
+    are named after :attr:`columns`.  The table is created on first
+    write and any new headers are added as columns.
+
+    All rows of a write are upserted in :attr:`batch_rows` sized
+    ``executemany`` batches within a single transaction.  Rows whose
+    values have not changed are left untouched, so re-writing unchanged
+    workbooks costs no database writes.  The database is placed in WAL
+    mode so that readers are not blocked during the write.
+
+    Rows are not removed from the table when their key is no longer
+    output.
+
+    .. attribute:: table
+
+        name of the table to write to
+
+    .. attribute:: batch_rows
+
+        number of rows passed to each ``executemany`` call
+
+    """
+    _table = 'cells'
+    _batch_rows = 1000
+
+    def __init__(self, outfile=None, table=None):
+        """SqliteWriter initialiser.
+
+        """
+        super(SqliteWriter, self).__init__(outfile)
+
+        if table is not None:
+            self._table = table
+
+    @property
+    def table(self):
+        return self._table
+
+    @table.setter
+    def table(self, value):
+        self._table = value
+
+    @property
+    def batch_rows(self):
+        return self._batch_rows
+
+    @batch_rows.setter
+    def batch_rows(self, value):
+        self._batch_rows = value
+
+    def write_output(self, data, word_boundary=False, keys=None):
+        """Upsert the list of tuple values in *data* against their
+        *keys*.
+
+        **Args:**
+            *data*: list of tuples to write out
+
+            *word_boundary*: if ``True``, attempts to tidy-up a truncated
+            string by removing the last word in the sentence
+
+            *keys*: list of ``<workbook>|<worksheet>`` keys that
+            align with the rows in *data*
+
+        """
+        log.debug('Preparing "%s" for output' % self.outfile)
+
+        if keys is None:
+            log.error('SQLite output requires row keys: nothing written')
+        else:
+            columns = self.columns
+            rows = self.prepare(data, word_boundary, keys, keyed=True)
+            params = (self.params(key, row, columns) for key, row in rows)
+
+            connection = sqlite3.connect(self.outfile)
+            try:
+                connection.execute('PRAGMA journal_mode=WAL')
+                self.create_table(connection, columns)
+                statement = self.upsert_statement(columns)
+
+                counter = 0
+                with connection:
+                    while True:
+                        batch = list(itertools.islice(params,
+                                                      self.batch_rows))
+                        if not batch:
+                            break
+                        connection.executemany(statement, batch)
+                        counter += len(batch)
+            finally:
+                connection.close()
+
+            log.debug('%d records upserted to "%s" table "%s"' %
+                      (counter, self.outfile, self.table))
+
+    def params(self, key, row, columns):
+        """Convert *row* into the upsert parameters for *key*.
+
+        As per the CSV output, the last of any duplicate header wins.
+
+        """
+        values = dict(zip(self.headers, row))
+
+        return [key] + [values.get(x) for x in columns]
+
+    def create_table(self, connection, columns):
+        """Create :attr:`table` if it does not exist and add any of
+        *columns* that are missing.
+
+        """
+        connection.execute('CREATE TABLE IF NOT EXISTS %s (%s PRIMARY KEY)' %
+                           (self.quote(self.table),
+                            self.quote(self.KEY_COLUMN)))
+
+        info = connection.execute('PRAGMA table_info(%s)' %
+                                  self.quote(self.table))
+        existing = [x[1] for x in info.fetchall()]
+        for column in columns:
+            if column not in existing:
+                log.info('Adding column "%s" to table "%s"' %
+                         (column, self.table))
+                connection.execute('ALTER TABLE %s ADD COLUMN %s' %
+                                   (self.quote(self.table),
+                                    self.quote(column)))
+
+    def upsert_statement(self, columns):
+        """Build the upsert statement for *columns*.
+
+        SQLite 3.24 onwards only updates rows whose values differ.
+        Earlier versions replace the row.
+
+        """
+        names = [self.quote(x) for x in [self.KEY_COLUMN] + columns]
+        placeholders = ', '.join(['?'] * len(names))
+
+        if sqlite3.sqlite_version_info >= (3, 24, 0):
+            statement = ('INSERT INTO %s (%s) VALUES (%s) ' %
+                         (self.quote(self.table),
+                          ', '.join(names),
+                          placeholders))
+            statement += 'ON CONFLICT(%s) DO ' % names[0]
+            if columns:
+                statement += 'UPDATE SET %s WHERE %s' % (
+                    ', '.join(['%s = excluded.%s' % (x, x)
+                               for x in names[1:]]),
+                    ' OR '.join(['%s IS NOT excluded.%s' % (x, x)
+                                 for x in names[1:]]))
+            else:
+                statement += 'NOTHING'
+        else:
+            statement = ('INSERT OR REPLACE INTO %s (%s) VALUES (%s)' %
+                         (self.quote(self.table),
+                          ', '.join(names),
+                          placeholders))
+
+        return statement
+
+    @staticmethod
+    def quote(identifier):
+        """Quote *identifier* for use in a SQLite statement.
+
+        """
+        return '"%s"' % identifier.replace('"', '""')
@@ -0,0 +1,429 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.Supervisor` runs tasks in long-lived worker
+processes that are recycled before their memory footprint grows out of
+hand.
+
+"""
+__all__ = ["Supervisor"]
+
+import os
+import time
+import select
+import signal
+import resource
+import collections
+import multiprocessing
+
+from logga.log import log
+
+# Worker slot: the process, the queue that feeds it tasks and the read
+# end of the pipe that it reports its results on.
+Worker = collections.namedtuple('Worker', ['process', 'tasks', 'results'])
+
+
+class Supervisor(object):
+    """:class:`baip_parser.Supervisor`
+
+    Each worker process handles one task at a time.  A worker retires
+    once it has handled :attr:`max_files` tasks or its resident set size
+    exceeds :attr:`max_rss` megabytes.  Retired (or dead) workers are
+    replaced immediately by one of :attr:`standby` idle workers that
+    have already been started so that recycling never stalls the
+    pipeline.  The standby pool is then topped up.
+
+    Each worker has its own task queue and result pipe.  These are
+    discarded along with the worker, so a worker that is killed part way
+    through a read or write never leaves a lock or a partial message
+    behind for the other workers.
+
+    .. attribute:: workers
+
+        number of active worker processes
+
+    .. attribute:: standby
+
+        number of idle worker processes held in reserve
+
+    .. attribute:: max_files
+
+        number of tasks a worker handles before it is recycled.  ``0``
+        means no limit
+
+    .. attribute:: max_rss
+
+        resident set size (in megabytes) that triggers the recycling of
+        a worker.  ``0`` means no limit
+
+    .. attribute:: poll_interval
+
+        seconds between worker liveness checks while waiting on results
+
+    .. attribute:: stats
+
+        :class:`collections.Counter` of worker lifecycle events
+
+    """
+    _workers = 1
+    _standby = 1
+    _max_files = 0
+    _max_rss = 0
+    _poll_interval = 1.0
+    _stats = None
+    _active = {}
+    _spares = []
+    _next_id = 0
+
+    def __init__(self, workers=1, standby=1, max_files=0, max_rss=0):
+        """Supervisor initialiser.
+
+        """
+        self._workers = workers
+        self._standby = standby
+        self._max_files = max_files
+        self._max_rss = max_rss
+        self._stats = collections.Counter()
+        self._active = {}
+        self._spares = []
+
+    @property
+    def workers(self):
+        return self._workers
+
+    @workers.setter
+    def workers(self, value):
+        self._workers = value
+
+    @property
+    def standby(self):
+        return self._standby
+
+    @standby.setter
+    def standby(self, value):
+        self._standby = value
+
+    @property
+    def max_files(self):
+        return self._max_files
+
+    @max_files.setter
+    def max_files(self, value):
+        self._max_files = value
+
+    @property
+    def max_rss(self):
+        return self._max_rss
+
+    @max_rss.setter
+    def max_rss(self, value):
+        self._max_rss = value
+
+    @property
+    def poll_interval(self):
+        return self._poll_interval
+
+    @poll_interval.setter
+    def poll_interval(self, value):
+        self._poll_interval = value
+
+    @property
+    def stats(self):
+        return self._stats
+
+    @property
+    def pids(self):
+        """Process IDs of the active workers.
+
+        """
+        return sorted([x.process.pid for x in self._active.itervalues()])
+
+    def spawn(self):
+        """Start a new worker process.
+
+        **Returns:**
+            tuple of the form ``(<worker_id>, <Worker>)``
+
+        """
+        worker_id = self._next_id
+        self._next_id += 1
+
+        tasks = multiprocessing.Queue()
+        results, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=_worker_loop,
+                                          args=(worker_id,
+                                                tasks,
+                                                sender,
+                                                self.max_files,
+                                                self.max_rss))
+        process.daemon = True
+        process.start()
+        # Only the worker holds the write end, so its death reads as EOF.
+        sender.close()
+        self.stats['workers_spawned'] += 1
+        log.debug('Spawned worker %d (pid %d)' % (worker_id, process.pid))
+
+        return (worker_id, Worker(process, tasks, results))
+
+    @staticmethod
+    def discard(worker):
+        """Release the task queue and result pipe of the exited
+        *worker*.
+
+        """
+        worker.tasks.cancel_join_thread()
+        worker.tasks.close()
+        worker.results.close()
+
+    def start(self):
+        """Top up the active and standby workers.
+
+        """
+        while len(self._active) < self.workers:
+            if self._spares:
+                worker_id, worker = self._spares.pop(0)
+            else:
+                worker_id, worker = self.spawn()
+            self._active[worker_id] = worker
+
+        while len(self._spares) < self.standby:
+            self._spares.append(self.spawn())
+
+    def replace(self, worker_id, kill=False):
+        """Retire the active worker *worker_id* and promote a standby
+        worker in its place.
+
+        **Kwargs:**
+            *kill*: terminate the worker rather than wait for it to exit
+
+        **Returns:**
+            the ID of the promoted worker
+
+        """
+        worker = self._active.pop(worker_id)
+        if kill and worker.process.is_alive():
+            worker.process.terminate()
+        worker.process.join(self.poll_interval)
+        if worker.process.is_alive():
+            worker.process.terminate()
+            worker.process.join()
+        self.discard(worker)
+
+        promoted_id = None
+        if self._spares:
+            promoted_id, promoted = self._spares.pop(0)
+        else:
+            promoted_id, promoted = self.spawn()
+        self._active[promoted_id] = promoted
+        log.debug('Worker %d replaced by worker %d' %
+                  (worker_id, promoted_id))
+
+        # Top up the standby pool for the next replacement.
+        self.start()
+
+        return promoted_id
+
+    def map(self, func, tasks, deadline=None):
+        """Run *func* against each of *tasks* across the active workers.
+
+        **Args:**
+            *func*: module level function that takes a single task
+            argument
+
+            *tasks*: iterable of task arguments.  The next task is only
+            drawn from *tasks* once a worker is idle
+
+        **Kwargs:**
+            *deadline*: wall-clock seconds a worker is given to handle a
+            task before it is killed
+
+        **Returns:**
+            generator of tuples of the form ``(<task>, <result>,
+            <failure>)`` in order of completion.  *failure* is ``None``
+            unless the worker died or was killed while handling *task*,
+            in which case it is a tuple of the form ``(<kind>,
+            <message>)`` where *kind* is ``worker_died`` or
+            ``deadline_exceeded``
+
+        """
+        self.start()
+
+        tasks = iter(tasks)
+        exhausted = False
+        idle = self._active.keys()
+        inflight = {}
+
+        while not exhausted or inflight:
+            while not exhausted and idle:
+                try:
+                    task = next(tasks)
+                except StopIteration:
+                    exhausted = True
+                    break
+                worker_id = idle.pop(0)
+                inflight[worker_id] = (task, time.time())
+                self._active[worker_id].tasks.put((func, task))
+
+            for worker_id in self.ready(inflight):
+                try:
+                    result, retire = self._active[worker_id].results.recv()
+                except (EOFError, IOError):
+                    # The worker died.  It is replaced by check().
+                    continue
+
+                task = inflight.pop(worker_id)[0]
+                if retire:
+                    self.stats['workers_recycled'] += 1
+                    idle.append(self.replace(worker_id))
+                else:
+                    idle.append(worker_id)
+
+                yield (task, result, None)
+
+            for failure in self.check(inflight, idle, deadline):
+                yield failure
+
+    def ready(self, inflight):
+        """Wait up to :attr:`poll_interval` for the workers in
+        *inflight* to report.
+
+        **Returns:**
+            list of the IDs of the workers whose result pipes are
+            readable (a result or the EOF of a dead worker)
+
+        """
+        pipes = dict((self._active[x].results, x) for x in inflight)
+
+        readable = []
+        if pipes:
+            readable = select.select(pipes.keys(), [], [],
+                                     self.poll_interval)[0]
+        else:
+            time.sleep(self.poll_interval)
+
+        return [pipes[x] for x in readable]
+
+    def check(self, inflight, idle, deadline=None):
+        """Replace the workers in *inflight* that have died or have
+        overrun *deadline*.  Replacement workers are added to *idle*.
+
+        **Args:**
+            *inflight*: dictionary of the form ``{<worker_id>: (<task>,
+            <started>)}``
+
+            *idle*: list of idle worker IDs
+
+        **Kwargs:**
+            *deadline*: wall-clock seconds a worker is given per task
+
+        **Returns:**
+            list of the failed tasks in the form ``(<task>, None,
+            (<kind>, <message>))``
+
+        """
+        failures = []
+
+        now = time.time()
+        for worker_id in inflight.keys():
+            task, started = inflight[worker_id]
+            worker = self._active[worker_id]
+            process = worker.process
+
+            failure = None
+            if not process.is_alive():
+                process.join()
+                if worker.results.poll() and process.exitcode == 0:
+                    # A retiring worker's last result is still queued.
+                    continue
+                failure = ('worker_died',
+                           'worker process died (exit code %s)' %
+                           process.exitcode)
+                self.stats['workers_died'] += 1
+            elif deadline and now - started > deadline:
+                failure = ('deadline_exceeded',
+                           'deadline of %.1fs exceeded' % deadline)
+                self.stats['workers_killed'] += 1
+
+            if failure is not None:
+                log.error('Worker %d: %s' % (worker_id, failure[1]))
+                del inflight[worker_id]
+                idle.append(self.replace(worker_id, kill=True))
+                failures.append((task, None, failure))
+
+        return failures
+
+    def stop(self):
+        """Shut down all active and standby workers.
+
+        """
+        workers = self._active.values() + [x[1] for x in self._spares]
+        for worker in workers:
+            worker.tasks.put(None)
+        for worker in workers:
+            worker.process.join(self.poll_interval)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+            self.discard(worker)
+
+        self._active = {}
+        self._spares = []
+
+    @staticmethod
+    def rss():
+        """Resident set size of the current process in megabytes.
+
+        Read from ``/proc`` where available.  Otherwise, the peak
+        resident set size is used.
+
+        """
+        try:
+            fh = open('/proc/self/statm')
+            pages = int(fh.read().split()[1])
+            fh.close()
+            rss = pages * resource.getpagesize() / (1024.0 * 1024.0)
+        except (IOError, IndexError, ValueError):
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+        return rss
+
+
+def _worker_loop(worker_id, tasks, results, max_files, max_rss):
+    """Worker process main loop.
+
+    Handles tasks of the form ``(<func>, <task>)`` from *tasks* until a
+    ``None`` sentinel arrives or the worker is due to retire.  Each
+    result is sent on the worker's own *results* pipe as ``(<result>,
+    <retire>)``.
+
+    """
+    # Workers inherit the daemon's SIGTERM handler.  Restore the default
+    # so that a worker can be killed.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    handled = 0
+
+    while True:
+        item = tasks.get()
+        if item is None:
+            break
+
+        func, task = item
+        result = func(task)
+        handled += 1
+
+        retire = False
+        if max_files and handled >= max_files:
+            log.info('Worker %d (pid %d) handled %d tasks: retiring' %
+                     (worker_id, os.getpid(), handled))
+            retire = True
+        elif max_rss:
+            rss = Supervisor.rss()
+            if rss > max_rss:
+                log.info('Worker %d (pid %d) RSS %.1fMB over %dMB: retiring' %
+                         (worker_id, os.getpid(), rss, max_rss))
+                retire = True
+
+        results.send((result, retire))
+        if retire:
+            break
+
+    results.close()
@@ -0,0 +1,182 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.Templates` caches the extraction plan of each
+workbook template.
+
+"""
+__all__ = ["Templates"]
+
+import os
+import json
+import hashlib
+import cPickle
+
+from openpyxl.cell import coordinate_from_string
+from openpyxl.reader.workbook import read_rels, read_sheets
+
+from logga.log import log
+
+
+class Templates(object):
+    """:class:`baip_parser.Templates`
+
+    Workbooks produced from the same template share their worksheet
+    names and the targets of their workbook relationships.  A digest of
+    these (:meth:`fingerprint`) identifies the template.  Only the small
+    ``xl/workbook.xml`` and ``xl/_rels/workbook.xml.rels`` members are
+    read.
+
+    The extraction plan of each template is resolved once
+    (:meth:`build`) and is then reused by every workbook of the
+    template.  A plan is a dictionary of the form::
+
+        {'cells': [<cell_to_extract>, ...],
+         'skip_sheets': [<sheet_to_skip>, ...],
+         'sheets': [(<worksheet_name>, <member>), ...],
+         'skipped': [<worksheet_name>, ...],
+         'targets': {<row>: {<coordinate>: <cell_to_extract>}},
+         'max_row': <row>}
+
+    where *sheets* lists the worksheets to extract (in workbook order)
+    with the zip member that holds each one and *targets* maps the rows
+    holding the cells to extract to the cells within them.
+
+    .. attribute:: template_dir
+
+        directory to persist the plans to.  If ``None``, plans are held
+        in memory only
+
+    """
+    _template_dir = None
+    _plans = {}
+
+    def __init__(self, template_dir=None):
+        """Templates initialiser.
+
+        """
+        self._template_dir = template_dir
+        self._plans = {}
+
+    @property
+    def template_dir(self):
+        return self._template_dir
+
+    @template_dir.setter
+    def template_dir(self, value):
+        self._template_dir = value
+
+    @staticmethod
+    def fingerprint(archive):
+        """Fingerprint the structure of the workbook *archive*.
+
+        **Args:**
+            *archive*: the workbook's :class:`zipfile.ZipFile`
+
+        **Returns:**
+            tuple of the form ``(<fingerprint>, <sheets>)`` where
+            *sheets* is the list of ``(<worksheet_name>, <member>)``
+            tuples in workbook order
+
+        """
+        rels = dict(read_rels(archive))
+
+        sheets = []
+        for sheet in read_sheets(archive):
+            member = rels.get(sheet['id'], {}).get('path')
+            sheets.append((sheet['name'], member))
+        targets = sorted([x['path'] for x in rels.values()])
+
+        digest = hashlib.sha1(json.dumps([sheets, targets]))
+
+        return (digest.hexdigest(), sheets)
+
+    @staticmethod
+    def build(sheets, skip_sheets, cells):
+        """Resolve the extraction plan of a template.
+
+        **Args:**
+            *sheets*: list of ``(<worksheet_name>, <member>)`` tuples as
+            per :meth:`fingerprint`
+
+            *skip_sheets*: worksheet names to skip (case-insensitive)
+
+            *cells*: the cells to extract
+
+        **Returns:**
+            the plan dictionary
+
+        """
+        skip = set([x.lower() for x in skip_sheets])
+
+        plan = {'cells': list(cells),
+                'skip_sheets': list(skip_sheets),
+                'sheets': [],
+                'skipped': [],
+                'targets': {},
+                'max_row': 0}
+
+        for name, member in sheets:
+            # As per openpyxl, only worksheets are parsed.
+            if member is None or 'worksheets' not in member:
+                continue
+            if name.lower() in skip:
+                plan['skipped'].append(name)
+            else:
+                plan['sheets'].append((name, member))
+
+        for cell in cells:
+            column, row = coordinate_from_string(cell.upper())
+            coordinate = '%s%d' % (column, row)
+            plan['targets'].setdefault(row, {})[coordinate] = cell
+            plan['max_row'] = max(plan['max_row'], row)
+
+        return plan
+
+    def plan_file(self, fingerprint):
+        """Name of the file that holds the plan of *fingerprint*.
+
+        """
+        return os.path.join(self.template_dir, '%s.plan' % fingerprint)
+
+    def load(self, fingerprint):
+        """Get the plan of the template *fingerprint*.
+
+        **Returns:**
+            the plan dictionary or ``None`` if the template has not been
+            seen
+
+        """
+        plan = self._plans.get(fingerprint)
+
+        if plan is None and self.template_dir is not None:
+            plan_file = self.plan_file(fingerprint)
+            if os.path.exists(plan_file):
+                try:
+                    fh = open(plan_file, 'rb')
+                    plan = cPickle.load(fh)
+                    fh.close()
+                    self._plans[fingerprint] = plan
+                except (IOError, EOFError, cPickle.UnpicklingError) as err:
+                    log.warn('Unable to load template plan "%s": %s' %
+                             (plan_file, err))
+
+        return plan
+
+    def save(self, fingerprint, plan):
+        """Store the *plan* of the template *fingerprint*.
+
+        """
+        self._plans[fingerprint] = plan
+
+        if self.template_dir is not None:
+            plan_file = self.plan_file(fingerprint)
+            tmp_file = '%s.tmp' % plan_file
+            try:
+                if not os.path.isdir(self.template_dir):
+                    os.makedirs(self.template_dir)
+                fh = open(tmp_file, 'wb')
+                cPickle.dump(plan, fh, cPickle.HIGHEST_PROTOCOL)
+                fh.close()
+                os.rename(tmp_file, plan_file)
+            except (IOError, OSError) as err:
+                log.error('Unable to save template plan "%s": %s' %
+                          (plan_file, err))
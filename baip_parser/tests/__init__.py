@@ -2,3 +2,24 @@
 """
 from test_parser import TestParser
 from test_writer import TestWriter
+from test_sqlitewriter import TestSqliteWriter
+from test_jsonlineswriter import TestJsonLinesWriter
+from test_parquetwriter import TestParquetWriter
+from test_fanout import TestFanout
+from test_columns import TestColumns
+from test_interner import TestInterner
+from test_templates import TestTemplates
+from test_xlsengine import TestXlsEngine
+from test_xlsbengine import TestXlsbEngine
+from test_docxengine import TestDocxEngine
+from test_sorter import TestSorter
+from test_delta import TestDelta
+from test_sniffer import TestSniffer
+from test_ledger import TestLedger
+from test_claimer import TestClaimer
+from test_sheetcache import TestSheetCache
+from test_scheduler import TestScheduler
+from test_supervisor import TestSupervisor
+from test_prefetcher import TestPrefetcher
+from test_scanner import TestScanner
+from test_checkpoint import TestCheckpoint
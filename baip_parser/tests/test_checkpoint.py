@@ -0,0 +1,133 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.Checkpoint` tests.
+
+"""
+import unittest2
+import os
+import shutil
+import tempfile
+import collections
+
+import baip_parser
+
+
+class TestCheckpoint(unittest2.TestCase):
+    """:class:`baip_parser.Checkpoint` test cases.
+    """
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._checkpoint_file = os.path.join(self._dir, 'checkpoint.json')
+        self._files = []
+        for name in ['BA-CLM-v01.xlsx', 'BA-FIN-v01.xlsx', 'BA-M02-v01.xlsx']:
+            filepath = os.path.join(self._dir, name)
+            open(filepath, 'w').close()
+            self._files.append(filepath)
+
+        self._results = [
+            collections.OrderedDict([('%s|CLM-2' % self._files[0],
+                                      {'B1': 'CLM-2'}),
+                                     ('%s|CLM-1' % self._files[0],
+                                      {'B1': 'CLM-1'})]),
+            None,
+            {'%s|M02' % self._files[2]: {'B1': 'M02'}},
+        ]
+
+    def test_init(self):
+        """Initialise a Checkpoint object.
+        """
+        checkpoint = baip_parser.Checkpoint(self._checkpoint_file)
+        msg = 'Object is not a baip_parser.Checkpoint'
+        self.assertIsInstance(checkpoint, baip_parser.Checkpoint, msg)
+
+        # Clean up.
+        checkpoint.close()
+
+    def test_record_and_resume(self):
+        """Journal completed files and read them back after a restart.
+        """
+        # Given files journalled by an earlier run
+        checkpoint = baip_parser.Checkpoint(self._checkpoint_file)
+        for filepath, result in zip(self._files, self._results):
+            checkpoint.record(filepath, result)
+        checkpoint.close()
+
+        # When the checkpoint is loaded again
+        checkpoint = baip_parser.Checkpoint(self._checkpoint_file)
+
+        # Then all files should be complete
+        received = [checkpoint.completed(x) for x in self._files]
+        expected = [True, True, True]
+        msg = 'Journalled files should be complete'
+        self.assertListEqual(received, expected, msg)
+
+        # And the rows should be read back in their original order
+        received = [checkpoint.result(x) for x in self._files]
+        msg = 'Checkpoint rows error'
+        self.assertListEqual(received, self._results, msg)
+        self.assertListEqual(received[0].keys(),
+                             self._results[0].keys(),
+                             msg)
+
+        received = checkpoint.entries[self._files[2]]['rows']
+        expected = [2, 3]
+        msg = 'Checkpoint row range error'
+        self.assertListEqual(received, expected, msg)
+
+        # Clean up.
+        checkpoint.clear()
+        msg = 'Checkpoint files should be removed'
+        self.assertFalse(os.path.exists(self._checkpoint_file), msg)
+        self.assertFalse(os.path.exists(checkpoint.rows_file), msg)
+
+    def test_torn_journal(self):
+        """Torn journal entry and its rows are discarded.
+        """
+        # Given a run that died while journalling the second file
+        checkpoint = baip_parser.Checkpoint(self._checkpoint_file)
+        checkpoint.record(self._files[0], self._results[0])
+        checkpoint.close()
+        fh = open(self._checkpoint_file, 'ab')
+        fh.write('{"file": "%s", "sig' % self._files[2])
+        fh.close()
+        fh = open('%s.rows' % self._checkpoint_file, 'ab')
+        fh.write('torn rows')
+        fh.close()
+
+        # When the checkpoint is loaded and the run carries on
+        checkpoint = baip_parser.Checkpoint(self._checkpoint_file)
+        received = [checkpoint.completed(x) for x in self._files]
+        expected = [True, False, False]
+        msg = 'Torn journal entry should not be complete'
+        self.assertListEqual(received, expected, msg)
+
+        checkpoint.record(self._files[2], self._results[2])
+        checkpoint.close()
+
+        # Then the journal should hold both files intact
+        checkpoint = baip_parser.Checkpoint(self._checkpoint_file)
+        received = [checkpoint.result(x) for x in self._files[::2]]
+        expected = self._results[::2]
+        msg = 'Rows after a torn journal entry error'
+        self.assertListEqual(received, expected, msg)
+
+        # Clean up.
+        checkpoint.clear()
+
+    def test_changed_file_not_complete(self):
+        """File changed since it was journalled is not complete.
+        """
+        checkpoint = baip_parser.Checkpoint(self._checkpoint_file)
+        checkpoint.record(self._files[0], self._results[0])
+
+        fh = open(self._files[0], 'w')
+        fh.write('new version')
+        fh.close()
+
+        msg = 'Changed file should not be complete'
+        self.assertFalse(checkpoint.completed(self._files[0]), msg)
+
+        # Clean up.
+        checkpoint.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
@@ -0,0 +1,136 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.Claimer` tests.
+
+"""
+import unittest2
+import os
+import time
+import shutil
+import tempfile
+
+import baip_parser
+from filer.files import remove_files
+
+
+class TestClaimer(unittest2.TestCase):
+    """:class:`baip_parser.Claimer` test cases.
+    """
+    def setUp(self):
+        self._inbound_dir = tempfile.mkdtemp()
+        self._claim_dir = os.path.join(self._inbound_dir, 'claims')
+        self._file = os.path.join(self._inbound_dir, 'BA-CLM-v04.xlsx')
+        fh = open(self._file, 'wb')
+        fh.write('workbook')
+        fh.close()
+
+        self._host_a = baip_parser.Claimer(self._claim_dir,
+                                           root=self._inbound_dir,
+                                           host_id='host_a')
+        self._host_b = baip_parser.Claimer(self._claim_dir,
+                                           root=self._inbound_dir,
+                                           host_id='host_b')
+
+    def test_init(self):
+        """Initialise a Claimer object.
+        """
+        msg = 'Object is not a baip_parser.Claimer'
+        self.assertIsInstance(self._host_a, baip_parser.Claimer, msg)
+
+    def test_claim_exclusive(self):
+        """Claim a file: only one host wins.
+        """
+        received = [self._host_a.claim(self._file),
+                    self._host_b.claim(self._file)]
+        expected = [True, False]
+        msg = 'File claimed by more than one host'
+        self.assertListEqual(received, expected, msg)
+
+    def test_claim_expired_lease(self):
+        """Claim a file: expired lease from a crashed host is reclaimed.
+        """
+        # Given host A holds a claim and then dies
+        self._host_a.claim(self._file)
+
+        # When host B attempts a claim after the lease has expired
+        now = time.time() + self._host_b.lease_time + 1
+        received = self._host_b.claim(self._file, now=now)
+
+        # Then host B should take over the claim
+        msg = 'Expired lease not reclaimed'
+        self.assertTrue(received, msg)
+
+    def test_claim_completed(self):
+        """Claim a file: completed file is not parsed again.
+        """
+        # Given host A has completed the file
+        self._host_a.claim(self._file)
+        self._host_a.complete(self._file)
+
+        # When host B attempts a claim well after the lease has expired
+        now = time.time() + self._host_b.lease_time + 1
+        received = self._host_b.claim(self._file, now=now)
+
+        # Then host B should not claim the file
+        msg = 'Completed file should not be claimed'
+        self.assertFalse(received, msg)
+
+        # Unless the file changes
+        fh = open(self._file, 'ab')
+        fh.write(' version 2')
+        fh.close()
+        received = self._host_b.claim(self._file)
+        msg = 'Changed file should be claimed'
+        self.assertTrue(received, msg)
+
+    def test_heartbeat_renews_held_claims(self):
+        """Heartbeat keeps a slow parse's lease from expiring.
+        """
+        # Given host A holds a claim whose lease is nearly spent
+        self._host_a.lease_time = 0.2
+        self._host_a.claim(self._file)
+        lock_file = self._host_a.lock_file(self._file)
+        os.utime(lock_file, (time.time() - 10, time.time() - 10))
+
+        # When the heartbeat runs
+        self._host_a.start()
+        time.sleep(0.15)
+        self._host_a.stop()
+
+        # Then the lease should have been renewed
+        msg = 'Held claim not renewed'
+        self.assertGreater(os.stat(lock_file).st_mtime, time.time() - 5, msg)
+        self.assertListEqual(self._host_a.held, [self._file], msg)
+
+        # And a completed claim should no longer be held
+        self._host_a.complete(self._file)
+        msg = 'Completed claim still held'
+        self.assertListEqual(self._host_a.held, [], msg)
+
+    def test_release(self):
+        """Release a claim.
+        """
+        self._host_a.claim(self._file)
+        self._host_a.release(self._file)
+
+        received = self._host_b.claim(self._file)
+        msg = 'Released file should be claimed'
+        self.assertTrue(received, msg)
+
+    def test_purge(self):
+        """Purge completed claims of files that have gone.
+        """
+        # Given a completed claim
+        self._host_a.claim(self._file)
+        self._host_a.complete(self._file)
+
+        # When the file is no longer in the inbound directory
+        received = self._host_a.purge([])
+
+        # Then the claim should be purged
+        msg = 'Completed claim not purged'
+        self.assertEqual(received, 1, msg)
+        self.assertListEqual(os.listdir(self._claim_dir), [], msg)
+
+    def tearDown(self):
+        remove_files(self._file)
+        shutil.rmtree(self._inbound_dir)
@@ -0,0 +1,169 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.Columns` tests.
+
+"""
+import unittest2
+
+import baip_parser
+from baip_parser.columns import numpy
+
+
+class TestColumns(unittest2.TestCase):
+    """:class:`baip_parser.Columns` test cases.
+    """
+    def setUp(self):
+        self._results = [
+            {'BA-CLM-v01.xlsx|CLM-001': {'B1': u'CLM-001',
+                                         'B2': u'short',
+                                         'B3': u'Walloon Coal Measures'},
+             'BA-CLM-v01.xlsx|CLM-002': {'B1': u'CLM-002',
+                                         'B2': None,
+                                         'B3': None}},
+            {'BA-NIC-v01.xlsx|NIC-001': {'B1': u'NIC\u2011001',
+                                         'B2': u'long enough',
+                                         'B3': u'Hunter'}}]
+
+    def test_init(self):
+        """Initialise a Columns object.
+        """
+        columns = baip_parser.Columns([], [])
+        msg = 'Object is not a baip_parser.Columns'
+        self.assertIsInstance(columns, baip_parser.Columns, msg)
+
+    def test_rules(self):
+        """Apply the output rules to a batch by column.
+        """
+        # Given a batch of parsed worksheets
+        columns = baip_parser.Columns(self._results, ['B1', 'B2', 'B3'])
+
+        # When the threshold, skip, substitution and truncation rules
+        # are applied
+        columns.length_check({'B2': 5})
+        columns.skip_empty(['B2', 'B3'])
+        columns.substitute(['B1', 'B2', 'B3'])
+        truncated = columns.truncate(['B3', 'B1', 'B2'],
+                                     [10, None, None],
+                                     word_boundary=True)
+        received = sorted(columns.rows(truncated), key=lambda x: x[1])
+
+        # Then the rows should match the row at a time rules
+        expected = [((u'Walloon', u'CLM-001', None),
+                     'BA-CLM-v01.xlsx|CLM-001'),
+                    ((u'Hunter', u'NIC-001', u'long enough'),
+                     'BA-NIC-v01.xlsx|NIC-001')]
+        msg = 'Columnar rows error'
+        self.assertListEqual(received, expected, msg)
+
+    def rules_conf(self):
+        """Batch with mixed column types and the output rules that
+        drive both the row at a time and the columnar paths.
+
+        """
+        results = self._results + [
+            {'BA-NIC-v01.xlsx|NIC-002': {'B1': u'NIC\u2019002',
+                                         'B2': u'tiny',
+                                         'B3': u'Narrabeen Group',
+                                         'B4': 2.5,
+                                         'B5': 'Rewan Group'},
+             'BA-GAL-v01.xlsx|GAL-001': {'B1': u'GAL-001',
+                                         'B2': u'\u00B1 enough',
+                                         'B3': u'Betts Creek beds',
+                                         'B4': u'one',
+                                         'B5': 'Moolayember Formation'}}]
+        for result in results[:2]:
+            for index, value in enumerate(result.itervalues()):
+                value['B4'] = index
+                value['B5'] = 'Clematis Group'
+
+        conf = baip_parser.ParserConfig()
+        conf.cells_to_extract = ['B1', 'B2', 'B3', 'B4', 'B5']
+        conf.cell_order = ['B3', 'B1', 'B2', 'B4', 'B5']
+        conf.cell_map = {'B1': ['sheet_name'],
+                         'B2': ['remark'],
+                         'B3': ['formation'],
+                         'B4': ['count'],
+                         'B5': ['unit']}
+        conf.ignore_if_empty = ['B2', 'B3']
+        conf.cell_field_thresholds = {'B2': 5}
+        conf.header_field_lengths = {'formation': 10, 'unit': 12}
+
+        return results, conf
+
+    def assertRowsMatch(self, results, conf):
+        """Check that the columnar rows match the daemon's row at a
+        time rules and the writer's truncation.
+
+        """
+        parserd = baip_parser.ParserDaemon(pidfile=None, conf=conf)
+        writer = parserd.init_writer(baip_parser.Writer(), conf)
+
+        expected = sorted([(writer.truncate_row(row, True), key)
+                           for row, key in parserd.rows(results, conf)],
+                          key=lambda x: x[1])
+        received = sorted(parserd.columnar_rows(results, writer, conf),
+                          key=lambda x: x[1])
+        msg = 'Columnar rows do not match the row at a time rules'
+        self.assertListEqual(received, expected, msg)
+
+    @unittest2.skipIf(numpy is None, 'numpy is not installed')
+    def test_rules_numpy(self):
+        """Apply the output rules by column: NumPy arrays.
+        """
+        # Given a batch of parsed worksheets
+        results, conf = self.rules_conf()
+
+        # When the string columns are gathered
+        columns = baip_parser.Columns(results, conf.cell_order)
+
+        # Then the all unicode and all str columns should be NumPy arrays
+        received = [columns.array(x) is not None for x in conf.cell_order]
+        expected = [True, True, True, False, True]
+        msg = 'NumPy string arrays not used'
+        self.assertListEqual(received, expected, msg)
+
+        # And the rules should match the row at a time rules
+        self.assertRowsMatch(results, conf)
+
+    def test_rules_lists(self):
+        """Apply the output rules by column: Python lists.
+        """
+        # Given a batch of parsed worksheets
+        results, conf = self.rules_conf()
+
+        # And no NumPy
+        old_numpy = baip_parser.columns.numpy
+        baip_parser.columns.numpy = None
+
+        # Then the rules should match the row at a time rules
+        try:
+            self.assertRowsMatch(results, conf)
+        finally:
+            baip_parser.columns.numpy = old_numpy
+
+    def test_skip_empty_no_cells(self):
+        """Skip empty rows: no ignore_if_empty cells.
+        """
+        # Given a batch of parsed worksheets
+        columns = baip_parser.Columns(self._results, ['B2', 'B3'])
+
+        # When no cells are set to be skipped if empty
+        columns.skip_empty([])
+
+        # Then all rows should be kept
+        received = columns.kept
+        expected = [True, True, True]
+        msg = 'Kept rows error'
+        self.assertListEqual(received, expected, msg)
+
+    def test_cut(self):
+        """Truncate a single value on a word boundary.
+        """
+        received = baip_parser.Columns.cut(u'Walloon Coal', 9, True)
+        expected = u'Walloon'
+        msg = 'Truncated value error'
+        self.assertEqual(received, expected, msg)
+
+        received = baip_parser.Columns.cut(u'Walloon', 4, True)
+        expected = u'Wall'
+        msg = 'Truncated value without a space error'
+        self.assertEqual(received, expected, msg)
@@ -0,0 +1,67 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.Delta` tests.
+
+"""
+import unittest2
+import os
+import tempfile
+
+import baip_parser
+from filer.files import remove_files
+
+
+class TestDelta(unittest2.TestCase):
+    """:class:`baip_parser.Delta` test cases.
+    """
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._delta_file = os.path.join(self._dir, 'delta.json')
+
+    def test_init(self):
+        """Initialise a Delta object.
+        """
+        delta = baip_parser.Delta()
+        msg = 'Object is not a baip_parser.Delta'
+        self.assertIsInstance(delta, baip_parser.Delta, msg)
+
+    def test_changes(self):
+        """Reduce rows to those that changed since the last save.
+        """
+        # Given rows that were emitted and saved
+        delta = baip_parser.Delta(self._delta_file)
+        list(delta.changes([('a|1', ('a', 1)), ('b|1', ('b', 1))]))
+        delta.save()
+
+        # When the next output is compared
+        delta = baip_parser.Delta(self._delta_file)
+        received = list(delta.changes([('b|1', ('b', 2)),
+                                       ('c|1', ('c', 1))]))
+
+        # Then only the changes should be emitted
+        expected = [('update', 'b|1', 'b', 2),
+                    ('insert', 'c|1', 'c', 1),
+                    ('delete', 'a|1')]
+        msg = 'Delta changes error'
+        self.assertListEqual(received, expected, msg)
+
+        # And the same output again should have no changes once saved
+        delta.save()
+        received = list(delta.changes([('b|1', ('b', 2)),
+                                       ('c|1', ('c', 1))]))
+        msg = 'Unchanged output should not be emitted'
+        self.assertListEqual(received, [], msg)
+        self.assertEqual(delta.stats['delta_unchanged'], 2, msg)
+
+    def test_changes_not_saved(self):
+        """Digests are not adopted until saved.
+        """
+        delta = baip_parser.Delta(self._delta_file)
+        list(delta.changes([('a|1', ('a', 1))]))
+
+        msg = 'Digests adopted before save'
+        self.assertDictEqual(delta.digests, {}, msg)
+        self.assertFalse(os.path.exists(self._delta_file), msg)
+
+    def tearDown(self):
+        remove_files(self._delta_file)
+        os.removedirs(self._dir)
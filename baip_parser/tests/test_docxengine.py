@@ -0,0 +1,223 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.DocxEngine` tests.
+
+"""
+import unittest2
+import os
+import tempfile
+import zipfile
+import openpyxl
+
+import baip_parser
+from filer.files import remove_files
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+
+def _p(*runs):
+    return '<w:p>%s</w:p>' % ''.join(['<w:r>%s</w:r>' % x for x in runs])
+
+
+def _t(text):
+    return '<w:t xml:space="preserve">%s</w:t>' % text
+
+
+def _tc(content, span=None):
+    properties = ''
+    if span is not None:
+        properties = '<w:tcPr><w:gridSpan w:val="%d"/></w:tcPr>' % span
+    return '<w:tc>%s%s</w:tc>' % (properties, content)
+
+
+def _tbl(rows, caption=None):
+    properties = ''
+    if caption is not None:
+        properties = '<w:tblPr><w:tblCaption w:val="%s"/></w:tblPr>' % caption
+    return '<w:tbl>%s%s</w:tbl>' % (properties,
+                                      ''.join(['<w:tr>%s</w:tr>' % x
+                                               for x in rows]))
+
+
+def _sdt(tag, content, alias=None):
+    properties = '<w:tag w:val="%s"/>' % tag if tag is not None else ''
+    if alias is not None:
+        properties += '<w:alias w:val="%s"/>' % alias
+    return ('<w:sdt><w:sdtPr>%s</w:sdtPr><w:sdtContent>%s</w:sdtContent>'
+            '</w:sdt>' % (properties, content))
+
+
+class TestDocxEngine(unittest2.TestCase):
+    """:class:`baip_parser.DocxEngine` test cases.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.maxDiff = None
+
+        report_obj = tempfile.NamedTemporaryFile(suffix='.docx')
+        cls._file = report_obj.name
+        report_obj.close()
+
+        # A captioned table, then an untitled table that holds a merged
+        # cell and a nested table, then content controls.
+        body = (_p(_t('Well Summary')) +
+                _tbl([_tc(_p(_t('Well'))) + _tc(_p(_t('Basin'))),
+                      _tc(_p(_t('CLM-121'))) +
+                      _tc(_p(_t('Clarence')) + _p(_t('Moreton')))],
+                     caption='Summary') +
+                _tbl([_tc(_p(_t('Region')), span=2) + _tc(_p(_t('Depth'))),
+                      _tc(_p(_t('North'), '<w:tab/>', _t('East'))) +
+                      _tc(_p()) +
+                      _tc(_tbl([_tc(_p(_t('1200')))]))]) +
+                _sdt('WellName', _p(_t('Walloon'))) +
+                _sdt(None, _p(_t('Smith')), alias='Author') +
+                _sdt('WellName', _p(_t('Ignored'))) +
+                '<w:sectPr/>')
+        document = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<w:document xmlns:w="%s"><w:body>%s</w:body>'
+                    '</w:document>' % (W_NS, body))
+
+        archive = zipfile.ZipFile(cls._file, 'w')
+        archive.writestr('[Content_Types].xml', '<Types/>')
+        archive.writestr('word/document.xml', document)
+        archive.close()
+
+    def test_sheet_names(self):
+        """Read the report section names.
+        """
+        engine = baip_parser.DocxEngine(self._file)
+        received = engine.sheet_names
+        engine.close()
+        expected = ['Summary', 'Table2', 'Controls']
+        msg = 'docx section names error'
+        self.assertListEqual(received, expected, msg)
+
+    def test_extract_table(self):
+        """Extract table cells.
+        """
+        # Given a docx report
+        engine = baip_parser.DocxEngine(self._file)
+
+        # When the table cells are extracted
+        received = [engine.extract('Summary', ['A2', 'B2', 'C2']),
+                    engine.extract('Table2',
+                                   ['A1', 'B1', 'C1', 'A2', 'B2', 'C2', 'A9'])]
+        engine.close()
+
+        # Then paragraphs should be new line separated, merged cells
+        # should be held by their first column and nested tables should
+        # be flattened into their cell
+        expected = [{'A2': u'CLM-121', 'B2': u'Clarence\nMoreton', 'C2': None},
+                    {'A1': u'Region',
+                     'B1': None,
+                     'C1': u'Depth',
+                     'A2': u'North\tEast',
+                     'B2': None,
+                     'C2': u'1200',
+                     'A9': None}]
+        msg = 'docx table extraction error'
+        self.assertListEqual(received, expected, msg)
+
+    def test_extract_controls(self):
+        """Extract content controls.
+        """
+        engine = baip_parser.DocxEngine(self._file)
+        received = engine.extract('Controls', ['WellName', 'Author', 'XXX'])
+        engine.close()
+        expected = {'WellName': u'Walloon', 'Author': u'Smith', 'XXX': None}
+        msg = 'docx content control extraction error'
+        self.assertDictEqual(received, expected, msg)
+
+    def test_open_not_a_report(self):
+        """Open a zip that is not a docx report.
+        """
+        # Given a zip without a document member
+        zip_obj = tempfile.NamedTemporaryFile(suffix='.docx', delete=False)
+        zip_obj.close()
+        archive = zipfile.ZipFile(zip_obj.name, 'w')
+        archive.writestr('xl/workbook.xml', '<workbook/>')
+        archive.close()
+
+        # When it is opened
+        # Then an IOError should be raised
+        self.assertRaises(IOError, baip_parser.DocxEngine, zip_obj.name)
+
+        # Clean up.
+        remove_files(zip_obj.name)
+
+    def test_parse_sheets(self):
+        """Parse a docx report through the Parser.
+        """
+        # Given a parser
+        parser = baip_parser.Parser()
+        parser.cells_to_extract = ['A2']
+        parser.docx_controls = ['WellName']
+        parser.skip_sheets = ['table2']
+
+        # When the docx report is parsed
+        parser.open(self._file)
+        received = parser.parse_sheets()
+        parser.close()
+
+        # Then the docx engine should extract the table cells and the
+        # content controls
+        name = os.path.basename(self._file)
+        expected = {'%s|Summary' % name: {'A2': u'CLM-121'},
+                    '%s|Controls' % name: {'WellName': u'Walloon'}}
+        msg = 'docx parse error'
+        self.assertDictEqual(dict(received), expected, msg)
+        msg = 'docx parse not counted'
+        self.assertEqual(parser.stats['docx_parsed'], 1, msg)
+
+    def test_parse_sheets_docx_tables(self):
+        """Parse a docx report: configured tables only.
+        """
+        # Given a parser limited to one table and no content controls
+        parser = baip_parser.Parser()
+        parser.cells_to_extract = ['A2']
+        parser.docx_tables = ['table2']
+
+        # When the docx report is parsed
+        parser.open(self._file)
+        received = parser.parse_sheets()
+        parser.close()
+
+        # Then only that table should be extracted
+        name = os.path.basename(self._file)
+        expected = {'%s|Table2' % name: {'A2': u'North\tEast'}}
+        msg = 'docx table selection error'
+        self.assertDictEqual(dict(received), expected, msg)
+
+    def test_parse_sheets_xlsx_with_docx_controls(self):
+        """Parse a workbook: docx content controls do not apply.
+        """
+        # Given a workbook
+        workbook_obj = tempfile.NamedTemporaryFile(suffix='.xlsx')
+        workbook_file = workbook_obj.name
+        workbook_obj.close()
+        workbook = openpyxl.Workbook()
+        workbook.active.title = 'CLM'
+        workbook.active['A2'] = 'CLM-121'
+        workbook.save(workbook_file)
+
+        # And a parser configured with docx content controls
+        parser = baip_parser.Parser()
+        parser.cells_to_extract = ['A2']
+        parser.docx_controls = ['ReportTitle']
+
+        # When the workbook is parsed
+        parser.open(workbook_file)
+        received = parser.parse_sheets()
+        parser.close()
+
+        # Then only the cells should be extracted
+        name = os.path.basename(workbook_file)
+        expected = {'%s|CLM' % name: {'A2': 'CLM-121'}}
+        msg = 'Workbook parse with docx content controls error'
+        self.assertDictEqual(dict(received), expected, msg)
+
+        # Clean up.
+        remove_files(workbook_file)
+
+    @classmethod
+    def tearDownClass(cls):
+        remove_files(cls._file)
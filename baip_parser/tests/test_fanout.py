@@ -0,0 +1,80 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.Fanout` tests.
+
+"""
+import unittest2
+import time
+
+import baip_parser
+
+
+class _Sink(object):
+    """Writer stand-in that collects the rows and keys it is given.
+    """
+    def __init__(self, delay=0.0, fail_after=None):
+        self.delay = delay
+        self.fail_after = fail_after
+        self.written = []
+
+    def write(self, data, word_boundary=False, keys=None):
+        for row, key in zip(data, keys):
+            if self.fail_after is not None and \
+                    len(self.written) == self.fail_after:
+                raise IOError('sink failed')
+            time.sleep(self.delay)
+            self.written.append((row, key))
+
+
+class TestFanout(unittest2.TestCase):
+    """:class:`baip_parser.Fanout` test cases.
+    """
+    def setUp(self):
+        self._rows = [(('CLM-%d' % x,), 'BA-CLM-v01.xlsx|CLM-%d' % x)
+                      for x in range(20)]
+
+    def test_init(self):
+        """Initialise a Fanout object.
+        """
+        fanout = baip_parser.Fanout()
+        msg = 'Object is not a baip_parser.Fanout'
+        self.assertIsInstance(fanout, baip_parser.Fanout, msg)
+
+    def test_write(self):
+        """Write one row stream to several sinks.
+        """
+        # Given a fast sink and a slow sink with small buffers
+        fast = _Sink()
+        slow = _Sink(delay=0.01)
+        fanout = baip_parser.Fanout([('fast', fast), ('slow', slow)],
+                                    buffer_rows=2)
+
+        # When the rows are written
+        received = fanout.write(iter(self._rows))
+
+        # Then every sink should receive every row and key
+        msg = 'Fan-out write should succeed'
+        self.assertTrue(received, msg)
+        msg = 'Fan-out sink rows error'
+        self.assertListEqual(fast.written, self._rows, msg)
+        self.assertListEqual(slow.written, self._rows, msg)
+
+        # And the slow sink should have held up the row stream
+        msg = 'Slow sink backpressure not recorded'
+        self.assertGreater(fanout.stats['sink_waits_slow'], 0, msg)
+
+    def test_write_failed_sink(self):
+        """Failed sink does not hold up the other sinks.
+        """
+        good = _Sink()
+        bad = _Sink(fail_after=3)
+        fanout = baip_parser.Fanout([('bad', bad), ('good', good)],
+                                    buffer_rows=1)
+
+        received = fanout.write(iter(self._rows))
+
+        msg = 'Fan-out write should report the failed sink'
+        self.assertFalse(received, msg)
+        self.assertListEqual(fanout.errors.keys(), ['bad'], msg)
+
+        msg = 'Good sink should receive every row'
+        self.assertListEqual(good.written, self._rows, msg)
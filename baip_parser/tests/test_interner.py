@@ -0,0 +1,94 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.Interner` tests.
+
+"""
+import unittest2
+
+import baip_parser
+
+
+class TestInterner(unittest2.TestCase):
+    """:class:`baip_parser.Interner` test cases.
+    """
+    def test_init(self):
+        """Initialise an Interner object.
+        """
+        interner = baip_parser.Interner()
+        msg = 'Object is not a baip_parser.Interner'
+        self.assertIsInstance(interner, baip_parser.Interner, msg)
+
+    def test_intern(self):
+        """Intern repeated strings.
+        """
+        # Given an interner
+        interner = baip_parser.Interner()
+
+        # When the same string is interned twice
+        first = interner.intern(u''.join([u'Walloon', u' Coal']))
+        second = interner.intern(u''.join([u'Walloon', u' Coal']))
+
+        # Then the second should be the first copy
+        msg = 'Repeated string not shared'
+        self.assertIs(second, first, msg)
+
+        # And values that are not strings are passed through
+        received = interner.intern(121)
+        msg = 'Non-string value error'
+        self.assertEqual(received, 121, msg)
+
+        # And str and unicode values are kept apart
+        received = interner.intern('Walloon Coal')
+        msg = 'Interned value type changed'
+        self.assertIsInstance(received, str, msg)
+
+        # And the dedup ratio should be reported
+        received = interner.ratio
+        expected = 1.0 / 3
+        msg = 'Dedup ratio error'
+        self.assertAlmostEqual(received, expected, msg=msg)
+
+    def test_intern_bounded(self):
+        """Intern strings beyond the table bound.
+        """
+        # Given an interner that holds a single string
+        interner = baip_parser.Interner(max_strings=1)
+
+        # When two different strings are interned
+        interner.intern(u'CLM')
+        interner.intern(u'NIC')
+
+        # Then only the first should be held
+        msg = 'Interner table bound error'
+        self.assertEqual(interner.size, 1, msg)
+        self.assertEqual(interner.stats['strings_overflow'], 1, msg)
+
+        # And clear should empty the table
+        interner.clear()
+        msg = 'Interner table not cleared'
+        self.assertEqual(interner.size, 0, msg)
+
+    def test_intern_result(self):
+        """Intern a parsed workbook result.
+        """
+        # Given the results of two workbooks
+        result_01 = {'BA-CLM-v01.xlsx|CLM-001': {'B1': u'CLM-001',
+                                                 'B2': u''.join([u'Da',
+                                                                 u'te'])}}
+        result_02 = {'BA-NIC-v01.xlsx|NIC-001': {'B1': u'NIC-001',
+                                                 'B2': u''.join([u'Dat',
+                                                                 u'e'])}}
+
+        # When both are interned
+        interner = baip_parser.Interner()
+        received_01 = interner.intern_result(result_01)
+        received_02 = interner.intern_result(result_02)
+
+        # Then the values should be unchanged
+        msg = 'Interned result error'
+        self.assertDictEqual(received_02, result_02, msg)
+
+        # And the repeated values should be shared
+        msg = 'Repeated result value not shared'
+        self.assertIs(received_02['BA-NIC-v01.xlsx|NIC-001']['B2'],
+                      received_01['BA-CLM-v01.xlsx|CLM-001']['B2'],
+                      msg)
@@ -0,0 +1,90 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.JsonLinesWriter` tests.
+
+"""
+import unittest2
+import os
+import json
+import decimal
+import datetime
+import tempfile
+
+import baip_parser
+from filer.files import remove_files
+
+
+class TestJsonLinesWriter(unittest2.TestCase):
+    """:class:`baip_parser.JsonLinesWriter` test cases.
+    """
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._outfile = os.path.join(self._dir, 'sheets.jsonl')
+        self._writer = baip_parser.JsonLinesWriter(self._outfile)
+
+    def test_init(self):
+        """Initialise a JsonLinesWriter object.
+        """
+        msg = 'Object is not a baip_parser.JsonLinesWriter'
+        self.assertIsInstance(self._writer,
+                              baip_parser.JsonLinesWriter,
+                              msg)
+
+    def test_write(self):
+        """Stream one worksheet per line.
+        """
+        # Given a parsed workbook
+        result = {'BA-CLM-v01.xlsx|CLM-1': {'B1': u'CLM\u20111'},
+                  'BA-CLM-v01.xlsx|CLM-2': {'B2': decimal.Decimal('1.5'),
+                                            'B3': datetime.datetime(2015,
+                                                                    1,
+                                                                    2)}}
+
+        # When the workbook is written
+        self._writer.open()
+        self._writer.write(result)
+
+        # Then each worksheet should be readable before the file is closed
+        fh = open(self._outfile)
+        received = [json.loads(x) for x in fh.readlines()]
+        fh.close()
+
+        expected = [{'BA-CLM-v01.xlsx|CLM-1': {'B1': u'CLM\u20111'}},
+                    {'BA-CLM-v01.xlsx|CLM-2': {'B2': 1.5,
+                                               'B3': '2015-01-02T00:00:00'}}]
+        msg = 'JSON Lines content error'
+        self.assertItemsEqual(received, expected, msg)
+
+    def test_open_appends_outfile(self):
+        """Each open appends to the file.
+        """
+        # Given a line written by an earlier cycle
+        self._writer.open()
+        self._writer.write({'BA-CLM-v01.xlsx|CLM-1': {'B1': 'CLM-1'}})
+        self._writer.close()
+
+        # And a partial line left by an interrupted run
+        fh = open(self._outfile, 'ab')
+        fh.write('{"BA-CLM-v01.xlsx|CLM-2"')
+        fh.close()
+
+        # When the next cycle opens the file (including an idle cycle)
+        self._writer.open()
+        self._writer.close()
+        self._writer.open()
+        self._writer.write({'BA-CLM-v02.xlsx|CLM-1': {'B1': 'CLM-1'}})
+        self._writer.close()
+
+        # Then the earlier lines should be kept and the new line whole
+        fh = open(self._outfile)
+        received = fh.read().splitlines()
+        fh.close()
+        expected = ['{"BA-CLM-v01.xlsx|CLM-1":{"B1":"CLM-1"}}',
+                    '{"BA-CLM-v01.xlsx|CLM-2"',
+                    '{"BA-CLM-v02.xlsx|CLM-1":{"B1":"CLM-1"}}']
+        msg = 'JSON Lines file not appended to'
+        self.assertListEqual(received, expected, msg)
+
+    def tearDown(self):
+        self._writer.close()
+        remove_files(self._outfile)
+        os.removedirs(self._dir)
@@ -0,0 +1,167 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.Ledger` tests.
+
+"""
+import unittest2
+import os
+import tempfile
+
+import baip_parser
+from filer.files import remove_files
+
+
+class TestLedger(unittest2.TestCase):
+    """:class:`baip_parser.Ledger` test cases.
+    """
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._file = os.path.join(self._dir, 'BA-CLM-CLM-121-v04.xlsx')
+        fh = open(self._file, 'wb')
+        fh.write('corrupt')
+        fh.close()
+
+        self._ledger = baip_parser.Ledger()
+
+    def test_init(self):
+        """Initialise a Ledger object.
+        """
+        msg = 'Object is not a baip_parser.Ledger'
+        self.assertIsInstance(self._ledger, baip_parser.Ledger, msg)
+
+    def test_ready_no_history(self):
+        """File with no failure history is ready.
+        """
+        msg = 'File with no failure history should be ready'
+        self.assertTrue(self._ledger.ready(self._file), msg)
+
+    def test_failed_exponential_backoff(self):
+        """Failed file retry delay doubles.
+        """
+        # Given a retry delay of 10 seconds
+        self._ledger.retry_delay = 10.0
+        self._ledger.max_failures = 10
+
+        # When a file fails twice
+        self._ledger.failed(self._file, 'bad', now=100.0)
+        self._ledger.failed(self._file, 'bad', now=100.0)
+
+        # Then the next attempt should be 20 seconds out
+        received = self._ledger.entries[self._file]['next_attempt']
+        expected = 120.0
+        msg = 'Exponential backoff delay error'
+        self.assertEqual(received, expected, msg)
+
+        # And the file is not ready until the delay expires
+        msg = 'Failed file should be deferred'
+        self.assertFalse(self._ledger.ready(self._file, now=119.0), msg)
+        msg = 'Failed file should be ready after the delay'
+        self.assertTrue(self._ledger.ready(self._file, now=120.0), msg)
+
+    def test_failed_quarantine(self):
+        """Failed file moved to quarantine after max_failures.
+        """
+        # Given a quarantine directory
+        quarantine_dir = os.path.join(self._dir, 'quarantine')
+        self._ledger.quarantine_dir = quarantine_dir
+        self._ledger.max_failures = 2
+
+        # When the file fails max_failures times
+        received = [self._ledger.failed(self._file, 'bad'),
+                    self._ledger.failed(self._file, 'bad')]
+
+        # Then it should be quarantined on the last failure
+        expected = [False, True]
+        msg = 'Quarantine status error'
+        self.assertListEqual(received, expected, msg)
+
+        # And moved to the quarantine directory
+        target = os.path.join(quarantine_dir,
+                              os.path.basename(self._file))
+        msg = 'Quarantined file not moved'
+        self.assertTrue(os.path.exists(target), msg)
+        self.assertFalse(os.path.exists(self._file), msg)
+
+        # Clean up.
+        remove_files(target)
+        os.rmdir(quarantine_dir)
+
+    def test_quarantine_keeps_relative_path(self):
+        """Quarantined files of the same name do not collide.
+        """
+        # Given two bad files of the same name in different directories
+        quarantine_dir = os.path.join(self._dir, 'quarantine')
+        self._ledger.quarantine_dir = quarantine_dir
+        self._ledger.inbound_dir = self._dir
+        files = []
+        for sub_dir in ['CLM', 'NIC']:
+            os.makedirs(os.path.join(self._dir, sub_dir))
+            files.append(os.path.join(self._dir, sub_dir, 'bad.xlsx'))
+            open(files[-1], 'w').close()
+        # And a file outside the inbound tree whose name is already taken
+        outside_dir = tempfile.mkdtemp()
+        files.append(os.path.join(outside_dir, 'bad.xlsx'))
+        open(files[-1], 'w').close()
+        os.makedirs(quarantine_dir)
+        open(os.path.join(quarantine_dir, 'bad.xlsx'), 'w').close()
+
+        # When they are quarantined
+        received = [self._ledger.quarantine(x) for x in files]
+
+        # Then each should be kept
+        msg = 'Quarantine status error'
+        self.assertListEqual(received, [True, True, True], msg)
+        targets = [os.path.join(quarantine_dir, 'CLM', 'bad.xlsx'),
+                   os.path.join(quarantine_dir, 'NIC', 'bad.xlsx'),
+                   os.path.join(quarantine_dir, 'bad.xlsx.1')]
+        msg = 'Quarantined file overwritten'
+        self.assertTrue(all([os.path.exists(x) for x in targets]), msg)
+
+        # Clean up.
+        remove_files(targets + [os.path.join(quarantine_dir, 'bad.xlsx')])
+        for sub_dir in ['CLM', 'NIC']:
+            os.rmdir(os.path.join(quarantine_dir, sub_dir))
+            os.rmdir(os.path.join(self._dir, sub_dir))
+        os.rmdir(quarantine_dir)
+        os.rmdir(outside_dir)
+
+    def test_failed_fatal_quarantine(self):
+        """Fatal failure quarantines the file straight away.
+        """
+        received = self._ledger.failed(self._file, 'zip bomb', fatal=True)
+        msg = 'Fatal failure should quarantine on the first failure'
+        self.assertTrue(received, msg)
+        self.assertTrue(self._ledger.entries[self._file]['quarantined'], msg)
+
+    def test_succeeded_clears_history(self):
+        """Successful parse clears failure history.
+        """
+        self._ledger.failed(self._file, 'bad')
+        self._ledger.succeeded(self._file)
+
+        msg = 'Successful parse should clear failure history'
+        self.assertDictEqual(self._ledger.entries, {}, msg)
+
+    def test_save_and_load(self):
+        """Persist the ledger between instances.
+        """
+        # Given a ledger file
+        ledger_file = os.path.join(self._dir, 'ledger.json')
+        self._ledger.ledger_file = ledger_file
+
+        # When a failure is recorded
+        self._ledger.failed(self._file, 'bad', now=100.0)
+
+        # Then a new ledger instance should load the history
+        received = baip_parser.Ledger(ledger_file).entries
+        expected = self._ledger.entries
+        msg = 'Loaded ledger entries error'
+        self.assertDictEqual(received, expected, msg)
+
+        # Clean up.
+        remove_files(ledger_file)
+
+    def tearDown(self):
+        remove_files(self._file)
+        os.removedirs(self._dir)
+        self._ledger = None
+        del self._ledger
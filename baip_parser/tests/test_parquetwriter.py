@@ -0,0 +1,62 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.ParquetWriter` tests.
+
+"""
+import unittest2
+import os
+import tempfile
+
+import baip_parser
+from filer.files import remove_files
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class TestParquetWriter(unittest2.TestCase):
+    """:class:`baip_parser.ParquetWriter` test cases.
+    """
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._outfile = os.path.join(self._dir, 'out.parquet')
+        self._writer = baip_parser.ParquetWriter(self._outfile)
+        self._writer.headers = ['sheet_name', 'budget']
+
+    def test_init(self):
+        """Initialise a ParquetWriter object.
+        """
+        msg = 'Object is not a baip_parser.ParquetWriter'
+        self.assertIsInstance(self._writer, baip_parser.ParquetWriter, msg)
+
+    @unittest2.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_write(self):
+        """Write rows in row groups.
+        """
+        # Given a small row group size
+        self._writer.batch_rows = 1
+
+        # When rows are written
+        self._writer.write([('CLM-1', 1000), ('CLM-2', None)],
+                           keys=['BA-CLM-v01.xlsx|CLM-1',
+                                 'BA-CLM-v01.xlsx|CLM-2'])
+
+        # Then the file should hold one row group per row
+        parquet_file = pyarrow.parquet.ParquetFile(self._outfile)
+        msg = 'Parquet row group count error'
+        self.assertEqual(parquet_file.num_row_groups, 2, msg)
+
+        received = parquet_file.read().to_pydict()
+        expected = {'key': [u'BA-CLM-v01.xlsx|CLM-1',
+                            u'BA-CLM-v01.xlsx|CLM-2'],
+                    'sheet_name': [u'CLM-1', u'CLM-2'],
+                    'budget': [u'1000', None]}
+        msg = 'Parquet content error'
+        self.assertDictEqual(received, expected, msg)
+
+    def tearDown(self):
+        remove_files(self._outfile)
+        os.removedirs(self._dir)
+        self._writer = None
+        del self._writer
@@ -4,10 +4,13 @@
 """
 import unittest2
 import os
+import datetime
 import tempfile
+import zipfile
 import openpyxl
 
 import baip_parser
+import baip_parser.xlsengine
 
 
 class TestParser(unittest2.TestCase):
@@ -180,3 +183,350 @@ class TestParser(unittest2.TestCase):
                     '%s|CLM-121-025' % filename: {'B1': u'CLM-121-025'}}
         msg = 'Expected dictionary values error: skipped worksheets'
         self.assertDictEqual(received, expected, msg)
+
+    def test_open_oversized_workbook(self):
+        """Open an xlsx file: worksheets over the uncompressed limit.
+        """
+        # Given a workbook with a large worksheet.
+        workbook_obj = tempfile.NamedTemporaryFile(suffix='.xlsx')
+        workbook_file = workbook_obj.name
+        workbook_obj.close()
+
+        workbook = openpyxl.Workbook()
+        ws = workbook.active
+        for row in range(1, 1001):
+            ws.cell(row=row, column=1).value = row
+        workbook.save(workbook_file)
+
+        # And an uncompressed size limit the worksheet is over.
+        parser = baip_parser.Parser()
+        parser.max_sheet_bytes = 1024
+
+        # When I attempt to open the workbook.
+        received = parser.open(workbook_file)
+
+        # Then the workbook should be refused.
+        msg = 'Oversized workbook should not be opened'
+        self.assertFalse(received, msg)
+        self.assertEqual(parser.stats['oversized'], 1, msg)
+
+        # Unless the limit is lifted.
+        parser.max_sheet_bytes = 0
+        msg = 'Workbook within the limit should be opened'
+        self.assertTrue(parser.open(workbook_file), msg)
+        parser.close()
+
+        # Clean up.
+        os.remove(workbook_file)
+
+    def test_parse_sheets_cached_changed_sheet_only(self):
+        """Parse sheets: sheet cache re-extracts changed sheets only.
+        """
+        # Given a workbook with several sheets.
+        workbook_obj = tempfile.NamedTemporaryFile(suffix='.xlsx')
+        workbook_file = workbook_obj.name
+        workbook_obj.close()
+
+        workbook = openpyxl.Workbook()
+        workbook.remove_sheet(workbook.active)
+        for name in ['CLM-121-001', 'CLM-121-002', 'CLM-121-003']:
+            ws = workbook.create_sheet(title=name)
+            ws['B1'] = name
+            ws['B2'] = u'Title %s' % name
+        workbook.save(workbook_file)
+
+        # And a parser with a sheet cache.
+        cache = baip_parser.SheetCache()
+        parser = baip_parser.Parser()
+        parser.cache = cache
+        parser.cells_to_extract = ['B1', 'B2']
+        parser.open(workbook_file)
+        parser.parse_sheets()
+        parser.close()
+
+        # When a single sheet is edited and the workbook re-parsed.
+        workbook.get_sheet_by_name('CLM-121-002')['B2'] = u'Edited title'
+        workbook.save(workbook_file)
+
+        parser = baip_parser.Parser()
+        parser.cache = cache
+        parser.cells_to_extract = ['B1', 'B2']
+        parser.open(workbook_file)
+        received = parser.parse_sheets()
+        parser.close()
+
+        # Then only the edited sheet should be extracted.
+        msg = 'Only the changed sheet should be extracted'
+        self.assertEqual(parser.stats['sheets_extracted'], 1, msg)
+        self.assertEqual(parser.stats['sheets_cached'], 2, msg)
+
+        # And the merged values should reflect the edit.
+        filename = os.path.basename(workbook_file)
+        expected = {'%s|CLM-121-001' % filename: {'B1': u'CLM-121-001',
+                                                  'B2': u'Title CLM-121-001'},
+                    '%s|CLM-121-002' % filename: {'B1': u'CLM-121-002',
+                                                  'B2': u'Edited title'},
+                    '%s|CLM-121-003' % filename: {'B1': u'CLM-121-003',
+                                                  'B2': u'Title CLM-121-003'}}
+        msg = 'Expected dictionary values error: sheet cache'
+        self.assertDictEqual(received, expected, msg)
+
+        # Clean up.
+        os.remove(workbook_file)
+
+    def test_parse_sheets_read_only_single_pass(self):
+        """Parse sheets: read-only worksheets are read in a single pass.
+        """
+        # Given a workbook with cells scattered over its rows.
+        workbook_obj = tempfile.NamedTemporaryFile(suffix='.xlsx')
+        workbook_file = workbook_obj.name
+        workbook_obj.close()
+
+        workbook = openpyxl.Workbook()
+        ws = workbook.active
+        ws.title = 'CLM-121-001'
+        ws['B1'] = 'CLM-121-001'
+        ws['C40'] = 121
+        ws['A7'] = datetime.datetime(2015, 3, 1)
+        workbook.save(workbook_file)
+        cells = ['B1', 'C40', 'A7', 'D2', 'A99']
+
+        # And a parser that reads the workbook in memory.
+        parser = baip_parser.Parser()
+        parser.cells_to_extract = cells
+        parser.open(workbook_file)
+        expected = parser.parse_sheets()
+        parser.close()
+
+        # When the workbook is parsed in read-only mode.
+        parser = baip_parser.Parser()
+        parser.sheet_workers = 2
+        parser.cells_to_extract = cells
+        parser.open(workbook_file)
+        ws = parser.workbook.get_sheet_by_name('CLM-121-001')
+        ws.__class__ = type('SingleCell', (ws.__class__,), {
+            '__getitem__': lambda *args: self.fail('Cell read per cell')})
+        received = parser.parse_sheets()
+        parser.close()
+
+        # Then the values should match without a read per cell.
+        msg = 'Read-only values differ from the in memory parse'
+        self.assertDictEqual(dict(received), dict(expected), msg)
+
+        # Clean up.
+        os.remove(workbook_file)
+
+    def test_parse_sheets_parallel(self):
+        """Parse sheets: worksheets split across worker processes.
+        """
+        # Given a workbook with several sheets.
+        workbook_obj = tempfile.NamedTemporaryFile(suffix='.xlsx')
+        workbook_file = workbook_obj.name
+        workbook_obj.close()
+
+        workbook = openpyxl.Workbook()
+        workbook.remove_sheet(workbook.active)
+        names = ['CLM-121-%03d' % x for x in range(1, 9)]
+        for name in names:
+            ws = workbook.create_sheet(title=name)
+            ws['B1'] = name
+            ws['B2'] = 121
+        workbook.save(workbook_file)
+
+        # And a parser with sheet workers.
+        parser = baip_parser.Parser()
+        parser.sheet_workers = 3
+        parser.sheet_parallel_min = 2
+        parser.cells_to_extract = ['B1', 'B2']
+
+        # And a sheet to skip.
+        parser.skip_sheets = ['CLM-121-004']
+
+        # When I parse the workbook.
+        parser.open(workbook_file)
+        received = parser.parse_sheets()
+        parser.close()
+
+        # Then the worksheets should have been extracted in parallel.
+        msg = 'Worksheets not extracted by workers'
+        self.assertEqual(parser.stats['sheets_parallel'], 7, msg)
+
+        # And the results should be merged in worksheet order.
+        filename = os.path.basename(workbook_file)
+        expected = [('%s|%s' % (filename, x), {'B1': x, 'B2': 121})
+                    for x in names if x != 'CLM-121-004']
+        msg = 'Expected values error: parallel worksheets'
+        self.assertListEqual(received.items(), expected, msg)
+
+        # Clean up.
+        os.remove(workbook_file)
+
+    def test_parse_sheets_interned(self):
+        """Parse sheets: repeated strings share a single copy.
+        """
+        # Given a workbook whose worksheets repeat a string value.
+        workbook_obj = tempfile.NamedTemporaryFile(suffix='.xlsx')
+        workbook_file = workbook_obj.name
+        workbook_obj.close()
+
+        workbook = openpyxl.Workbook()
+        workbook.remove_sheet(workbook.active)
+        for name in ['CLM-121-001', 'CLM-121-002', 'CLM-121-003']:
+            ws = workbook.create_sheet(title=name)
+            ws['B1'] = name
+            ws['B2'] = 'Clarence-Moreton'
+        workbook.save(workbook_file)
+
+        # And a parser with an interner.
+        parser = baip_parser.Parser()
+        parser.cells_to_extract = ['B1', 'B2']
+        parser.interner = baip_parser.Interner()
+
+        # When I parse the workbook.
+        parser.open(workbook_file)
+        received = parser.parse_sheets()
+        parser.close()
+
+        # Then the repeated values should be the same object.
+        values = [x['B2'] for x in received.values()]
+        msg = 'Repeated values not shared'
+        self.assertTrue(all([x is values[0] for x in values]), msg)
+        self.assertEqual(values[0], u'Clarence-Moreton')
+
+        # And the sharing (of the values and cell names) should be counted.
+        received = parser.interner.stats['strings_shared']
+        expected = 6
+        msg = 'Shared strings count error'
+        self.assertEqual(received, expected, msg)
+
+        # Clean up.
+        os.remove(workbook_file)
+
+    def test_parse_metadata(self):
+        """Parse the workbook metadata only.
+        """
+        # Given a workbook whose worksheet is unreadable.
+        workbook_obj = tempfile.NamedTemporaryFile(suffix='.xlsx')
+        workbook_file = workbook_obj.name
+        workbook_obj.close()
+
+        core = ('<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.'
+                'org/package/2006/metadata/core-properties" '
+                'xmlns:dc="http://purl.org/dc/elements/1.1/" '
+                'xmlns:dcterms="http://purl.org/dc/terms/">'
+                '<dc:creator>Lou</dc:creator>'
+                '<cp:lastModifiedBy>Kim</cp:lastModifiedBy>'
+                '<dcterms:modified>2015-03-01T10:20:30Z</dcterms:modified>'
+                '</cp:coreProperties>')
+        app = ('<Properties xmlns="http://schemas.openxmlformats.org/'
+               'officeDocument/2006/extended-properties" xmlns:vt="http://'
+               'schemas.openxmlformats.org/officeDocument/2006/docPropsVTypes">'
+               '<Application>Microsoft Excel</Application>'
+               '<TitlesOfParts><vt:vector size="2" baseType="lpstr">'
+               '<vt:lpstr>CLM-121-001</vt:lpstr>'
+               '<vt:lpstr>Instructions</vt:lpstr>'
+               '</vt:vector></TitlesOfParts>'
+               '</Properties>')
+        workbook = ('<workbook xmlns="http://schemas.openxmlformats.org/'
+                    'spreadsheetml/2006/main"><sheets>'
+                    '<sheet name="CLM-121-001" sheetId="1"/>'
+                    '<sheet name="Instructions" sheetId="2"/>'
+                    '</sheets></workbook>')
+
+        archive = zipfile.ZipFile(workbook_file, 'w')
+        archive.writestr('docProps/core.xml', core)
+        archive.writestr('docProps/app.xml', app)
+        archive.writestr('xl/workbook.xml', workbook)
+        archive.writestr('xl/worksheets/sheet1.xml', 'not a worksheet')
+        archive.close()
+
+        # And a metadata only parser.
+        parser = baip_parser.Parser()
+        parser.metadata_only = True
+        parser.cells_to_extract = ['creator',
+                                   'lastModifiedBy',
+                                   'modified',
+                                   'Application',
+                                   'TitlesOfParts',
+                                   'sheet_names',
+                                   'sheet_count',
+                                   'title']
+
+        # When I parse the workbook.
+        parser.open(workbook_file)
+        received = parser.parse_sheets()
+        parser.close()
+
+        # Then a single metadata row should be returned.
+        key = '%s|Metadata' % os.path.basename(workbook_file)
+        expected = {key: {'creator': 'Lou',
+                          'lastModifiedBy': 'Kim',
+                          'modified': datetime.datetime(2015, 3, 1,
+                                                        10, 20, 30),
+                          'Application': 'Microsoft Excel',
+                          'TitlesOfParts': None,
+                          'sheet_names': u'CLM-121-001|Instructions',
+                          'sheet_count': 2,
+                          'title': None}}
+        msg = 'Metadata parse error'
+        self.assertDictEqual(dict(received), expected, msg)
+        msg = 'Metadata parse not counted'
+        self.assertEqual(parser.stats['metadata_parsed'], 1, msg)
+
+        # Clean up.
+        os.remove(workbook_file)
+
+    def test_open_metadata_not_zip(self):
+        """Open a file that is not a zip in metadata only mode.
+        """
+        # Given a file that is not a zip.
+        text_obj = tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False)
+        text_obj.write('not a workbook')
+        text_obj.close()
+
+        # When it is opened for its metadata.
+        parser = baip_parser.Parser()
+        parser.metadata_only = True
+        received = parser.open(text_obj.name)
+
+        # Then the open should fail.
+        msg = 'Metadata open of a non-zip file should fail'
+        self.assertFalse(received, msg)
+
+        # Clean up.
+        os.remove(text_obj.name)
+
+    def test_open_metadata_xls_no_xlrd(self):
+        """Open a legacy xls workbook in metadata only mode without xlrd.
+        """
+        # Given a legacy (OLE) xls workbook
+        xls_obj = tempfile.NamedTemporaryFile(suffix='.xls', delete=False)
+        xls_obj.write('\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1')
+        xls_obj.close()
+
+        # And no xlrd
+        old_xlrd = baip_parser.xlsengine.xlrd
+        baip_parser.xlsengine.xlrd = None
+
+        # When it is opened and parsed for its metadata
+        parser = baip_parser.Parser()
+        parser.metadata_only = True
+        try:
+            received = parser.open(xls_obj.name)
+            parsed = parser.parse_sheets()
+            parser.close()
+        finally:
+            baip_parser.xlsengine.xlrd = old_xlrd
+
+        # Then the open should not fail
+        msg = 'Metadata open of an xls workbook should not fail'
+        self.assertTrue(received, msg)
+
+        # And the workbook should be skipped
+        msg = 'Skipped xls metadata parse error'
+        self.assertDictEqual(dict(parsed), {}, msg)
+        msg = 'Skipped xls metadata not counted'
+        self.assertEqual(parser.stats['metadata_skipped'], 1, msg)
+
+        # Clean up.
+        os.remove(xls_obj.name)
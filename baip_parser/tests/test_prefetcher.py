@@ -0,0 +1,82 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.Prefetcher` tests.
+
+"""
+import unittest2
+import os
+import shutil
+import tempfile
+
+import baip_parser
+
+
+class TestPrefetcher(unittest2.TestCase):
+    """:class:`baip_parser.Prefetcher` test cases.
+    """
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._files = []
+        for index, size in enumerate([400, 300, 200, 100]):
+            filepath = os.path.join(self._dir, 'BA-CLM-v0%d.xlsx' % index)
+            fh = open(filepath, 'wb')
+            fh.write('x' * size)
+            fh.close()
+            self._files.append(filepath)
+
+    def test_init(self):
+        """Initialise a Prefetcher object.
+        """
+        prefetcher = baip_parser.Prefetcher()
+        msg = 'Object is not a baip_parser.Prefetcher'
+        self.assertIsInstance(prefetcher, baip_parser.Prefetcher, msg)
+
+    def test_schedule_within_budget(self):
+        """Prefetch ahead of the parser within the byte budget.
+        """
+        # Given a budget of 750 bytes
+        prefetcher = baip_parser.Prefetcher(threads=2, depth=4, budget=750)
+
+        # When the files are scheduled
+        prefetcher.schedule(self._files)
+        prefetcher.wait()
+
+        # Then only the files within budget should be held
+        received = prefetcher.held
+        expected = self._files[:2]
+        msg = 'Files held ahead of the parser error'
+        self.assertListEqual(received, expected, msg)
+
+        # And when the first file is parsed the next two fit
+        prefetcher.done(self._files[0])
+        prefetcher.wait()
+        received = prefetcher.held
+        expected = self._files[1:]
+        msg = 'Released budget not refilled'
+        self.assertListEqual(received, expected, msg)
+
+        received = prefetcher.stats['prefetched']
+        expected = 4
+        msg = 'Prefetched file count error'
+        self.assertEqual(received, expected, msg)
+
+        # Clean up.
+        prefetcher.stop()
+
+    def test_schedule_depth(self):
+        """Prefetch no more than depth files ahead of the parser.
+        """
+        prefetcher = baip_parser.Prefetcher(threads=1, depth=1)
+
+        prefetcher.schedule(self._files)
+        prefetcher.wait()
+
+        received = prefetcher.held
+        expected = self._files[:1]
+        msg = 'Prefetch depth error'
+        self.assertListEqual(received, expected, msg)
+
+        # Clean up.
+        prefetcher.stop()
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
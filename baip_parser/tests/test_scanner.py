@@ -0,0 +1,140 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.Scanner` tests.
+
+"""
+import unittest2
+import os
+import time
+import shutil
+import tempfile
+
+import baip_parser
+
+
+class TestScanner(unittest2.TestCase):
+    """:class:`baip_parser.Scanner` test cases.
+    """
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        for dirname in ['BA-CLM', 'BA-FIN', os.path.join('BA-FIN', 'archive')]:
+            os.mkdir(os.path.join(self._dir, dirname))
+        self._files = [os.path.join(self._dir, 'BA-CLM', 'BA-CLM-v01.xlsx'),
+                       os.path.join(self._dir, 'BA-FIN', 'BA-FIN-v01.xlsx'),
+                       os.path.join(self._dir,
+                                    'BA-FIN',
+                                    'archive',
+                                    'BA-FIN-v00.xlsx')]
+        for filepath in self._files + [os.path.join(self._dir, 'README')]:
+            open(filepath, 'w').close()
+
+        # Age the directories beyond the modification time grace.
+        self.age()
+
+    def age(self):
+        """Wind back the modification time of the test directories.
+        """
+        past = time.time() - 60
+        for dirpath, _, _ in os.walk(self._dir):
+            os.utime(dirpath, (past, past))
+
+    def test_init(self):
+        """Initialise a Scanner object.
+        """
+        scanner = baip_parser.Scanner()
+        msg = 'Object is not a baip_parser.Scanner'
+        self.assertIsInstance(scanner, baip_parser.Scanner, msg)
+
+    def test_scan(self):
+        """Scan a directory tree.
+        """
+        scanner = baip_parser.Scanner()
+        received = sorted(scanner.scan(self._dir, file_filter='.*\.xlsx$'))
+        expected = sorted(self._files)
+        msg = 'Scanned files error'
+        self.assertListEqual(received, expected, msg)
+
+    def test_scan_unchanged_directories_cached(self):
+        """Unchanged directories are not listed again.
+        """
+        # Given a tree that has been scanned
+        scanner = baip_parser.Scanner()
+        scanner.scan(self._dir, file_filter='.*\.xlsx$')
+        scanner.stats.clear()
+
+        # When the tree is scanned again
+        received = sorted(scanner.scan(self._dir, file_filter='.*\.xlsx$'))
+
+        # Then the files should come from the cache
+        expected = sorted(self._files)
+        msg = 'Cached scan files error'
+        self.assertListEqual(received, expected, msg)
+        received = (scanner.stats['dirs_cached'],
+                    scanner.stats['dirs_scanned'])
+        expected = (4, 0)
+        msg = 'Unchanged directories should not be listed'
+        self.assertTupleEqual(received, expected, msg)
+
+        # And when a file is added to one directory
+        new_file = os.path.join(self._dir, 'BA-CLM', 'BA-CLM-v02.xlsx')
+        open(new_file, 'w').close()
+        scanner.stats.clear()
+        received = sorted(scanner.scan(self._dir, file_filter='.*\.xlsx$'))
+
+        # Then only that directory should be listed again
+        expected = sorted(self._files + [new_file])
+        msg = 'Changed directory files error'
+        self.assertListEqual(received, expected, msg)
+        received = (scanner.stats['dirs_cached'],
+                    scanner.stats['dirs_scanned'])
+        expected = (3, 1)
+        msg = 'Only the changed directory should be listed'
+        self.assertTupleEqual(received, expected, msg)
+
+    def test_scan_done_marker(self):
+        """Scan a directory tree for files with a done marker.
+        """
+        open('%s.done' % self._files[0], 'w').close()
+
+        scanner = baip_parser.Scanner()
+        received = scanner.scan(self._dir,
+                                file_filter='.*\.xlsx$',
+                                done_marker='.done')
+        expected = [self._files[0]]
+        msg = 'Done marker files error'
+        self.assertListEqual(received, expected, msg)
+
+        received = scanner.stats['awaiting_marker']
+        expected = 2
+        msg = 'Files awaiting done marker count error'
+        self.assertEqual(received, expected, msg)
+
+    def test_scan_exclude_dirs(self):
+        """Excluded directories are not scanned.
+        """
+        scanner = baip_parser.Scanner(exclude_dirs=['archive', 'BA-C*'])
+        received = scanner.scan(self._dir, file_filter='.*\.xlsx$')
+        expected = [self._files[1]]
+        msg = 'Excluded directory files error'
+        self.assertListEqual(received, expected, msg)
+
+        received = scanner.stats['dirs_excluded']
+        expected = 2
+        msg = 'Excluded directory count error'
+        self.assertEqual(received, expected, msg)
+
+    def test_scan_parallel(self):
+        """Scan a directory tree level with parallel threads.
+        """
+        scanner = baip_parser.Scanner(threads=2, parallel_min=2)
+        received = sorted(scanner.scan(self._dir, file_filter='.*\.xlsx$'))
+        expected = sorted(self._files)
+        msg = 'Parallel scan files error'
+        self.assertListEqual(received, expected, msg)
+
+        received = scanner.stats['dirs_parallel']
+        expected = 2
+        msg = 'Parallel directory count error'
+        self.assertEqual(received, expected, msg)
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
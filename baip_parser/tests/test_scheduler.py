@@ -0,0 +1,118 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.Scheduler` tests.
+
+"""
+import unittest2
+import os
+import shutil
+import zipfile
+import tempfile
+
+import baip_parser
+
+
+class TestScheduler(unittest2.TestCase):
+    """:class:`baip_parser.Scheduler` test cases.
+    """
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._scheduler = baip_parser.Scheduler()
+
+    def workbook(self, name, sheet_size):
+        """Create a zip that looks like a workbook with a worksheet of
+        *sheet_size* bytes.
+        """
+        filepath = os.path.join(self._dir, name)
+        archive = zipfile.ZipFile(filepath, 'w', zipfile.ZIP_DEFLATED)
+        archive.writestr('xl/workbook.xml', '<workbook/>')
+        archive.writestr('xl/worksheets/sheet1.xml', ' ' * sheet_size)
+        archive.close()
+
+        return filepath
+
+    def test_init(self):
+        """Initialise a Scheduler object.
+        """
+        msg = 'Object is not a baip_parser.Scheduler'
+        self.assertIsInstance(self._scheduler, baip_parser.Scheduler, msg)
+
+    def test_cost(self):
+        """Cost includes the uncompressed worksheet size.
+        """
+        filepath = self.workbook('BA-CLM-v01.xlsx', 100000)
+
+        received = self._scheduler.cost(filepath)
+        expected = os.path.getsize(filepath) + 100000
+        msg = 'Workbook cost error'
+        self.assertEqual(received, expected, msg)
+
+    def test_cost_not_zip(self):
+        """Cost of a file that is not a zip is its size on disk.
+        """
+        filepath = os.path.join(self._dir, 'BA-CLM-v01.xlsx')
+        fh = open(filepath, 'wb')
+        fh.write('corrupt')
+        fh.close()
+
+        received = self._scheduler.cost(filepath)
+        expected = 7
+        msg = 'Non-zip cost error'
+        self.assertEqual(received, expected, msg)
+
+    def test_schedule_largest_first(self):
+        """Schedule files largest first.
+        """
+        small = self.workbook('BA-CLM-v01.xlsx', 10)
+        large = self.workbook('BA-M02-v01.xlsx', 500000)
+        medium = self.workbook('BA-FIN-v01.xlsx', 50000)
+
+        received = [x[0] for x in self._scheduler.schedule([small,
+                                                            large,
+                                                            medium], 2)]
+        expected = [large, medium, small]
+        msg = 'LPT schedule order error'
+        self.assertListEqual(received, expected, msg)
+
+    def test_schedule_learned_template_rate(self):
+        """Schedule against learned template rates.
+        """
+        # Given a template that parses slowly per unit of cost
+        self._scheduler.template_pattern = r'^BA-(\w+)-'
+        slow = self.workbook('BA-SLOW-v01.xlsx', 1000)
+        fast = self.workbook('BA-FAST-v01.xlsx', 10000)
+        self._scheduler.record(slow, 1000, 10.0)
+        self._scheduler.record(fast, 10000, 1.0)
+
+        # When I schedule the workbooks
+        received = [x[0] for x in self._scheduler.schedule([fast, slow])]
+
+        # Then the slow template should go first
+        expected = [slow, fast]
+        msg = 'Learned rate schedule order error'
+        self.assertListEqual(received, expected, msg)
+
+    def test_makespan(self):
+        """Predict the makespan of LPT dispatch.
+        """
+        received = baip_parser.Scheduler.makespan([7, 5, 4, 3, 2], 2)
+        expected = 11
+        msg = 'Makespan prediction error'
+        self.assertEqual(received, expected, msg)
+
+    def test_save_and_load(self):
+        """Persist the learned rates between instances.
+        """
+        history_file = os.path.join(self._dir, 'schedule.json')
+        self._scheduler.history_file = history_file
+        self._scheduler.record('BA-CLM-v01.xlsx', 100, 2.0)
+        self._scheduler.save()
+
+        received = baip_parser.Scheduler(history_file).rates
+        expected = {'*': 0.02}
+        msg = 'Loaded schedule history error'
+        self.assertDictEqual(received, expected, msg)
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+        self._scheduler = None
+        del self._scheduler
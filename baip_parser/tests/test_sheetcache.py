@@ -0,0 +1,53 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.SheetCache` tests.
+
+"""
+import unittest2
+import shutil
+import tempfile
+
+import baip_parser
+
+
+class TestSheetCache(unittest2.TestCase):
+    """:class:`baip_parser.SheetCache` test cases.
+    """
+    def test_init(self):
+        """Initialise a SheetCache object.
+        """
+        cache = baip_parser.SheetCache()
+        msg = 'Object is not a baip_parser.SheetCache'
+        self.assertIsInstance(cache, baip_parser.SheetCache, msg)
+
+    def test_load_not_cached(self):
+        """Load an entry that has not been cached.
+        """
+        cache = baip_parser.SheetCache()
+        msg = 'Uncached workbook should return None'
+        self.assertIsNone(cache.load('BA-CLM-CLM-121-v04.xlsx'), msg)
+
+    def test_save_and_load_persisted(self):
+        """Save and load a persisted entry.
+        """
+        # Given a cache directory
+        cache_dir = tempfile.mkdtemp()
+
+        # And a cache entry
+        entry = {'cells': ['B1'],
+                 'parts': {'xl/sharedStrings.xml': (1234, 56)},
+                 'sheets': {'CLM-121-001': {
+                     'member': 'xl/worksheets/sheet1.xml',
+                     'crc': (4321, 65),
+                     'values': {'B1': (u'CLM-121-001', 0)}}}}
+
+        # When I save the entry
+        workbook = 'BA-CLM-CLM-121-v04.xlsx'
+        baip_parser.SheetCache(cache_dir).save(workbook, entry)
+
+        # Then a new cache instance should load it
+        received = baip_parser.SheetCache(cache_dir).load(workbook)
+        msg = 'Persisted sheet cache entry error'
+        self.assertDictEqual(received, entry, msg)
+
+        # Clean up.
+        shutil.rmtree(cache_dir)
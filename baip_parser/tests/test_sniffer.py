@@ -0,0 +1,144 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.Sniffer` tests.
+
+"""
+import unittest2
+import os
+import tempfile
+import zipfile
+
+import baip_parser
+from filer.files import remove_files
+
+
+class TestSniffer(unittest2.TestCase):
+    """:class:`baip_parser.Sniffer` test cases.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls._dir = tempfile.mkdtemp()
+
+        cls._xlsx = os.path.join(cls._dir, 'BA-CLM-CLM-121-v04.xlsx')
+        archive = zipfile.ZipFile(cls._xlsx, 'w')
+        archive.writestr('[Content_Types].xml', '<Types/>')
+        archive.writestr('xl/workbook.xml', '<workbook/>')
+        archive.close()
+
+        cls._xlsb = os.path.join(cls._dir, 'BA-CLM-CLM-123-v04.xlsb')
+        archive = zipfile.ZipFile(cls._xlsb, 'w')
+        archive.writestr('xl/workbook.bin', '')
+        archive.close()
+
+        cls._xls = os.path.join(cls._dir, 'BA-CLM-CLM-124-v04.xls')
+        fh = open(cls._xls, 'wb')
+        fh.write('\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1')
+        fh.close()
+
+        cls._docx = os.path.join(cls._dir, 'BA-NIC-NAM-130-v14.docx')
+        archive = zipfile.ZipFile(cls._docx, 'w')
+        archive.writestr('word/document.xml', '<document/>')
+        archive.close()
+
+        cls._pptx = os.path.join(cls._dir, 'BA-NIC-NAM-131-v14.pptx')
+        archive = zipfile.ZipFile(cls._pptx, 'w')
+        archive.writestr('ppt/presentation.xml', '<presentation/>')
+        archive.close()
+
+        cls._lock = os.path.join(cls._dir, '~$BA-CLM-CLM-121-v04.xlsx')
+        fh = open(cls._lock, 'wb')
+        fh.write('PK\x03\x04')
+        fh.close()
+
+        cls._text = os.path.join(cls._dir, 'BA-CLM-CLM-122-v04.xlsx')
+        fh = open(cls._text, 'wb')
+        fh.write('not a workbook')
+        fh.close()
+
+    def setUp(self):
+        self._sniffer = baip_parser.Sniffer()
+
+    def test_init(self):
+        """Initialise a Sniffer object.
+        """
+        msg = 'Object is not a baip_parser.Sniffer'
+        self.assertIsInstance(self._sniffer, baip_parser.Sniffer, msg)
+
+    def test_classify_xlsx(self):
+        """Classify: xlsx workbook.
+        """
+        received = self._sniffer.classify(self._xlsx)
+        expected = 'xlsx'
+        msg = 'Workbook classification error'
+        self.assertEqual(received, expected, msg)
+
+    def test_classify_binary_workbooks(self):
+        """Classify: xlsb and xls workbooks.
+        """
+        received = [self._sniffer.classify(x) for x in [self._xlsb,
+                                                        self._xls]]
+        expected = ['xlsb', 'xls']
+        msg = 'Binary workbook classification error'
+        self.assertListEqual(received, expected, msg)
+
+    def test_classify_docx(self):
+        """Classify: docx report.
+        """
+        received = self._sniffer.classify(self._docx)
+        expected = 'docx'
+        msg = 'docx classification error'
+        self.assertEqual(received, expected, msg)
+
+    def test_classify_unknown_zip(self):
+        """Classify: zip that is neither a workbook nor a report.
+        """
+        received = self._sniffer.classify(self._pptx)
+        expected = 'unknown_zip'
+        msg = 'Unknown zip classification error'
+        self.assertEqual(received, expected, msg)
+
+    def test_classify_lock_file(self):
+        """Classify: Excel lock file.
+        """
+        received = self._sniffer.classify(self._lock)
+        expected = 'lock_file'
+        msg = 'Lock file classification error'
+        self.assertEqual(received, expected, msg)
+
+    def test_classify_not_zip(self):
+        """Classify: misnamed non-zip file.
+        """
+        received = self._sniffer.classify(self._text)
+        expected = 'not_zip'
+        msg = 'Non-zip classification error'
+        self.assertEqual(received, expected, msg)
+
+    def test_classify_missing_file(self):
+        """Classify: missing file.
+        """
+        received = self._sniffer.classify(os.path.join(self._dir, 'xxx'))
+        expected = 'unreadable'
+        msg = 'Missing file classification error'
+        self.assertEqual(received, expected, msg)
+
+    def test_accept(self):
+        """Accept only the workbook and report.
+        """
+        received = [self._sniffer.accept(x)[0] for x in [self._xlsx,
+                                                         self._docx,
+                                                         self._pptx,
+                                                         self._lock,
+                                                         self._text]]
+        expected = [True, True, False, False, False]
+        msg = 'Sniffer accept error'
+        self.assertListEqual(received, expected, msg)
+
+    def tearDown(self):
+        self._sniffer = None
+        del self._sniffer
+
+    @classmethod
+    def tearDownClass(cls):
+        remove_files([cls._xlsx, cls._xlsb, cls._xls, cls._docx, cls._pptx,
+                      cls._lock, cls._text])
+        os.removedirs(cls._dir)
+        del cls._dir
@@ -0,0 +1,56 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.Sorter` tests.
+
+"""
+import unittest2
+
+import baip_parser
+
+
+class TestSorter(unittest2.TestCase):
+    """:class:`baip_parser.Sorter` test cases.
+    """
+    def test_init(self):
+        """Initialise a Sorter object.
+        """
+        sorter = baip_parser.Sorter()
+        msg = 'Object is not a baip_parser.Sorter'
+        self.assertIsInstance(sorter, baip_parser.Sorter, msg)
+
+    def test_sort_in_memory(self):
+        """Sort records: single in-memory chunk.
+        """
+        # Given a set of unordered records
+        records = [(3, 'c'), (1, 'a'), (2, 'b')]
+
+        # When I sort the records within a single chunk
+        sorter = baip_parser.Sorter(chunk_size=10)
+        received = list(sorter.sort(iter(records)))
+
+        # Then the records should be returned in order
+        expected = [(1, 'a'), (2, 'b'), (3, 'c')]
+        msg = 'In-memory sort error'
+        self.assertListEqual(received, expected, msg)
+
+    def test_sort_spilled_chunks(self):
+        """Sort records: merge of spilled chunks.
+        """
+        # Given a set of unordered records
+        records = [(x % 7, x, u'row %d' % x) for x in range(50)]
+
+        # When I sort the records with a chunk size that forces spills
+        sorter = baip_parser.Sorter(chunk_size=4)
+        received = list(sorter.sort(iter(records)))
+
+        # Then the records should be returned in order
+        expected = sorted(records)
+        msg = 'External merge sort error'
+        self.assertListEqual(received, expected, msg)
+
+    def test_sort_no_records(self):
+        """Sort records: no records.
+        """
+        sorter = baip_parser.Sorter()
+        received = list(sorter.sort(iter([])))
+        msg = 'Sort of no records should return an empty list'
+        self.assertListEqual(received, [], msg)
@@ -0,0 +1,82 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.SqliteWriter` tests.
+
+"""
+import unittest2
+import os
+import sqlite3
+import tempfile
+
+import baip_parser
+from filer.files import remove_files
+
+
+class TestSqliteWriter(unittest2.TestCase):
+    """:class:`baip_parser.SqliteWriter` test cases.
+    """
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._db = os.path.join(self._dir, 'cells.db')
+        self._writer = baip_parser.SqliteWriter(self._db)
+        self._writer.headers = ['sheet_name', 'formation']
+        self._keys = ['BA-CLM-v01.xlsx|CLM-1', 'BA-CLM-v01.xlsx|CLM-2']
+
+    def rows(self, query):
+        """Helper that runs *query* against the test database.
+        """
+        connection = sqlite3.connect(self._db)
+        rows = connection.execute(query).fetchall()
+        connection.close()
+
+        return rows
+
+    def test_init(self):
+        """Initialise a SqliteWriter object.
+        """
+        msg = 'Object is not a baip_parser.SqliteWriter'
+        self.assertIsInstance(self._writer, baip_parser.SqliteWriter, msg)
+
+    def test_write(self):
+        """Upsert rows keyed on workbook|worksheet.
+        """
+        # Given rows that have been written
+        self._writer.batch_rows = 1
+        self._writer.write([('CLM-1', 'Walloon'), ('CLM-2', 'Hutton')],
+                           keys=self._keys)
+
+        # When the rows are written again with one change
+        self._writer.write([('CLM-2', 'Precipice')], keys=self._keys[1:])
+
+        # Then the changed row should be updated in place
+        received = self.rows('SELECT key, sheet_name, formation '
+                             'FROM cells ORDER BY key')
+        expected = [(u'BA-CLM-v01.xlsx|CLM-1', u'CLM-1', u'Walloon'),
+                    (u'BA-CLM-v01.xlsx|CLM-2', u'CLM-2', u'Precipice')]
+        msg = 'Upserted rows error'
+        self.assertListEqual(received, expected, msg)
+
+        # And the database should be in WAL mode
+        received = self.rows('PRAGMA journal_mode')
+        expected = [(u'wal',)]
+        msg = 'Database not in WAL mode'
+        self.assertListEqual(received, expected, msg)
+
+    def test_write_new_headers(self):
+        """New headers are added as columns.
+        """
+        self._writer.write([('CLM-1', 'Walloon')], keys=self._keys[:1])
+
+        self._writer.headers = ['sheet_name', 'formation', 'budget']
+        self._writer.write([('CLM-2', 'Hutton', 1000)], keys=self._keys[1:])
+
+        received = self.rows('SELECT key, budget FROM cells ORDER BY key')
+        expected = [(u'BA-CLM-v01.xlsx|CLM-1', None),
+                    (u'BA-CLM-v01.xlsx|CLM-2', 1000)]
+        msg = 'New header column error'
+        self.assertListEqual(received, expected, msg)
+
+    def tearDown(self):
+        remove_files([self._db, '%s-wal' % self._db, '%s-shm' % self._db])
+        os.removedirs(self._dir)
+        self._writer = None
+        del self._writer
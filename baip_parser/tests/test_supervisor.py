@@ -0,0 +1,154 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.Supervisor` tests.
+
+"""
+import unittest2
+import os
+import time
+
+import baip_parser
+
+
+def _pid(task):
+    """Task that reports the worker process ID.
+    """
+    return (task, os.getpid())
+
+
+def _die(task):
+    """Task that kills the worker on demand.
+    """
+    if task == 'die':
+        os._exit(1)  # pylint: disable=W0212
+
+    return (task, os.getpid())
+
+
+class _Stall(object):
+    """Result that hangs while it is being reported.
+    """
+    def __reduce__(self):
+        time.sleep(60)
+
+
+def _report(task):
+    """Task that overruns on demand part way through reporting its
+    result.
+    """
+    if task == 'hang':
+        return (task, _Stall())
+
+    return (task, os.getpid())
+
+
+def _hang(task):
+    """Task that overruns on demand.
+    """
+    if task == 'hang':
+        time.sleep(60)
+
+    return (task, os.getpid())
+
+
+class TestSupervisor(unittest2.TestCase):
+    """:class:`baip_parser.Supervisor` test cases.
+    """
+    def setUp(self):
+        self._supervisor = baip_parser.Supervisor(workers=2, standby=1)
+        self._supervisor.poll_interval = 0.1
+
+    def test_init(self):
+        """Initialise a Supervisor object.
+        """
+        msg = 'Object is not a baip_parser.Supervisor'
+        self.assertIsInstance(self._supervisor, baip_parser.Supervisor, msg)
+
+    def test_map(self):
+        """Run tasks across the workers.
+        """
+        received = sorted([x[1][0]
+                           for x in self._supervisor.map(_pid, range(6))])
+        expected = range(6)
+        msg = 'Supervised task results error'
+        self.assertListEqual(received, expected, msg)
+
+        # And the workers stay up for the next batch
+        pids = self._supervisor.pids
+        list(self._supervisor.map(_pid, range(2)))
+        msg = 'Workers should be long-lived'
+        self.assertListEqual(self._supervisor.pids, pids, msg)
+
+    def test_map_recycle_max_files(self):
+        """Workers recycled after max_files tasks.
+        """
+        # Given a single worker that is recycled every 2 tasks
+        self._supervisor.workers = 1
+        self._supervisor.max_files = 2
+
+        # When I run 5 tasks
+        outcomes = list(self._supervisor.map(_pid, range(5)))
+
+        # Then 3 different worker processes should have been used
+        received = len(set([x[1][1] for x in outcomes]))
+        expected = 3
+        msg = 'Worker processes not recycled'
+        self.assertEqual(received, expected, msg)
+        received = self._supervisor.stats['workers_recycled']
+        expected = 2
+        self.assertEqual(received, expected, msg)
+
+    def test_map_worker_died(self):
+        """Worker that dies is replaced and its task reported.
+        """
+        outcomes = list(self._supervisor.map(_die, ['a', 'die', 'b']))
+
+        received = dict((x[0], x[2] is not None) for x in outcomes)
+        expected = {'a': False, 'die': True, 'b': False}
+        msg = 'Dead worker task not reported'
+        self.assertDictEqual(received, expected, msg)
+        self.assertEqual(self._supervisor.stats['workers_died'], 1, msg)
+
+    def test_map_deadline(self):
+        """Worker that overruns its deadline is killed.
+        """
+        start = time.time()
+        outcomes = list(self._supervisor.map(_hang,
+                                             ['a', 'hang', 'b'],
+                                             deadline=0.5))
+
+        received = dict((x[0], x[2] and x[2][0]) for x in outcomes)
+        expected = {'a': None, 'hang': 'deadline_exceeded', 'b': None}
+        msg = 'Overrun task not reported'
+        self.assertDictEqual(received, expected, msg)
+        self.assertEqual(self._supervisor.stats['workers_killed'], 1, msg)
+
+        msg = 'Overrun task not killed in time'
+        self.assertLess(time.time() - start, 10, msg)
+
+    def test_map_deadline_mid_result(self):
+        """Worker killed while sending its result does not block others.
+        """
+        # Given one worker is killed part way through reporting
+        outcomes = list(self._supervisor.map(_report,
+                                             ['a', 'hang', 'b', 'c'],
+                                             deadline=0.5))
+
+        # Then the remaining workers should still report their results
+        received = dict((x[0], x[2] and x[2][0]) for x in outcomes)
+        expected = {'a': None,
+                    'hang': 'deadline_exceeded',
+                    'b': None,
+                    'c': None}
+        msg = 'Killed worker blocked the remaining workers'
+        self.assertDictEqual(received, expected, msg)
+
+    def test_rss(self):
+        """Resident set size of the current process.
+        """
+        msg = 'Resident set size should be positive'
+        self.assertGreater(baip_parser.Supervisor.rss(), 0, msg)
+
+    def tearDown(self):
+        self._supervisor.stop()
+        self._supervisor = None
+        del self._supervisor
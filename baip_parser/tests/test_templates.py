@@ -0,0 +1,143 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.Templates` tests.
+
+"""
+import unittest2
+import os
+import zipfile
+import tempfile
+import openpyxl
+
+import baip_parser
+from filer.files import remove_files
+
+
+class TestTemplates(unittest2.TestCase):
+    """:class:`baip_parser.Templates` test cases.
+    """
+    def setUp(self):
+        self._files = []
+        for sheets in [['CLM-121-001', 'Instructions'],
+                       ['CLM-121-001', 'Instructions'],
+                       ['NIC-130-001', 'Instructions']]:
+            workbook_obj = tempfile.NamedTemporaryFile(suffix='.xlsx')
+            workbook_file = workbook_obj.name
+            workbook_obj.close()
+
+            workbook = openpyxl.Workbook()
+            workbook.remove_sheet(workbook.active)
+            for name in sheets:
+                ws = workbook.create_sheet(title=name)
+                ws['B1'] = name
+                ws['B3'] = 121
+            workbook.save(workbook_file)
+            self._files.append(workbook_file)
+
+    def test_init(self):
+        """Initialise a Templates object.
+        """
+        templates = baip_parser.Templates()
+        msg = 'Object is not a baip_parser.Templates'
+        self.assertIsInstance(templates, baip_parser.Templates, msg)
+
+    def test_fingerprint(self):
+        """Fingerprint workbook templates.
+        """
+        # When the workbooks are fingerprinted
+        fingerprints = []
+        for workbook_file in self._files:
+            archive = zipfile.ZipFile(workbook_file)
+            fingerprints.append(baip_parser.Templates.fingerprint(archive))
+            archive.close()
+
+        # Then workbooks of the same template should match
+        msg = 'Same template fingerprint mismatch'
+        self.assertEqual(fingerprints[0], fingerprints[1], msg)
+
+        # And a different template should not
+        msg = 'Different template fingerprints match'
+        self.assertNotEqual(fingerprints[0][0], fingerprints[2][0], msg)
+
+        # And the worksheet members should be resolved
+        received = [x[0] for x in fingerprints[0][1]]
+        expected = ['CLM-121-001', 'Instructions']
+        msg = 'Template worksheets error'
+        self.assertListEqual(received, expected, msg)
+
+    def test_build(self):
+        """Resolve a template's extraction plan.
+        """
+        # Given a template's worksheets
+        sheets = [('CLM-121-001', 'xl/worksheets/sheet1.xml'),
+                  ('Instructions', 'xl/worksheets/sheet2.xml'),
+                  ('Chart1', 'xl/chartsheets/sheet1.xml')]
+
+        # When the plan is resolved
+        plan = baip_parser.Templates.build(sheets,
+                                           ['instructions'],
+                                           ['B1', 'b3', 'C1'])
+
+        # Then only the worksheets to extract should be planned
+        received = plan['sheets']
+        expected = [('CLM-121-001', 'xl/worksheets/sheet1.xml')]
+        msg = 'Planned worksheets error'
+        self.assertListEqual(received, expected, msg)
+
+        # And the cells should be mapped by row
+        received = plan['targets']
+        expected = {1: {'B1': 'B1', 'C1': 'C1'}, 3: {'B3': 'b3'}}
+        msg = 'Planned cells error'
+        self.assertDictEqual(received, expected, msg)
+        self.assertEqual(plan['max_row'], 3, msg)
+
+    def test_save_and_load(self):
+        """Persist a template plan.
+        """
+        # Given a template directory
+        template_dir = tempfile.mkdtemp()
+        plan = baip_parser.Templates.build([], [], ['B1'])
+
+        # When a plan is saved
+        baip_parser.Templates(template_dir).save('abc', plan)
+
+        # Then it should be loaded by another Templates object
+        received = baip_parser.Templates(template_dir).load('abc')
+        msg = 'Loaded template plan error'
+        self.assertDictEqual(received, plan, msg)
+
+        # Clean up.
+        remove_files(os.path.join(template_dir, 'abc.plan'))
+        os.removedirs(template_dir)
+
+    def test_parse_sheets_planned(self):
+        """Parse workbooks as per their template's plan.
+        """
+        # Given a parser with templates
+        templates = baip_parser.Templates()
+        received = []
+        stats = []
+        for workbook_file in self._files[:2]:
+            parser = baip_parser.Parser()
+            parser.cells_to_extract = ['B1', 'B3', 'C9']
+            parser.skip_sheets = ['Instructions']
+            parser.templates = templates
+
+            # When the workbooks of a template are parsed
+            parser.open(workbook_file)
+            received.append(parser.parse_sheets().values())
+            parser.close()
+            stats.append(parser.stats['template_hits'])
+
+        # Then the second workbook should use the first one's plan
+        msg = 'Template plan not reused'
+        self.assertListEqual(stats, [0, 1], msg)
+
+        # And the values should be extracted
+        expected = [{'B1': u'CLM-121-001', 'B3': 121, 'C9': None}]
+        msg = 'Planned worksheet values error'
+        self.assertListEqual(received[0], expected, msg)
+        self.assertListEqual(received[1], expected, msg)
+
+    def tearDown(self):
+        remove_files(self._files)
+        self._files = None
@@ -205,6 +205,258 @@ class TestWriter(unittest2.TestCase):
         self._writer.header_field_lengths = old_header_field_lengths
         remove_files(outfile)
 
+    def test_order_rows_sort_by(self):
+        """Order rows: sort_by.
+        """
+        # Given a list of headers
+        old_headers = self._writer.headers
+        self._writer.headers = ['name', 'sheet_name']
+
+        # And a column to sort on
+        old_sort_by = self._writer.sort_by
+        self._writer.sort_by = ['sheet_name']
+
+        # And a small sort buffer
+        old_sort_buffer_rows = self._writer.sort_buffer_rows
+        self._writer.sort_buffer_rows = 2
+
+        # When I order the rows
+        rows = [('c', 'CLM-121-003'),
+                ('a', 'CLM-121-001'),
+                ('d', 'CLM-121-004'),
+                ('b', 'CLM-121-002')]
+        received = list(self._writer.order_rows(rows))
+
+        # Then the rows should be sorted on the sheet_name column
+        expected = [('a', 'CLM-121-001'),
+                    ('b', 'CLM-121-002'),
+                    ('c', 'CLM-121-003'),
+                    ('d', 'CLM-121-004')]
+        msg = 'Rows sorted by sheet_name error'
+        self.assertListEqual(received, expected, msg)
+
+        # Clean up.
+        self._writer.headers = old_headers
+        self._writer.sort_by = old_sort_by
+        self._writer.sort_buffer_rows = old_sort_buffer_rows
+
+    def test_order_rows_dedupe_on(self):
+        """Order rows: dedupe_on preserves the original order.
+        """
+        # Given a list of headers
+        old_headers = self._writer.headers
+        self._writer.headers = ['name', 'sheet_name']
+
+        # And a column to dedupe on
+        old_dedupe_on = self._writer.dedupe_on
+        self._writer.dedupe_on = ['sheet_name']
+
+        # When I order the rows
+        rows = [('first', 'CLM-121-003'),
+                ('other', 'CLM-121-001'),
+                ('second', 'CLM-121-003')]
+        received = list(self._writer.order_rows(rows))
+
+        # Then the first duplicate should win
+        expected = [('first', 'CLM-121-003'),
+                    ('other', 'CLM-121-001')]
+        msg = 'Rows deduped on sheet_name error'
+        self.assertListEqual(received, expected, msg)
+
+        # Clean up.
+        self._writer.headers = old_headers
+        self._writer.dedupe_on = old_dedupe_on
+
+    def test_order_rows_latest_version_wins(self):
+        """Order rows: dedupe_on with latest version wins.
+        """
+        # Given a list of headers
+        old_headers = self._writer.headers
+        self._writer.headers = ['name', 'sheet_name']
+
+        # And a column to dedupe and sort on
+        old_dedupe_on = self._writer.dedupe_on
+        self._writer.dedupe_on = ['sheet_name']
+        old_sort_by = self._writer.sort_by
+        self._writer.sort_by = ['sheet_name']
+
+        # And a workbook version rule
+        old_version_pattern = self._writer.version_pattern
+        self._writer.version_pattern = r'-v(\d+)\.xlsx$'
+
+        # When I order the rows from several workbook versions
+        rows = [('v04', 'CLM-121-003'),
+                ('v05', 'CLM-121-003'),
+                ('v04', 'CLM-121-001')]
+        keys = ['BA-CLM-CLM-121-CRDPathway-v04.xlsx|CLM-121-003',
+                'BA-CLM-CLM-121-CRDPathway-v05.xlsx|CLM-121-003',
+                'BA-CLM-CLM-121-CRDPathway-v04.xlsx|CLM-121-001']
+        received = list(self._writer.order_rows(rows, keys))
+
+        # Then the latest workbook version should win
+        expected = [('v04', 'CLM-121-001'),
+                    ('v05', 'CLM-121-003')]
+        msg = 'Rows deduped on latest version error'
+        self.assertListEqual(received, expected, msg)
+
+        # Clean up.
+        self._writer.headers = old_headers
+        self._writer.dedupe_on = old_dedupe_on
+        self._writer.sort_by = old_sort_by
+        self._writer.version_pattern = old_version_pattern
+
+    def test_write_delta(self):
+        """Write out only the rows that changed since the last write.
+        """
+        # Given a list of headers
+        old_headers = self._writer.headers
+        self._writer.headers = ['sheet_name', 'formation']
+
+        # And delta output
+        delta_file = os.path.join(self._dir, 'delta.json')
+        self._writer.delta = baip_parser.Delta(delta_file)
+        outfile = os.path.join(self._dir, 'delta.csv')
+        self._writer.outfile = outfile
+
+        # And an earlier write
+        keys = ['BA-CLM-v01.xlsx|CLM-1',
+                'BA-CLM-v01.xlsx|CLM-2',
+                'BA-CLM-v01.xlsx|CLM-3']
+        self._writer.write([('CLM-1', 'Walloon'),
+                            ('CLM-2', 'Hutton'),
+                            ('CLM-3', 'Evergreen')], keys=keys)
+
+        # When one row changes, one is removed and one is added
+        self._writer.delta = baip_parser.Delta(delta_file)
+        self._writer.write([('CLM-1', 'Walloon'),
+                            ('CLM-2', 'Precipice'),
+                            ('CLM-4', 'Moolayember')],
+                           keys=keys[:2] + ['BA-CLM-v01.xlsx|CLM-4'])
+
+        # Then only the changes should be written
+        received_fh = open(outfile)
+        received = received_fh.read().splitlines()
+        received_fh.close()
+        expected = ['operation,key,sheet_name,formation',
+                    'update,BA-CLM-v01.xlsx|CLM-2,CLM-2,Precipice',
+                    'insert,BA-CLM-v01.xlsx|CLM-4,CLM-4,Moolayember',
+                    'delete,BA-CLM-v01.xlsx|CLM-3,,']
+        msg = 'Delta outfile contents mismatch'
+        self.assertListEqual(received, expected, msg)
+
+        # Clean up.
+        self._writer.headers = old_headers
+        self._writer.delta = None
+        remove_files([outfile, delta_file])
+
+    def test_write_partitions(self):
+        """Write out a file per workbook family partition.
+        """
+        # Given a list of headers
+        old_headers = self._writer.headers
+        self._writer.headers = ['sheet_name']
+
+        # And a partitioning rule on the workbook name
+        self._writer.partition_pattern = r'^BA-(\w+)-'
+        outfile = os.path.join(self._dir, 'out.csv')
+        self._writer.outfile = outfile
+
+        # When I write rows from several workbook families
+        data = [('CLM-121-001',), ('NAM-130-001',), ('CLM-121-002',), ('X',)]
+        keys = ['BA-CLM-CLM-121-CRDPathway-v04.xlsx|CLM-121-001',
+                'BA-NIC-NAM-130-CoverPrelims-v14.xlsx|NAM-130-001',
+                'BA-CLM-CLM-121-CRDPathway-v04.xlsx|CLM-121-002',
+                'unknown.xlsx|X']
+        self._writer.write(data, keys=keys)
+
+        # Then each partition should have its own output file
+        received = {}
+        for partition in ['CLM', 'NIC', 'other']:
+            partition_fh = open(os.path.join(self._dir,
+                                             'out.%s.csv' % partition))
+            received[partition] = partition_fh.read().splitlines()
+            partition_fh.close()
+        expected = {'CLM': ['sheet_name', 'CLM-121-001', 'CLM-121-002'],
+                    'NIC': ['sheet_name', 'NAM-130-001'],
+                    'other': ['sheet_name', 'X']}
+        msg = 'Partitioned output error'
+        self.assertDictEqual(received, expected, msg)
+
+        msg = 'Unpartitioned output should not be written'
+        self.assertFalse(os.path.exists(outfile), msg)
+
+        # Clean up.
+        self._writer.headers = old_headers
+        self._writer.partition_pattern = None
+        remove_files([os.path.join(self._dir, 'out.%s.csv' % x)
+                      for x in ['CLM', 'NIC', 'other']])
+
+    def test_write_partitions_delta(self):
+        """Partitions beyond the workers are spooled and partitions
+        without rows emit their deletes.
+        """
+        # Given a single partition worker and delta output
+        old_headers = self._writer.headers
+        self._writer.headers = ['sheet_name']
+        self._writer.partition_pattern = r'^BA-(\w+)-'
+        self._writer.partition_workers = 1
+        self._writer.outfile = os.path.join(self._dir, 'out.csv')
+        delta_file = os.path.join(self._dir, 'delta.json')
+
+        # When I write rows of two partitions as a stream
+        keys = ['BA-CLM-v01.xlsx|CLM-1', 'BA-NIC-v01.xlsx|NIC-1']
+        self._writer.delta = baip_parser.Delta(delta_file)
+        self._writer.write((x for x in [('CLM-1',), ('NIC-1',)]),
+                           keys=iter(keys))
+
+        # Then the spooled partition should also be written
+        partitions = ['CLM', 'NIC']
+        outfiles = [os.path.join(self._dir, 'out.%s.csv' % x)
+                    for x in partitions]
+        received = [open(x).read().splitlines() for x in outfiles]
+        expected = [['operation,key,sheet_name',
+                     'insert,BA-CLM-v01.xlsx|CLM-1,CLM-1'],
+                    ['operation,key,sheet_name',
+                     'insert,BA-NIC-v01.xlsx|NIC-1,NIC-1']]
+        msg = 'Spooled partition output error'
+        self.assertListEqual(received, expected, msg)
+
+        # And when the next output has no rows in a partition
+        self._writer.delta = baip_parser.Delta(delta_file)
+        self._writer.write([('CLM-1',)], keys=keys[:1])
+
+        # Then that partition should emit its deletes
+        received = [open(x).read().splitlines() for x in outfiles]
+        expected = [['operation,key,sheet_name'],
+                    ['operation,key,sheet_name',
+                     'delete,BA-NIC-v01.xlsx|NIC-1,']]
+        msg = 'Partition without rows did not emit its deletes'
+        self.assertListEqual(received, expected, msg)
+
+        # Clean up.
+        self._writer.headers = old_headers
+        self._writer.partition_pattern = None
+        self._writer.partition_workers = 4
+        self._writer.delta = None
+        remove_files(outfiles + [os.path.join(self._dir, 'delta.%s.json' % x)
+                                 for x in partitions])
+
+    def test_partition_by_header(self):
+        """Partition a row on an output header value.
+        """
+        old_headers = self._writer.headers
+        self._writer.headers = ['sheet_name', 'region']
+        self._writer.partition_by = 'region'
+
+        received = self._writer.partition(('CLM-121-001', 'Clarence Moreton'))
+        expected = 'Clarence_Moreton'
+        msg = 'Partition on header value error'
+        self.assertEqual(received, expected, msg)
+
+        # Clean up.
+        self._writer.headers = old_headers
+        self._writer.partition_by = None
+
     def test_header_aliases(self):
         """Substitue header aliases.
         """
@@ -0,0 +1,185 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.XlsbEngine` tests.
+
+"""
+import unittest2
+import os
+import struct
+import datetime
+import tempfile
+import zipfile
+
+import baip_parser
+from filer.files import remove_files
+
+
+def _record(record_type, data=''):
+    """Encode a BIFF12 record.
+    """
+    header = ''
+    if record_type >= 0x80:
+        header += chr((record_type & 0x7F) | 0x80) + chr(record_type >> 7)
+    else:
+        header += chr(record_type)
+
+    size = len(data)
+    while True:
+        byte = size & 0x7F
+        size >>= 7
+        if size:
+            header += chr(byte | 0x80)
+        else:
+            header += chr(byte)
+            break
+
+    return header + data
+
+
+def _wide(value):
+    return struct.pack('<I', len(value)) + value.encode('utf-16-le')
+
+
+def _cell(record_type, column, data, style=0):
+    return _record(record_type, struct.pack('<II', column, style) + data)
+
+
+def _row(row):
+    return _record(0, struct.pack('<I', row) + '\x00' * 13)
+
+
+class TestXlsbEngine(unittest2.TestCase):
+    """:class:`baip_parser.XlsbEngine` test cases.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.maxDiff = None
+
+        # A workbook with two worksheets and a chart sheet.
+        workbook_obj = tempfile.NamedTemporaryFile(suffix='.xlsb')
+        cls._file = workbook_obj.name
+        workbook_obj.close()
+
+        workbook = _record(153, '\x00' * 12)
+        for rel_id, name in [('rId1', u'CLM-121-001'),
+                             ('rId2', u'Instructions'),
+                             ('rId3', u'Chart1')]:
+            workbook += _record(156, '\x00' * 8 + _wide(rel_id) + _wide(name))
+
+        rels = ('<Relationships xmlns="http://schemas.openxmlformats.org/'
+                'package/2006/relationships">'
+                '<Relationship Id="rId1" Target="worksheets/sheet1.bin"/>'
+                '<Relationship Id="rId2" Target="worksheets/sheet2.bin"/>'
+                '<Relationship Id="rId3" Target="chartsheets/sheet1.bin"/>'
+                '</Relationships>')
+
+        sheet = (_row(0) +
+                 _cell(7, 1, struct.pack('<I', 0)) +
+                 _row(1) +
+                 _cell(2, 1, struct.pack('<I', (121 << 2) | 0x02)) +
+                 _cell(5, 2, struct.pack('<d', 42064.0), style=1) +
+                 _cell(4, 3, '\x01') +
+                 _row(2) +
+                 _cell(5, 0, struct.pack('<d', 1.5)) +
+                 _cell(6, 1, _wide(u'Clarence\u2011Moreton')) +
+                 _cell(11, 2, '\x2a') +
+                 _cell(62, 3, '\x01' + _wide(u'Namoi') +
+                       struct.pack('<I', 1) + '\x00' * 4) +
+                 _row(40) +
+                 # Never read: the extraction stops at the last row needed.
+                 '\x05\xff')
+
+        strings = _record(19, '\x00' + _wide(u'Walloon'))
+
+        styles = (_record(617) +
+                  _record(47, struct.pack('<HH', 0, 0) + '\x00' * 12) +
+                  _record(47, struct.pack('<HH', 0, 14) + '\x00' * 12) +
+                  _record(618))
+
+        archive = zipfile.ZipFile(cls._file, 'w')
+        archive.writestr('xl/workbook.bin', workbook)
+        archive.writestr('xl/_rels/workbook.bin.rels', rels)
+        archive.writestr('xl/worksheets/sheet1.bin', sheet)
+        archive.writestr('xl/worksheets/sheet2.bin', _row(0))
+        archive.writestr('xl/sharedStrings.bin', strings)
+        archive.writestr('xl/styles.bin', styles)
+        archive.close()
+
+    def test_sheet_names(self):
+        """Read the worksheet names.
+        """
+        engine = baip_parser.XlsbEngine(self._file)
+        received = engine.sheet_names
+        engine.close()
+        expected = [u'CLM-121-001', u'Instructions']
+        msg = 'xlsb worksheet names error'
+        self.assertListEqual(received, expected, msg)
+
+    def test_extract(self):
+        """Extract the requested cells.
+        """
+        # Given an xlsb workbook
+        engine = baip_parser.XlsbEngine(self._file)
+
+        # When the cells are extracted
+        received = engine.extract(u'CLM-121-001',
+                                  ['B1', 'B2', 'C2', 'D2',
+                                   'A3', 'B3', 'C3', 'D3', 'E3'])
+        engine.close()
+
+        # Then the values should be converted as per the xlsx parse
+        expected = {'B1': u'Walloon',
+                    'B2': 121,
+                    'C2': datetime.datetime(2015, 3, 1),
+                    'D2': True,
+                    'A3': 1.5,
+                    'B3': u'Clarence\u2011Moreton',
+                    'C3': '#N/A',
+                    'D3': u'Namoi',
+                    'E3': None}
+        msg = 'xlsb extracted values error'
+        self.assertDictEqual(received, expected, msg)
+
+    def test_open_not_a_workbook(self):
+        """Open a file that is not an xlsb workbook.
+        """
+        # Given a file that is not a zip
+        text_obj = tempfile.NamedTemporaryFile(suffix='.xlsb', delete=False)
+        text_obj.write('not a workbook')
+        text_obj.close()
+
+        # When it is opened
+        # Then an IOError should be raised
+        self.assertRaises(IOError, baip_parser.XlsbEngine, text_obj.name)
+
+        # Clean up.
+        remove_files(text_obj.name)
+
+    def test_parse_sheets(self):
+        """Parse an xlsb workbook through the Parser.
+        """
+        # Given a parser
+        parser = baip_parser.Parser()
+        parser.cells_to_extract = ['B1']
+        parser.skip_sheets = ['instructions']
+
+        # When the xlsb workbook is parsed
+        parser.open(self._file)
+        received = parser.parse_sheets()
+        sheet_names = parser.sheet_names
+        parser.close()
+
+        # Then the xlsb engine should extract the worksheets
+        key = '%s|CLM-121-001' % os.path.basename(self._file)
+        expected = {key: {'B1': u'Walloon'}}
+        msg = 'xlsb parse error'
+        self.assertDictEqual(dict(received), expected, msg)
+        msg = 'xlsb parser worksheet names error'
+        self.assertListEqual(sheet_names,
+                             [u'CLM-121-001', u'Instructions'],
+                             msg)
+        msg = 'xlsb parse not counted'
+        self.assertEqual(parser.stats['xlsb_parsed'], 1, msg)
+
+    @classmethod
+    def tearDownClass(cls):
+        remove_files(cls._file)
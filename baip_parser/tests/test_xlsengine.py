@@ -0,0 +1,101 @@
+# pylint: disable=R0904,C0103
+""":class:`baip_parser.XlsEngine` tests.
+
+"""
+import unittest2
+import os
+import datetime
+import tempfile
+
+try:
+    import xlwt
+except ImportError:
+    xlwt = None
+
+import baip_parser
+import baip_parser.xlsengine
+from filer.files import remove_files
+
+
+@unittest2.skipIf(baip_parser.xlsengine.xlrd is None or xlwt is None,
+                  'xls extraction tests require xlrd and xlwt')
+class TestXlsEngine(unittest2.TestCase):
+    """:class:`baip_parser.XlsEngine` test cases.
+    """
+    def setUp(self):
+        workbook_obj = tempfile.NamedTemporaryFile(suffix='.xls')
+        self._file = workbook_obj.name
+        workbook_obj.close()
+
+        workbook = xlwt.Workbook()
+        ws = workbook.add_sheet('CLM-121-001')
+        ws.write(0, 1, u'Walloon')
+        ws.write(1, 1, 121)
+        ws.write(1, 2, datetime.datetime(2015, 3, 1),
+                 xlwt.easyxf(num_format_str='YYYY-MM-DD'))
+        ws.write(2, 0, 1.5)
+        workbook.add_sheet('Instructions')
+        workbook.save(self._file)
+
+    def test_extract(self):
+        """Extract the requested cells.
+        """
+        # Given an xls workbook
+        engine = baip_parser.XlsEngine(self._file)
+
+        # When the cells are extracted
+        received = engine.extract('CLM-121-001', ['B1', 'B2', 'C2', 'A3',
+                                                  'Z99'])
+        engine.close()
+
+        # Then the values should be converted as per the xlsx parse
+        expected = {'B1': u'Walloon',
+                    'B2': 121,
+                    'C2': datetime.datetime(2015, 3, 1),
+                    'A3': 1.5,
+                    'Z99': None}
+        msg = 'xls extracted values error'
+        self.assertDictEqual(received, expected, msg)
+
+    def test_parse_sheets(self):
+        """Parse an xls workbook through the Parser.
+        """
+        # Given a parser
+        parser = baip_parser.Parser()
+        parser.cells_to_extract = ['B1']
+        parser.skip_sheets = ['Instructions']
+
+        # When the xls workbook is parsed
+        parser.open(self._file)
+        received = parser.parse_sheets()
+        parser.close()
+
+        # Then the xls engine should extract the worksheets
+        key = '%s|CLM-121-001' % os.path.basename(self._file)
+        expected = {key: {'B1': u'Walloon'}}
+        msg = 'xls parse error'
+        self.assertDictEqual(dict(received), expected, msg)
+
+    def test_parse_metadata(self):
+        """Parse the metadata of an xls workbook through the Parser.
+        """
+        # Given a metadata only parser
+        parser = baip_parser.Parser()
+        parser.metadata_only = True
+        parser.cells_to_extract = ['sheet_names', 'sheet_count']
+
+        # When the xls workbook is parsed
+        parser.open(self._file)
+        received = parser.parse_sheets()
+        parser.close()
+
+        # Then the xls engine should provide the worksheet names
+        key = '%s|%s' % (os.path.basename(self._file),
+                         baip_parser.Parser.METADATA)
+        expected = {key: {'sheet_names': 'CLM-121-001|Instructions',
+                          'sheet_count': 2}}
+        msg = 'xls metadata parse error'
+        self.assertDictEqual(dict(received), expected, msg)
+
+    def tearDown(self):
+        remove_files(self._file)
@@ -6,7 +6,19 @@ __all__ = [
     "Writer",
 ]
 import csv
-
+import os
+import re
+import copy
+import glob
+import cPickle
+import tempfile
+import itertools
+import collections
+import multiprocessing.pool
+
+from baip_parser.sorter import Sorter
+from baip_parser.delta import Delta
+from baip_parser.fanout import Fanout
 from logga.log import log
 
 
@@ -33,12 +45,74 @@ class Writer(object):
         dictionary of header keys and associated minimum field length
         thresholds
 
+    .. attribute:: sort_by
+
+        list of headers to sort the output rows on
+
+    .. attribute:: dedupe_on
+
+        list of headers whose combined values identify a duplicate row.
+        Only the first row of each duplicate set is written
+
+    .. attribute:: version_pattern
+
+        regular expression that extracts the version (first group) from
+        the workbook file name.  When set, the row from the latest
+        workbook version wins during :attr:`dedupe_on` processing
+
+    .. attribute:: sort_buffer_rows
+
+        number of rows to hold in memory before a sorted chunk is
+        spilled to disk
+
+    .. attribute:: delta
+
+        :class:`baip_parser.Delta` object.  When set, only the rows that
+        have changed since the previous write are output, preceded by
+        their operation and key
+
+    .. attribute:: partition_by
+
+        output header whose value routes each row to its partition
+
+    .. attribute:: partition_pattern
+
+        regular expression applied to the workbook file name.  The first
+        group (or the whole match) routes each row to its partition.
+        Only used if :attr:`partition_by` is not set
+
+    .. attribute:: partition_workers
+
+        number of partitions written in parallel
+
+    .. attribute:: partition_buffer_rows
+
+        maximum number of rows buffered ahead of each partition writer
+
+    .. attribute:: truncate
+
+        apply the :attr:`header_field_lengths` truncation (default
+        ``True``).  Unset when the rows arrive already truncated
+
     """
+    KEY_COLUMN = 'key'
+    DEFAULT_PARTITION = 'other'
+
     _outfile = None
     _headers = []
     _write_out_headers = True
     _header_field_lengths = {}
     _header_field_thresholds = {}
+    _sort_by = []
+    _dedupe_on = []
+    _version_pattern = None
+    _sort_buffer_rows = 100000
+    _delta = None
+    _partition_by = None
+    _partition_pattern = None
+    _partition_workers = 4
+    _partition_buffer_rows = 1000
+    _truncate = True
 
     def __init__(self, outfile=None):
         """Writer initialiser.
@@ -100,34 +174,540 @@ class Writer(object):
         if values is not None and isinstance(values, dict):
             self._header_field_thresholds = values
 
-    def write(self, data, word_boundary=False):
+    @property
+    def sort_by(self):
+        return self._sort_by
+
+    @sort_by.setter
+    def sort_by(self, values=None):
+        self._sort_by = []
+
+        if values is not None and isinstance(values, list):
+            self._sort_by.extend(values)
+
+    @property
+    def dedupe_on(self):
+        return self._dedupe_on
+
+    @dedupe_on.setter
+    def dedupe_on(self, values=None):
+        self._dedupe_on = []
+
+        if values is not None and isinstance(values, list):
+            self._dedupe_on.extend(values)
+
+    @property
+    def version_pattern(self):
+        return self._version_pattern
+
+    @version_pattern.setter
+    def version_pattern(self, value=None):
+        self._version_pattern = value
+
+    @property
+    def sort_buffer_rows(self):
+        return self._sort_buffer_rows
+
+    @sort_buffer_rows.setter
+    def sort_buffer_rows(self, value):
+        self._sort_buffer_rows = value
+
+    @property
+    def delta(self):
+        return self._delta
+
+    @delta.setter
+    def delta(self, value=None):
+        self._delta = value
+
+    @property
+    def columns(self):
+        """:attr:`headers` without duplicates (or :attr:`KEY_COLUMN`) in
+        output order.  Used by the keyed backends, where the last of any
+        duplicate header wins as per the CSV output.
+
+        """
+        columns = []
+        for header in self.headers:
+            if header not in columns and header != self.KEY_COLUMN:
+                columns.append(header)
+
+        return columns
+
+    @property
+    def partition_by(self):
+        return self._partition_by
+
+    @partition_by.setter
+    def partition_by(self, value=None):
+        self._partition_by = value
+
+    @property
+    def partition_pattern(self):
+        return self._partition_pattern
+
+    @partition_pattern.setter
+    def partition_pattern(self, value=None):
+        self._partition_pattern = value
+
+    @property
+    def partition_workers(self):
+        return self._partition_workers
+
+    @partition_workers.setter
+    def partition_workers(self, value):
+        self._partition_workers = value
+
+    @property
+    def partition_buffer_rows(self):
+        return self._partition_buffer_rows
+
+    @partition_buffer_rows.setter
+    def partition_buffer_rows(self, value):
+        self._partition_buffer_rows = value
+
+    @property
+    def truncate(self):
+        return self._truncate
+
+    @truncate.setter
+    def truncate(self, value):
+        self._truncate = value
+
+    def write(self, data, word_boundary=False, keys=None):
         """Class callable that writes list of tuple values in *data*.
 
+        If a partitioning rule is set, the rows are written to a separate
+        output per partition as per :meth:`write_partitions`.
+
         **Args:**
             *data*: list of tuples to write out
 
             *word_boundary*: if ``True``, attempts to tidy-up a truncated
             string by removing the last word in the sentence
 
+            *keys*: list of ``<workbook>|<worksheet>`` keys that
+            align with the rows in *data*.  Only required when
+            :attr:`version_pattern`, :attr:`delta` or
+            :attr:`partition_pattern` is set
+
+        """
+        if self.partition_by is not None or self.partition_pattern is not None:
+            self.write_partitions(data, word_boundary, keys)
+        else:
+            self.write_output(data, word_boundary, keys)
+
+    def write_partitions(self, data, word_boundary=False, keys=None):
+        """Route the rows in *data* to their partitions as a stream.
+
+        Each partition is written by a copy of this writer to
+        :meth:`partition_file` of :attr:`outfile`.  Sorting, dedupe and
+        :attr:`delta` apply within each partition.
+
+        The first :attr:`partition_workers` partitions are written as
+        their rows arrive, each by its own thread through a
+        :class:`baip_parser.Fanout` buffer of
+        :attr:`partition_buffer_rows` rows.  The rows of any further
+        partitions are spooled to a temporary file and written across
+        :attr:`partition_workers` threads once *data* is exhausted.  So
+        are the partitions that have a delta file but no rows, so that
+        their deleted keys are emitted.
+
+        **Args:**
+            as per :meth:`write`
+
+        **Raises:**
+            the first exception raised by a partition writer
+
+        """
+        if keys is None:
+            keys = itertools.repeat(None)
+
+        if (self.partition_by is not None and
+                self.partition_by not in self.headers):
+            log.warn('Partition header "%s" not in output: ignoring' %
+                     self.partition_by)
+
+        workers = max(self.partition_workers, 1)
+        fanout = Fanout(buffer_rows=self.partition_buffer_rows)
+        writers = {}
+        buffers = collections.OrderedDict()
+        spools = collections.OrderedDict()
+        try:
+            for row, key in itertools.izip(data, keys):
+                partition = self.partition(row, key)
+                buf = buffers.get(partition)
+                if buf is None and len(buffers) < workers:
+                    writers[partition] = self.partition_writer(partition)
+                    buf = fanout.start(partition,
+                                       writers[partition],
+                                       word_boundary)
+                    buffers[partition] = buf
+
+                if buf is not None:
+                    fanout.put(partition, buf, (row, key))
+                else:
+                    if partition not in spools:
+                        spools[partition] = tempfile.TemporaryFile()
+                    cPickle.dump((row, key),
+                                 spools[partition],
+                                 cPickle.HIGHEST_PROTOCOL)
+        finally:
+            fanout.finish(buffers.items())
+
+        for partition in self.delta_partitions():
+            if partition not in buffers and partition not in spools:
+                spools[partition] = None
+
+        tasks = []
+        for partition, spool in spools.iteritems():
+            writers[partition] = self.partition_writer(partition)
+            tasks.append((writers[partition], spool, word_boundary))
+
+        log.info('Writing %d partitions of "%s" (%d spooled)' %
+                 (len(writers), self.outfile, len(spools)))
+
+        try:
+            if fanout.errors:
+                raise fanout.errors.values()[0]
+
+            if tasks:
+                pool = multiprocessing.pool.ThreadPool(min(workers,
+                                                           len(tasks)))
+                try:
+                    pool.map(self._write_partition, tasks)
+                finally:
+                    pool.close()
+                    pool.join()
+        finally:
+            for spool in [x for x in spools.itervalues() if x is not None]:
+                spool.close()
+
+        if self.delta is not None:
+            for writer in writers.itervalues():
+                self.delta.stats.update(writer.delta.stats)
+
+    def partition_writer(self, partition):
+        """Copy of this writer that writes the *partition* output.
+
+        **Returns:**
+            :class:`baip_parser.Writer` object
+
+        """
+        writer = copy.copy(self)
+        writer.partition_by = None
+        writer.partition_pattern = None
+        writer.outfile = self.partition_file(self.outfile, partition)
+        if self.delta is not None:
+            delta_file = None
+            if self.delta.delta_file is not None:
+                delta_file = self.partition_file(self.delta.delta_file,
+                                                 partition)
+            writer.delta = Delta(delta_file)
+            writer.delta.parsed = self.delta.parsed
+            writer.delta.present = self.delta.present
+
+        return writer
+
+    def delta_partitions(self):
+        """Partitions that have a :attr:`delta` file from an earlier
+        :meth:`write_partitions`.
+
+        **Returns:**
+            sorted list of partition names
+
+        """
+        partitions = []
+
+        if self.delta is not None and self.delta.delta_file is not None:
+            root, ext = os.path.splitext(self.delta.delta_file)
+            prefix = '%s.' % root
+            for filepath in glob.glob('%s*%s' % (prefix, ext)):
+                partition = filepath[len(prefix):len(filepath) - len(ext)]
+                if re.match(r'^[\w.-]+$', partition):
+                    partitions.append(partition)
+
+        return sorted(partitions)
+
+    @staticmethod
+    def _write_partition(args):
+        """Thread pool wrapper around :meth:`write_output` that streams a
+        partition's rows back from its spool file.
+
+        """
+        writer, spool, word_boundary = args
+        data, keys = Fanout.split(Writer.unspool(spool))
+        writer.write_output(data, word_boundary, keys)
+
+    @staticmethod
+    def unspool(spool):
+        """Generator of the ``(<row>, <key>)`` items pickled to the
+        *spool* file.  A *spool* of ``None`` has no items.
+
+        """
+        if spool is not None:
+            spool.seek(0)
+            while True:
+                try:
+                    yield cPickle.load(spool)
+                except EOFError:
+                    break
+
+    def partition(self, row, key=None):
+        """Identify the partition of *row* as per :attr:`partition_by`
+        or :attr:`partition_pattern`.
+
+        **Args:**
+            *row*: tuple in :attr:`headers` order
+
+            *key*: the row's ``<workbook>|<worksheet>`` key
+
+        **Returns:**
+            the partition name with any characters that are not safe in
+            a file name replaced, or :attr:`DEFAULT_PARTITION`
+
+        """
+        value = None
+
+        if self.partition_by is not None:
+            if self.partition_by in self.headers:
+                value = row[self.headers.index(self.partition_by)]
+        elif key is not None:
+            workbook = os.path.basename(key.split('|', 1)[0])
+            match = re.search(self.partition_pattern, workbook)
+            if match is not None:
+                if match.groups():
+                    value = match.group(1)
+                else:
+                    value = match.group(0)
+
+        partition = self.DEFAULT_PARTITION
+        if value is not None and value != '':
+            if not isinstance(value, basestring):
+                value = str(value)
+            partition = re.sub(r'[^\w.-]', '_', value)
+
+        return partition
+
+    @staticmethod
+    def partition_file(filepath, partition):
+        """Name of the *partition* output of *filepath*.
+
+        **Returns:**
+            *filepath* with the partition inserted before the extension.
+            For example, ``out.CLM.csv``
+
+        """
+        root, ext = os.path.splitext(filepath)
+
+        return '%s.%s%s' % (root, partition, ext)
+
+    def write_output(self, data, word_boundary=False, keys=None):
+        """Write the list of tuple values in *data* to the CSV
+        :attr:`outfile`.
+
+        **Args:**
+            as per :meth:`write`
+
         """
         log.debug('Preparing "%s" for output' % self.outfile)
+
+        delta = self.delta
+        if delta is not None and keys is None:
+            log.warn('Delta output requires row keys: writing all rows')
+            delta = None
+
+        headers = self.headers
+        if delta is not None:
+            headers = [Delta.OPERATION_HEADER, Delta.KEY_HEADER] + headers
+
         fh = open(self.outfile, 'wb')
 
-        writer = csv.DictWriter(fh, delimiter=',', fieldnames=self.headers)
+        writer = csv.DictWriter(fh, delimiter=',', fieldnames=headers)
         if self.write_out_headers:
-            writer.writerow(dict((fn, fn) for fn in self.headers))
+            writer.writerow(dict((fn, fn) for fn in headers))
+
+        rows = self.prepare(data, word_boundary, keys, keyed=delta is not None)
+        if delta is not None:
+            rows = delta.changes(rows)
 
-        log.debug('Received %d records to write' % len(data))
         counter = 0
-        for row in data:
+        for row in rows:
             counter += 1
-            row = self.truncate_row(row, word_boundary)
             log.debug('Writing out row: %s' % str(row))
-            writer.writerow(dict(zip(self.headers, row)))
+            writer.writerow(dict(zip(headers, row)))
 
         fh.close()
         log.debug('%d records written to "%s"' % (counter, self.outfile))
 
+        if delta is not None:
+            delta.save()
+
+    def prepare(self, data, word_boundary=False, keys=None, keyed=False):
+        """Generator that truncates and orders *data* ready for output.
+
+        **Args:**
+            *data*: list of tuples to write out
+
+            *word_boundary*: as per :meth:`truncate_row`
+
+            *keys*: list of ``<workbook>|<worksheet>`` keys that
+            align with the rows in *data*
+
+            *keyed*: if ``True``, each row is paired with its key
+
+        **Returns:**
+            generator of the output rows, or of ``(<key>, <row>)``
+            tuples if *keyed*
+
+        """
+        order_keys = keys
+        rows = iter(data)
+        if self.truncate:
+            rows = (self.truncate_row(x, word_boundary) for x in rows)
+        if keyed:
+            # Keys may be a stream, so the ordering reads its own copy
+            # (only needed for the version rule).
+            order_keys = None
+            if self.version_pattern is not None:
+                keys, order_keys = itertools.tee(keys)
+            # Carry each row's key through the ordering as a trailing value.
+            rows = (x + (y,) for x, y in itertools.izip(rows, keys))
+        if self.sort_by or self.dedupe_on:
+            rows = self.order_rows(rows, order_keys)
+        if keyed:
+            rows = ((x[-1], x[:-1]) for x in rows)
+
+        return rows
+
+    def order_rows(self, rows, keys=None):
+        """Generator that applies the :attr:`dedupe_on` and
+        :attr:`sort_by` rules to *rows* via an external merge sort.
+
+        Duplicates are removed in a first pass that sorts on the
+        :attr:`dedupe_on` columns.  The survivors are then sorted on
+        :attr:`sort_by` (or returned to their original order if no
+        sort columns are defined).
+
+        **Args:**
+            *rows*: iterable of tuples in :attr:`headers` order
+
+            *keys*: list of ``<workbook>|<worksheet>`` keys that
+            align with *rows*
+
+        **Returns:**
+            generator of the ordered rows
+
+        """
+        sorter = Sorter(chunk_size=self.sort_buffer_rows)
+
+        records = ((seq, row) for seq, row in enumerate(rows))
+
+        dedupe_index = self.header_index(self.dedupe_on)
+        if dedupe_index:
+            versions = self.versions(keys)
+            records = self.dedupe(sorter.sort((tuple(row[i] for i in
+                                                     dedupe_index),
+                                               -versions.next(),
+                                               seq,
+                                               row)
+                                              for seq, row in records))
+
+        sort_index = self.header_index(self.sort_by)
+        if sort_index:
+            records = ((tuple(row[i] for i in sort_index), seq, row)
+                       for seq, row in records)
+        elif dedupe_index:
+            records = ((seq, seq, row) for seq, row in records)
+        else:
+            records = ((None, seq, row) for seq, row in records)
+
+        for record in sorter.sort(records):
+            yield record[2]
+
+    @staticmethod
+    def dedupe(records):
+        """Generator that drops all but the first record of each
+        consecutive group of *records* sharing the same dedupe key.
+
+        **Args:**
+            *records*: iterable of ``(<dedupe_key>, <version>, <seq>,
+            <row>)`` tuples sorted on the dedupe key
+
+        **Returns:**
+            generator of ``(<seq>, <row>)`` tuples
+
+        """
+        last_key = None
+        first = True
+        for dedupe_key, _, seq, row in records:
+            if not first and dedupe_key == last_key:
+                log.debug('Dropping duplicate row: %s' % str(row))
+                continue
+
+            first = False
+            last_key = dedupe_key
+            yield (seq, row)
+
+    def header_index(self, headers):
+        """Convert the list of *headers* into their column positions
+        within :attr:`headers`.
+
+        Headers that are not part of the output are ignored.
+
+        **Args:**
+            *headers*: list of header names
+
+        **Returns:**
+            list of column indexes
+
+        """
+        index = []
+
+        for header in headers:
+            if header in self.headers:
+                index.append(self.headers.index(header))
+            else:
+                log.warn('Header "%s" not in output: ignoring' % header)
+
+        return index
+
+    def versions(self, keys=None):
+        """Generator of the workbook version for each key in *keys*
+        as per the :attr:`version_pattern` rule.
+
+        Workbooks without a version (or if no :attr:`version_pattern`
+        is defined) will be assigned version ``-1``.
+
+        **Args:**
+            *keys*: list of ``<workbook>|<worksheet>`` keys
+
+        **Returns:**
+            endless generator of integer versions
+
+        """
+        if self.version_pattern is None or keys is None:
+            keys = []
+        else:
+            reg_c = re.compile(self.version_pattern)
+
+        for key in keys:
+            workbook = os.path.basename(key.split('|', 1)[0])
+            version = -1
+
+            reg_match = reg_c.search(workbook)
+            if reg_match:
+                try:
+                    version = int(reg_match.group(1))
+                except (IndexError, ValueError) as error:
+                    log.warn('Version of "%s" not parsed: %s' %
+                             (workbook, error))
+
+            yield version
+
+        while True:
+            yield -1
+
     def truncate_row(self, row, word_boundary=False):
         """Check if the field length is flagged as having a maximum
         value.  If so, the field will be truncated.
@@ -192,7 +772,10 @@ class Writer(object):
         log.debug('Substituting header aliases as per: "%s"' %
                   str(header_aliases))
 
-        local_header_aliases = dict(header_aliases)
+        # Copy the alias lists as well so that *header_aliases* is intact
+        # for the next caller.
+        local_header_aliases = dict((k, list(v))
+                                    for k, v in header_aliases.iteritems())
 
         new_header_list = []
         for i in headers_displayed:
@@ -0,0 +1,376 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.XlsbEngine` extracts cells from Excel binary
+(``xlsb``) workbooks.
+
+"""
+__all__ = ["XlsbEngine"]
+
+import struct
+import zipfile
+import xml.etree.cElementTree as ElementTree
+
+from openpyxl.cell import coordinate_from_string, column_index_from_string
+from openpyxl.date_time import (from_excel,
+                                CALENDAR_WINDOWS_1900,
+                                CALENDAR_MAC_1904)
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+
+from logga.log import log
+
+# BIFF12 record types.
+BRT_ROW_HDR = 0
+BRT_CELL_BLANK = 1
+BRT_CELL_RK = 2
+BRT_CELL_ERROR = 3
+BRT_CELL_BOOL = 4
+BRT_CELL_REAL = 5
+BRT_CELL_ST = 6
+BRT_CELL_ISST = 7
+BRT_FMLA_STRING = 8
+BRT_FMLA_NUM = 9
+BRT_FMLA_BOOL = 10
+BRT_FMLA_ERROR = 11
+BRT_SST_ITEM = 19
+BRT_CELL_RSTRING = 62
+BRT_FMT = 44
+BRT_XF = 47
+BRT_WB_PROP = 153
+BRT_BUNDLE_SH = 156
+BRT_END_SHEET_DATA = 146
+BRT_BEGIN_CELL_XFS = 617
+BRT_END_CELL_XFS = 618
+
+ERRORS = {0x00: '#NULL!',
+          0x07: '#DIV/0!',
+          0x0F: '#VALUE!',
+          0x17: '#REF!',
+          0x1D: '#NAME?',
+          0x24: '#NUM!',
+          0x2A: '#N/A'}
+
+
+def records(fh):
+    """Generator of the BIFF12 records in the file object *fh*.
+
+    **Returns:**
+        generator of ``(<record_type>, <data>)`` tuples
+
+    **Raises:**
+        :exc:`IOError` if the stream ends part way through a record
+
+    """
+    while True:
+        byte = fh.read(1)
+        if not byte:
+            break
+
+        record_type = ord(byte)
+        if record_type & 0x80:
+            record_type = (record_type & 0x7F) | (_byte(fh) & 0x7F) << 7
+
+        size = 0
+        for shift in (0, 7, 14, 21):
+            byte = _byte(fh)
+            size |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                break
+
+        data = fh.read(size)
+        if len(data) < size:
+            raise IOError('Truncated BIFF12 record %d' % record_type)
+
+        yield (record_type, data)
+
+
+def _byte(fh):
+    """Read a single byte of a record header from *fh*.
+
+    """
+    byte = fh.read(1)
+    if not byte:
+        raise IOError('Truncated BIFF12 record header')
+
+    return ord(byte)
+
+
+def wide_string(data, offset=0):
+    """Read an ``XLWideString`` from *data* at *offset*.
+
+    **Returns:**
+        tuple of the form ``(<string>, <next_offset>)``.  *string* is
+        ``None`` for a null ``XLNullableWideString``
+
+    """
+    length = struct.unpack_from('<I', data, offset)[0]
+    offset += 4
+
+    value = None
+    if length != 0xFFFFFFFF:
+        end = offset + length * 2
+        value = data[offset:end].decode('utf-16-le')
+        offset = end
+
+    return (value, offset)
+
+
+def rk_number(rk):
+    """Decode the ``RkNumber`` *rk*.
+
+    """
+    if rk & 0x02:
+        value = rk >> 2
+        if value & 0x20000000:
+            value -= 0x40000000
+    else:
+        value = struct.unpack('<d', struct.pack('<Q',
+                                                (rk & 0xFFFFFFFC) << 32))[0]
+
+    if rk & 0x01:
+        value /= 100.0
+
+    return value
+
+
+class XlsbEngine(object):
+    """:class:`baip_parser.XlsbEngine`
+
+    :class:`baip_parser.Parser` engine for ``xlsb`` workbooks.  The
+    workbook, worksheet, shared strings and styles parts are read as
+    streams of BIFF12 binary records.  No XML is parsed other than the
+    workbook relationships.
+
+    Each worksheet is read in a single pass that stops at the last row
+    holding a requested cell.  Shared strings are only read as far as
+    the highest index requested so far.
+
+    Values are converted as per the ``xlsx`` parse: numbers with
+    no fractional part are returned as ``int``, numbers in a date format
+    as ``datetime`` and errors as their ``#`` text.
+
+    .. attribute:: sheet_names
+
+        the names of the worksheets in workbook order
+
+    """
+    KIND = 'xlsb'
+    WORKBOOK = 'xl/workbook.bin'
+    WORKBOOK_RELS = 'xl/_rels/workbook.bin.rels'
+    SHARED_STRINGS = 'xl/sharedStrings.bin'
+    STYLES = 'xl/styles.bin'
+    REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+    _sheet_names = []
+
+    def __init__(self, filepath):
+        """XlsbEngine initialiser.
+
+        **Raises:**
+            :exc:`IOError` if *filepath* is not a readable ``xlsb``
+            workbook
+
+        """
+        self._sheets = {}
+        self._sheet_names = []
+        self._strings = []
+        self._strings_fh = None
+        self._string_records = None
+        self._date_styles = None
+        self._base_date = CALENDAR_WINDOWS_1900
+
+        try:
+            self._archive = zipfile.ZipFile(filepath)
+        except zipfile.BadZipfile as error:
+            raise IOError('Unable to open "%s": %s' % (filepath, error))
+
+        try:
+            self.read_workbook()
+        except (KeyError, struct.error, SyntaxError) as error:
+            self.close()
+            raise IOError('Unable to read "%s" workbook: %s' %
+                          (filepath, error))
+
+    @property
+    def sheet_names(self):
+        return self._sheet_names
+
+    def read_workbook(self):
+        """Read the worksheet names and members and the date system from
+        the workbook part.
+
+        """
+        rels = {}
+        tree = ElementTree.fromstring(self._archive.read(self.WORKBOOK_RELS))
+        for element in tree.findall('{%s}Relationship' % self.REL_NS):
+            target = element.get('Target')
+            if target.startswith('/'):
+                target = target[1:]
+            elif not target.startswith('xl/'):
+                target = 'xl/%s' % target
+            rels[element.get('Id')] = target
+
+        fh = self._archive.open(self.WORKBOOK)
+        try:
+            for record_type, data in records(fh):
+                if record_type == BRT_WB_PROP:
+                    if struct.unpack_from('<I', data)[0] & 0x01:
+                        self._base_date = CALENDAR_MAC_1904
+                elif record_type == BRT_BUNDLE_SH:
+                    rel_id, offset = wide_string(data, 8)
+                    name = wide_string(data, offset)[0]
+                    member = rels.get(rel_id)
+                    # As per openpyxl, only worksheets are parsed.
+                    if member is not None and 'worksheets' in member:
+                        self._sheet_names.append(name)
+                        self._sheets[name] = member
+        finally:
+            fh.close()
+
+    def extract(self, sheet, cells):
+        """Extract *cells* from the worksheet *sheet*.
+
+        **Args:**
+            *sheet*: worksheet name
+
+            *cells*: list of cells to extract, for example ``['B1']``
+
+        **Returns:**
+            dictionary of the form ``{<cell>: <value>}``
+
+        """
+        values = dict((x, None) for x in cells)
+
+        targets = {}
+        for cell in cells:
+            column, row = coordinate_from_string(cell.upper())
+            column = column_index_from_string(column)
+            targets[(row - 1, column - 1)] = cell
+        max_row = max([x[0] for x in targets] or [-1])
+
+        row = -1
+        fh = self._archive.open(self._sheets[sheet])
+        try:
+            for record_type, data in records(fh):
+                if record_type == BRT_ROW_HDR:
+                    row = struct.unpack_from('<I', data)[0]
+                    if row > max_row:
+                        break
+                elif record_type == BRT_END_SHEET_DATA:
+                    break
+                elif (BRT_CELL_BLANK <= record_type <= BRT_FMLA_ERROR or
+                      record_type == BRT_CELL_RSTRING):
+                    column, style = struct.unpack_from('<II', data)
+                    cell = targets.get((row, column))
+                    if cell is not None:
+                        values[cell] = self.value(record_type,
+                                                  data,
+                                                  style & 0xFFFFFF)
+        finally:
+            fh.close()
+
+        return values
+
+    def value(self, record_type, data, style):
+        """Convert the cell record *data* of *record_type* and cell
+        format *style* into its value.
+
+        """
+        value = None
+
+        if record_type in (BRT_CELL_RK, BRT_CELL_REAL, BRT_FMLA_NUM):
+            if record_type == BRT_CELL_RK:
+                value = rk_number(struct.unpack_from('<I', data, 8)[0])
+            else:
+                value = struct.unpack_from('<d', data, 8)[0]
+            if self.is_date(style):
+                value = from_excel(value, self._base_date)
+            elif isinstance(value, float) and value.is_integer():
+                value = int(value)
+        elif record_type in (BRT_CELL_ST, BRT_FMLA_STRING):
+            value = wide_string(data, 8)[0]
+        elif record_type == BRT_CELL_RSTRING:
+            # Rich text: the string follows a flags byte.  Formatting
+            # runs are ignored.
+            value = wide_string(data, 9)[0]
+        elif record_type == BRT_CELL_ISST:
+            value = self.shared_string(struct.unpack_from('<I', data, 8)[0])
+        elif record_type in (BRT_CELL_BOOL, BRT_FMLA_BOOL):
+            value = ord(data[8]) != 0
+        elif record_type in (BRT_CELL_ERROR, BRT_FMLA_ERROR):
+            value = ERRORS.get(ord(data[8]))
+
+        return value
+
+    def shared_string(self, index):
+        """Get the shared string at *index*, reading the shared strings
+        part only as far as required.
+
+        """
+        if self._string_records is None:
+            self._strings_fh = self._archive.open(self.SHARED_STRINGS)
+            self._string_records = records(self._strings_fh)
+
+        while len(self._strings) <= index:
+            record = next(self._string_records, None)
+            if record is None:
+                log.warn('Shared string %d missing' % index)
+                break
+            if record[0] == BRT_SST_ITEM:
+                self._strings.append(wide_string(record[1], 1)[0])
+
+        value = None
+        if index < len(self._strings):
+            value = self._strings[index]
+
+        return value
+
+    def is_date(self, style):
+        """Check whether the cell format *style* is a date format.
+
+        """
+        if self._date_styles is None:
+            self._date_styles = self.date_styles()
+
+        return style in self._date_styles
+
+    def date_styles(self):
+        """Read the cell formats from the styles part.
+
+        **Returns:**
+            set of the cell format indexes that have a date number format
+
+        """
+        formats = dict(BUILTIN_FORMATS)
+        styles = set()
+
+        if self.STYLES in self._archive.namelist():
+            index = 0
+            in_cell_xfs = False
+            fh = self._archive.open(self.STYLES)
+            try:
+                for record_type, data in records(fh):
+                    if record_type == BRT_FMT:
+                        fmt_id = struct.unpack_from('<H', data)[0]
+                        formats[fmt_id] = wide_string(data, 2)[0]
+                    elif record_type == BRT_BEGIN_CELL_XFS:
+                        in_cell_xfs = True
+                    elif record_type == BRT_END_CELL_XFS:
+                        break
+                    elif record_type == BRT_XF and in_cell_xfs:
+                        fmt_id = struct.unpack_from('<H', data, 2)[0]
+                        if is_date_format(formats.get(fmt_id)):
+                            styles.add(index)
+                        index += 1
+            finally:
+                fh.close()
+
+        return styles
+
+    def close(self):
+        """Release the workbook archive.
+
+        """
+        if self._strings_fh is not None:
+            self._strings_fh.close()
+            self._strings_fh = None
+            self._string_records = None
+        self._archive.close()
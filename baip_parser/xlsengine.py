@@ -0,0 +1,127 @@
+# pylint: disable=R0903,C0111,R0902
+"""The :class:`baip_parser.XlsEngine` extracts cells from legacy Excel
+97-2003 (``xls``) workbooks.
+
+"""
+__all__ = ["XlsEngine"]
+
+try:
+    import xlrd
+except ImportError:
+    xlrd = None
+
+from openpyxl.cell import coordinate_from_string, column_index_from_string
+
+from logga.log import log
+
+
+class XlsEngine(object):
+    """:class:`baip_parser.XlsEngine`
+
+    :class:`baip_parser.Parser` engine for BIFF (``xls``) workbooks.
+    Requires :mod:`xlrd`.
+
+    The workbook is opened on demand so that only the worksheet list is
+    read up front.  Each worksheet's records are loaded when its cells
+    are extracted and are released straight afterwards.
+
+    Values are converted as per the ``xlsx`` parse: numbers with
+    no fractional part are returned as ``int``, dates as ``datetime``
+    and errors as their ``#`` text.
+
+    .. attribute:: sheet_names
+
+        the names of the worksheets in workbook order
+
+    """
+    KIND = 'xls'
+
+    @staticmethod
+    def available():
+        """Check whether :mod:`xlrd` is installed.
+
+        """
+        return xlrd is not None
+
+    def __init__(self, filepath):
+        """XlsEngine initialiser.
+
+        **Raises:**
+            :exc:`IOError` if *filepath* is not a readable ``xls``
+            workbook
+
+        """
+        if xlrd is None:
+            raise ImportError('xls extraction requires xlrd')
+
+        try:
+            self._book = xlrd.open_workbook(filepath,
+                                            on_demand=True,
+                                            ragged_rows=True)
+        except xlrd.XLRDError as error:
+            raise IOError('Unable to open "%s": %s' % (filepath, error))
+
+    @property
+    def sheet_names(self):
+        return self._book.sheet_names()
+
+    def extract(self, sheet, cells):
+        """Extract *cells* from the worksheet *sheet*.
+
+        **Args:**
+            *sheet*: worksheet name
+
+            *cells*: list of cells to extract, for example ``['B1']``
+
+        **Returns:**
+            dictionary of the form ``{<cell>: <value>}``
+
+        """
+        values = {}
+
+        ws = self._book.sheet_by_name(sheet)
+        try:
+            for cell in cells:
+                column, row = coordinate_from_string(cell.upper())
+                row -= 1
+                column = column_index_from_string(column) - 1
+
+                value = None
+                if row < ws.nrows and column < ws.row_len(row):
+                    value = self.value(ws.cell(row, column))
+                values[cell] = value
+        finally:
+            self._book.unload_sheet(sheet)
+
+        return values
+
+    def value(self, ws_cell):
+        """Convert the :mod:`xlrd` *ws_cell* into its value.
+
+        """
+        value = None
+
+        if ws_cell.ctype == xlrd.XL_CELL_TEXT:
+            value = unicode(ws_cell.value)
+        elif ws_cell.ctype == xlrd.XL_CELL_NUMBER:
+            value = ws_cell.value
+            if value.is_integer():
+                value = int(value)
+        elif ws_cell.ctype == xlrd.XL_CELL_DATE:
+            try:
+                value = xlrd.xldate.xldate_as_datetime(ws_cell.value,
+                                                       self._book.datemode)
+            except xlrd.xldate.XLDateError as error:
+                log.warn('Invalid date %s: %s' % (ws_cell.value, error))
+        elif ws_cell.ctype == xlrd.XL_CELL_BOOLEAN:
+            value = bool(ws_cell.value)
+        elif ws_cell.ctype == xlrd.XL_CELL_ERROR:
+            value = xlrd.error_text_from_code.get(ws_cell.value)
+
+        return value
+
+    def close(self):
+        """Release the workbook.
+
+        """
+        self._book.release_resources()